@@ -1,5 +1,22 @@
+import re
+
 from django.contrib import admin
-from .models import Tariff, Driver, PaymentMethod, Order
+from django.db.models import Q
+from . import search
+from .models import Tariff, Driver, PaymentMethod, Order, ArchivedOrder, OrderRollup
+from .pagination import EstimatedCountPaginator
+
+# Запрос из цифр и символов номера ищется по началу телефона, остальное - полнотекстово
+PHONE_QUERY = re.compile(r'^\+?[\d\s()-]+$')
+
+
+def prefix_range(field, prefix):
+    """
+    Условие "field начинается с prefix" диапазоном сравнения строк, чтобы
+    работал обычный индекс (LIKE 'x%' в SQLite индекс не использует)
+    """
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix[:-1] + chr(ord(prefix[-1]) + 1)})
+
 
 @admin.register(Tariff)
 class TariffAdmin(admin.ModelAdmin):
@@ -16,14 +33,60 @@ class DriverAdmin(admin.ModelAdmin):
     list_editable = ['status']
     filter_horizontal = ['available_tariffs']
 
-@admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'customer_name', 'customer_phone', 'tariff', 'driver', 'total_price', 'status', 'is_paid', 'created_at']
+
+class OrderRecordAdmin(admin.ModelAdmin):
+    """
+    Список заказов для таблиц на миллионы строк: связи одним JOIN, оценка
+    числа строк вместо COUNT(*), поиск по началу телефона по индексу и по
+    словам адресов и имени через полнотекстовый индекс (search.py).
+    """
+    list_display = ['id', 'customer_name', 'customer_phone', 'tariff', 'driver', 'payment_method', 'total_price', 'status', 'is_paid', 'created_at']
     list_filter = ['status', 'is_paid', 'tariff', 'payment_method']
-    search_fields = ['customer_name', 'customer_phone', 'pickup_address', 'destination_address']
+    list_select_related = ['tariff', 'driver', 'payment_method']
+    search_fields = ['customer_phone', *search.SEARCH_FIELDS]
+    search_help_text = "Телефон (по началу номера) или слова из адреса и имени клиента"
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['driver']
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if PHONE_QUERY.match(term):
+            return queryset.filter(prefix_range('customer_phone', term)), False
+        return search.filter_matching(queryset, term), False
+
+@admin.register(Order)
+class OrderAdmin(OrderRecordAdmin):
     list_editable = ['status', 'is_paid']
     readonly_fields = ['created_at', 'updated_at']
 
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(OrderRecordAdmin):
+
+    # Архив только для чтения: заказы попадают сюда командой archive_orders
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(OrderRollup)
+class OrderRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'tariff', 'payment_method', 'orders_count', 'total_amount', 'paid_amount', 'commission_amount']
+    list_filter = ['tariff', 'payment_method']
+    date_hierarchy = 'day'
+    list_select_related = ['tariff', 'payment_method']
+
+    # Сводка считается из заказов, правится только командой rebuild_order_rollups
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(PaymentMethod)
 class PaymentMethodAdmin(admin.ModelAdmin):
     list_display = ['name', 'is_active', 'commission', 'min_amount', 'max_amount', 'order']
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class B0JAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'B0J_app'  
-    verbose_name = "UP TAXI Приложение"
\ No newline at end of file
+    verbose_name = "UP TAXI Приложение"
+    
+    def ready(self):
+        from . import signals  # noqa: F401 - регистрирует обработчики сигналов
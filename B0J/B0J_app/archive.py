@@ -0,0 +1,107 @@
+"""
+Перенос старых завершённых и отменённых заказов из Order в ArchivedOrder.
+Каждая пачка - отдельная короткая транзакция (INSERT ... SELECT и DELETE по
+одним и тем же id), между пачками блокировка записи отпускается.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order
+from .pagination import keyset_after
+
+ARCHIVE_BATCH = 500
+# Пауза между пачками: даёт пишущим запросам вклиниться между транзакциями архива
+ARCHIVE_PAUSE = 0.05
+KEY = ['created_at', 'id']
+
+
+class ArchiveRun:
+    """Итоги архивации"""
+
+    def __init__(self):
+        self.moved = 0
+        self.batches = 0
+        self.longest_batch_ms = 0.0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    def __str__(self):
+        return (
+            f"перенесено {self.moved} заказов за {self.seconds:.1f} с, пачек {self.batches}, "
+            f"самая долгая транзакция {self.longest_batch_ms:.1f} мс"
+        )
+
+
+def archive_cutoff(days=None):
+    """Заказы, созданные раньше этого момента, можно переносить в архив"""
+    if days is None:
+        days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def _move_sql(ids):
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in Order._meta.concrete_fields)
+    placeholders = ', '.join(['%s'] * len(ids))
+    source = quote(Order._meta.db_table)
+    return [
+        f"INSERT INTO {quote(ArchivedOrder._meta.db_table)} ({columns}) "
+        f"SELECT {columns} FROM {source} WHERE id IN ({placeholders})",
+        # Без сигналов удаления: заказ не исчез, а переехал, сводки его учитывают
+        f"DELETE FROM {source} WHERE id IN ({placeholders})",
+    ]
+
+
+def archive_batch(candidate_ids, cutoff):
+    """
+    Переносит заказы из candidate_ids, которые всё ещё подходят под условия
+    архива. Возвращает число перенесённых заказов.
+    """
+    with transaction.atomic():
+        # Под блокировкой перепроверяем: статус могли изменить после выбора кандидатов
+        ids = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=candidate_ids, status__in=ArchivedOrder.TERMINAL_STATUSES, created_at__lt=cutoff)
+            .values_list('pk', flat=True)
+        )
+        if not ids:
+            return 0
+        with connection.cursor() as cursor:
+            for sql in _move_sql(ids):
+                cursor.execute(sql, ids)
+    return len(ids)
+
+
+def archive_orders(days=None, batch_size=ARCHIVE_BATCH, pause=ARCHIVE_PAUSE, limit=None):
+    """
+    Архивирует завершённые и отменённые заказы старше days дней. Кандидаты
+    читаются по индексу (created_at, id) с курсором, поэтому заказы, которые
+    остаются в рабочей таблице, не просматриваются повторно.
+    """
+    cutoff = archive_cutoff(days)
+    run = ArchiveRun()
+    candidates = (
+        Order.objects.filter(created_at__lt=cutoff, status__in=ArchivedOrder.TERMINAL_STATUSES)
+        .order_by(*KEY).values_list(*KEY)
+    )
+    last = None
+    while limit is None or run.moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - run.moved)
+        rows = list((candidates.filter(keyset_after(KEY, last)) if last else candidates)[:size])
+        if not rows:
+            break
+        last = rows[-1]
+        started = time.perf_counter()
+        run.moved += archive_batch([pk for _, pk in rows], cutoff)
+        run.longest_batch_ms = max(run.longest_batch_ms, (time.perf_counter() - started) * 1000)
+        run.batches += 1
+        if pause:
+            time.sleep(pause)
+    return run
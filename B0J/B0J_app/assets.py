@@ -0,0 +1,122 @@
+"""
+Статические файлы: имена с хэшем содержимого, сжатые копии, собранные
+при collectstatic, и раздача с вечным кэшем для хэшированных имён.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него собираются только .gz
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.html')
+# Файлы меньше этого размера сжатие почти не уменьшает
+MIN_COMPRESS_SIZE = 256
+# Хэшированное имя меняется вместе с содержимым - кэшировать можно навсегда
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Исходные имена могут смениться в любой момент
+REVALIDATE_CACHE_CONTROL = 'public, max-age=60'
+# Порядок предпочтения: (Content-Encoding, расширение файла)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage, который после расстановки хэшей кладёт рядом
+    с текстовыми файлами сжатые копии: .gz всегда и .br, если есть brotli.
+    Без collectstatic (тесты, разработка) отдаёт исходные имена.
+    """
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if content is not None:
+                raise
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
+
+
+def _immutable_names():
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return set(hashed_files.values())
+
+
+def _accepted_encodings(request):
+    header = request.headers.get('Accept-Encoding', '')
+    return {part.split(';')[0].strip() for part in header.split(',')}
+
+
+def serve(request, path):
+    """
+    Раздача STATIC_ROOT с выбором готовой сжатой копии по Accept-Encoding.
+    Если collectstatic не запускали, в режиме DEBUG файл ищется в приложениях.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(str(settings.STATIC_ROOT), path) if settings.STATIC_ROOT else None
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден')
+    if fullpath is None or not os.path.isfile(fullpath):
+        fullpath = finders.find(path) if settings.DEBUG else None
+        if fullpath is None:
+            raise Http404('Файл не найден')
+
+    stat = os.stat(fullpath)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    encoding, served = None, fullpath
+    accepted = _accepted_encodings(request)
+    for name, suffix in ENCODINGS:
+        if name in accepted and os.path.isfile(fullpath + suffix):
+            encoding, served = name, fullpath + suffix
+            break
+
+    response = FileResponse(
+        open(served, 'rb'), content_type=content_type or 'application/octet-stream',
+        filename=os.path.basename(fullpath),
+    )
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if path in _immutable_names() else REVALIDATE_CACHE_CONTROL
+    return response
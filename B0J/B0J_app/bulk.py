@@ -0,0 +1,119 @@
+"""Помощники для массовой загрузки данных"""
+from contextlib import contextmanager
+
+from django.db import connections, router
+
+
+@contextmanager
+def keep_timestamps(model, *field_names):
+    """
+    Отключает auto_now/auto_now_add у полей модели на время блока, чтобы
+    bulk_create сохранил исторические даты из источника.
+    Только для отдельных процессов (команды manage.py): меняет класс модели.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def chunked(iterable, size):
+    """Разбивает поток на списки по size элементов, не читая его целиком"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def insert_rows(model, field_names, rows):
+    """
+    Вставляет строки одним executemany без объектов модели: у bulk_create
+    подготовка каждого значения через поле стоит десятки микросекунд на строку.
+    Значения в rows должны быть уже готовы для базы (наивные даты в UTC,
+    Decimal или его строка, id связей); сигналы и auto_now не срабатывают.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in field_names)
+    placeholders = ', '.join(['%s'] * len(field_names))
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})", rows)
+
+
+
+@contextmanager
+def deferred_indexes(model):
+    """
+    Снимает неуникальные индексы таблицы модели на время массовой загрузки и
+    создаёт их заново в конце: построить индекс по заполненной таблице в разы
+    дешевле, чем обновлять его на каждой вставке. Только SQLite и только для
+    отдельных процессов (команды manage.py): пока блок открыт, запросы к
+    таблице идут без этих индексов.
+    """
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s "
+            "AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%%'",
+            [model._meta.db_table],
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+# Синтетические данные для seed_synthetic и команд bench_*: центр города и разброс координат
+CITY_CENTER = (55.7558, 37.6173)
+CITY_SPREAD = (0.25, 0.40)
+
+
+def random_point(rng):
+    return (
+        CITY_CENTER[0] + rng.uniform(-CITY_SPREAD[0], CITY_SPREAD[0]),
+        CITY_CENTER[1] + rng.uniform(-CITY_SPREAD[1], CITY_SPREAD[1]),
+    )
+
+
+# Словарь улиц и имён, чтобы частоты слов были похожи на настоящие адреса
+STREET_ROOTS = ['Лесн', 'Садов', 'Парков', 'Солнечн', 'Школьн', 'Речн', 'Полев', 'Заводск', 'Новослободск',
+                'Берёзов', 'Молодёжн', 'Строител', 'Кольцев', 'Вокзальн', 'Луговая', 'Озёрн', 'Сиренев', 'Тих']
+STREET_ENDINGS = ['ая', 'ый', 'овская', 'инская', 'ецкая', 'ная', 'ьная', 'ская']
+STREET_KINDS = ['ул.', 'пр.', 'пер.', 'бул.', 'ш.']
+FIRST_NAMES = ['Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена', 'Дмитрий', 'Наталья', 'Алексей',
+               'Татьяна', 'Андрей', 'Юлия', 'Михаил', 'Ирина', 'Николай', 'Светлана', 'Павел']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков',
+              'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов']
+
+
+def random_street(rng):
+    return (f"{rng.choice(STREET_KINDS)} {rng.choice(STREET_ROOTS)}{rng.choice(STREET_ENDINGS)}-{rng.randrange(1, 40)}, "
+            f"{rng.randrange(1, 200)}")
+
+
+def random_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{rng.randrange(1, 500)}"
+
+
+def random_city_point(rng):
+    """Точка в городе: к центру плотнее, чем к окраинам"""
+    lat = CITY_CENTER[0] + max(-1.0, min(1.0, rng.gauss(0, 0.4))) * CITY_SPREAD[0]
+    lon = CITY_CENTER[1] + max(-1.0, min(1.0, rng.gauss(0, 0.4))) * CITY_SPREAD[1]
+    return lat, lon
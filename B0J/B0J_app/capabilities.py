@@ -0,0 +1,50 @@
+"""
+Битовая маска возможностей водителя.
+Тарифы и оснащение хранятся в одном целом числе, поэтому условие
+"свободен + тариф + детское кресло + 6 мест" проверяется без JOIN:
+(capabilities & маска) == маска.
+"""
+
+# Младшие 16 бит - типы тарифов (позиция в Tariff.TARIFF_TYPES)
+TARIFF_BITS = 16
+TARIFFS = (1 << TARIFF_BITS) - 1
+CHILD_SEAT = 1 << 16
+CARGO_SPACE = 1 << 17
+# Вместимость хранится "лесенкой": бит n-1 означает "не меньше n мест"
+SEATS_SHIFT = 18
+MAX_SEATS = 8
+
+
+def tariff_bit(position):
+    """Бит типа тарифа по его позиции в списке типов"""
+    if not 0 <= position < TARIFF_BITS:
+        raise ValueError(f"Типов тарифов больше, чем бит в маске: {position}")
+    return 1 << position
+
+
+def seats_bits(passengers):
+    """Биты "не меньше n мест" для n от 1 до min(passengers, MAX_SEATS)"""
+    passengers = max(0, min(passengers or 0, MAX_SEATS))
+    return ((1 << passengers) - 1) << SEATS_SHIFT
+
+
+def equipment_bits(has_child_seat, has_cargo_space, max_passengers):
+    """Биты оснащения автомобиля (всё, кроме тарифов)"""
+    bits = seats_bits(max_passengers)
+    if has_child_seat:
+        bits |= CHILD_SEAT
+    if has_cargo_space:
+        bits |= CARGO_SPACE
+    return bits
+
+
+def required(tariff_bits=0, child_seat=False, cargo_space=False, passengers=0):
+    """Маска требований заказа; водитель подходит, если содержит все её биты"""
+    mask = tariff_bits
+    if child_seat:
+        mask |= CHILD_SEAT
+    if cargo_space:
+        mask |= CARGO_SPACE
+    if passengers:
+        mask |= 1 << (SEATS_SHIFT + min(passengers, MAX_SEATS) - 1)
+    return mask
@@ -0,0 +1,97 @@
+"""Кэш справочников: активные тарифы и способы оплаты"""
+import threading
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+
+from .models import PaymentMethod, Tariff
+from .pricing import RateTable
+from .versions import bump_version, get_version
+
+CATALOG = 'catalog'
+
+
+class CatalogSnapshot:
+    """Неизменяемый снимок справочников одной версии"""
+
+    def __init__(self, version, tariffs, payment_methods, shared_tariff_types=frozenset()):
+        self.version = version
+        self.tariffs = tariffs
+        self.payment_methods = payment_methods
+        self.tariffs_by_id = {tariff.pk: tariff for tariff in tariffs}
+        self.payment_methods_by_id = {method.pk: method for method in payment_methods}
+        self.rate_table = RateTable(tariffs)
+        # Типы, у которых несколько строк тарифов (включая неактивные): бит типа
+        # в маске возможностей водителя не говорит, по какой из них он допущен
+        self.shared_tariff_types = shared_tariff_types
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def snapshot():
+    """Актуальный снимок: из памяти процесса, из базы - только после изменений"""
+    global _snapshot
+    version = get_version(CATALOG)
+    current = _snapshot
+    if current is not None and current.version == version:
+        return current
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            # Версия прочитана до загрузки: если справочник изменится во время
+            # загрузки, снимок окажется устаревшим и перезагрузится на следующем запросе
+            # Тарифов немного: читаем все, неактивные нужны только для подсчёта типов
+            tariffs = list(Tariff.objects.all())
+            types = Counter(tariff.name for tariff in tariffs)
+            _snapshot = CatalogSnapshot(
+                version,
+                [tariff for tariff in tariffs if tariff.is_active],
+                list(PaymentMethod.objects.filter(is_active=True)),
+                frozenset(name for name, rows in types.items() if rows > 1),
+            )
+        return _snapshot
+
+
+async def asnapshot():
+    """
+    snapshot() для асинхронных представлений. Обычно это чтение версии
+    из общего кэша; база читается только после изменения справочников.
+    """
+    return await sync_to_async(snapshot)()
+
+
+def invalidate():
+    """Сбрасывает кэш справочников во всех процессах"""
+    bump_version(CATALOG)
+
+
+def active_tariffs():
+    return snapshot().tariffs
+
+
+def active_payment_methods():
+    return snapshot().payment_methods
+
+
+def _lookup(model, cached, pk):
+    try:
+        return cached[int(pk)]
+    except (KeyError, TypeError, ValueError):
+        # Неактивные записи в кэше не хранятся - обращаемся к базе
+        return model.objects.get(pk=pk)
+
+
+def tariff_type_is_shared(name):
+    """True, если тарифов этого типа несколько и допуск водителя проверяется по связям"""
+    return name in snapshot().shared_tariff_types
+
+
+def get_tariff(pk):
+    """Тариф по id; Tariff.DoesNotExist, если его нет"""
+    return _lookup(Tariff, snapshot().tariffs_by_id, pk)
+
+
+def get_payment_method(pk):
+    """Способ оплаты по id; PaymentMethod.DoesNotExist, если его нет"""
+    return _lookup(PaymentMethod, snapshot().payment_methods_by_id, pk)
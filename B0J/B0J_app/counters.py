@@ -0,0 +1,73 @@
+"""Инкрементальные счётчики водителей по статусам"""
+from django.db.models import Count, F
+
+from .models import Driver, DriverStatusCounter
+from .versions import bump_version
+
+STATUSES = [status for status, _ in Driver.STATUS_CHOICES]
+# Версия данных водителей: по ней сбрасываются закэшированные страницы
+DRIVERS = 'drivers'
+
+
+def invalidate():
+    """Объявляет устаревшими страницы со списками и статусами водителей"""
+    bump_version(DRIVERS)
+
+
+def adjust(deltas):
+    """Применяет изменения счётчиков, например {'available': -1, 'busy': 1}"""
+    invalidate()
+    for status, delta in deltas.items():
+        if not delta:
+            continue
+        updated = DriverStatusCounter.objects.filter(status=status).update(count=F('count') + delta)
+        if not updated:
+            DriverStatusCounter.objects.get_or_create(status=status, defaults={'count': delta})
+
+
+def record_transition(old_status, new_status):
+    """Учитывает смену статуса водителя; None означает создание или удаление"""
+    if old_status == new_status:
+        return
+    deltas = {}
+    if old_status is not None:
+        deltas[old_status] = deltas.get(old_status, 0) - 1
+    if new_status is not None:
+        deltas[new_status] = deltas.get(new_status, 0) + 1
+    adjust(deltas)
+
+
+def _with_total(rows):
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(rows)
+    counts['total'] = sum(counts[status] for status in STATUSES)
+    return counts
+
+
+def status_counts():
+    """Число водителей по статусам и общее число (одна выборка из трёх строк)"""
+    return _with_total(DriverStatusCounter.objects.values_list('status', 'count'))
+
+
+async def astatus_counts():
+    """Асинхронный вариант status_counts"""
+    return _with_total([row async for row in DriverStatusCounter.objects.values_list('status', 'count')])
+
+
+def actual_counts():
+    """Точные значения, посчитанные по таблице водителей"""
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(Driver.objects.values_list('status').annotate(n=Count('id')).order_by())
+    return counts
+
+
+def reconcile():
+    """Перезаписывает счётчики точными значениями, возвращает найденное расхождение"""
+    stored = status_counts()
+    actual = actual_counts()
+    drift = {status: actual[status] - stored[status] for status in STATUSES if actual[status] != stored[status]}
+    for status in STATUSES:
+        DriverStatusCounter.objects.update_or_create(status=status, defaults={'count': actual[status]})
+    if drift:
+        invalidate()
+    return drift
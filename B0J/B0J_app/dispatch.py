@@ -0,0 +1,160 @@
+"""Подбор водителей для заказа"""
+import random
+import time
+
+from django.db import OperationalError, transaction
+from django.db.models import F, Q
+
+from . import capabilities, catalog, counters
+from .geo import covered_radius_km, haversine_km, neighbour_cells
+from .models import Driver, Tariff
+from .surge import engine as surge_engine
+
+# Порядок расширения зоны поиска: (точность geohash, число колец соседних ячеек).
+# Сначала смотрим ближайшие кварталы, затем постепенно расширяем радиус.
+SEARCH_STEPS = [
+    (6, 1),
+    (6, 2),
+    (6, 4),
+    (5, 1),
+    (5, 2),
+    (4, 1),
+    (3, 1),
+]
+
+# Сколько кандидатов пробуем захватить за один проход и сколько проходов делаем
+CLAIM_CANDIDATES = 5
+CLAIM_ATTEMPTS = 3
+# Повторы транзакции заказа, если SQLite занят конкурирующей записью
+ORDER_ATTEMPTS = 5
+LOCK_BACKOFF = 0.01
+
+
+def eligible_drivers(tariff=None, child_seat=False, cargo_space=False, passengers=0):
+    """
+    Свободные водители, которые могут работать по тарифу и подходят по оснащению.
+    Всё проверяется одним условием на маску возможностей, без JOIN с тарифами.
+    Бит в маске - тип тарифа, поэтому если строк этого типа несколько, допуск
+    к конкретному тарифу дополнительно проверяется по available_tariffs.
+    """
+    queryset = Driver.objects.filter(status='available')
+    mask = capabilities.required(
+        Tariff.CAPABILITY_BITS.get(tariff.name, 0) if tariff is not None else 0,
+        child_seat=child_seat,
+        cargo_space=cargo_space,
+        passengers=passengers,
+    )
+    if mask:
+        queryset = queryset.alias(matched=F('capabilities').bitand(mask)).filter(matched=mask)
+    if tariff is not None and catalog.tariff_type_is_shared(tariff.name):
+        queryset = queryset.filter(available_tariffs=tariff)
+    if passengers > capabilities.MAX_SEATS:
+        queryset = queryset.filter(max_passengers__gte=passengers)
+    return queryset
+
+
+def _cells_filter(cells):
+    """Условие попадания geohash в одну из ячеек (диапазонный поиск по индексу)"""
+    condition = Q()
+    for cell in cells:
+        condition |= Q(geohash__gte=cell, geohash__lt=cell + '~')
+    return condition
+
+
+def nearest_drivers(latitude, longitude, k=5, tariff=None, queryset=None):
+    """
+    k ближайших к точке подачи водителей.
+    Возвращает список водителей по возрастанию расстояния, у каждого
+    заполнен атрибут distance_km. Водители без координат не учитываются.
+    """
+    if queryset is None:
+        queryset = eligible_drivers(tariff)
+
+    found = {}
+    ranked = []
+    for precision, rings in SEARCH_STEPS:
+        cells = neighbour_cells(latitude, longitude, precision, rings)
+        for driver in queryset.filter(_cells_filter(cells)):
+            if driver.pk not in found:
+                driver.distance_km = haversine_km(latitude, longitude, driver.latitude, driver.longitude)
+                found[driver.pk] = driver
+
+        ranked = sorted(found.values(), key=lambda d: (d.distance_km, d.pk))
+        # Результат окончателен, если k-й водитель внутри гарантированно покрытого радиуса
+        radius = covered_radius_km(latitude, precision) * rings
+        if len(ranked) >= k and ranked[k - 1].distance_km <= radius:
+            break
+    return ranked[:k]
+
+
+def nearest_drivers_linear(latitude, longitude, k=5, tariff=None, queryset=None):
+    """Эталонный поиск полным перебором (для проверки и бенчмарков)"""
+    if queryset is None:
+        queryset = eligible_drivers(tariff)
+    ranked = []
+    for driver in queryset.exclude(geohash=''):
+        driver.distance_km = haversine_km(latitude, longitude, driver.latitude, driver.longitude)
+        ranked.append(driver)
+    ranked.sort(key=lambda d: (d.distance_km, d.pk))
+    return ranked[:k]
+
+
+def find_drivers(tariff, latitude=None, longitude=None, k=CLAIM_CANDIDATES):
+    """Кандидаты для нового заказа: ближайшие, если известна точка подачи"""
+    if latitude is not None and longitude is not None:
+        nearest = nearest_drivers(latitude, longitude, k=k, tariff=tariff)
+        if nearest:
+            return nearest
+    return list(eligible_drivers(tariff)[:k])
+
+
+def claim_driver(driver):
+    """
+    Атомарно переводит водителя из available в busy.
+    Условный UPDATE меняет только колонку status и срабатывает ровно
+    для одного из конкурирующих запросов.
+    """
+    claimed = Driver.objects.filter(pk=driver.pk, status='available').update(status='busy') == 1
+    if claimed:
+        # UPDATE минует сигналы модели, поэтому счётчики статусов правим явно
+        counters.record_transition('available', 'busy')
+        surge_engine.driver_status_changed_on_commit(driver.pk, 'busy')
+        driver.status = driver._loaded_status = 'busy'
+    return claimed
+
+
+def claim_nearest_driver(tariff, latitude=None, longitude=None, attempts=CLAIM_ATTEMPTS):
+    """Захватывает ближайшего свободного водителя, повторяя поиск при гонке"""
+    for _ in range(attempts):
+        candidates = find_drivers(tariff, latitude, longitude)
+        if not candidates:
+            return None
+        for driver in candidates:
+            if claim_driver(driver):
+                return driver
+    return None
+
+
+def _is_lock_error(error):
+    return 'locked' in str(error)
+
+
+def place_order(order, attempts=ORDER_ATTEMPTS):
+    """
+    Сохраняет новый заказ и назначает ему водителя в одной транзакции.
+    Если водитель не найден, заказ остаётся в статусе pending.
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                driver = claim_nearest_driver(order.tariff, order.pickup_latitude, order.pickup_longitude)
+                order.driver = driver
+                order.status = 'accepted' if driver else 'pending'
+                order.save()
+            return order
+        except OperationalError as error:
+            # Конкурирующий писатель держит блокировку SQLite - повторяем с паузой
+            if not _is_lock_error(error) or attempt == attempts - 1:
+                raise
+            order.driver = None
+            time.sleep(LOCK_BACKOFF * (attempt + 1) * random.uniform(1, 2))
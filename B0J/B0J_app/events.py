@@ -0,0 +1,286 @@
+"""
+Живые события заказов для SSE: pub/sub в памяти процесса.
+Изменения публикуются сигналами модели и диспетчером после фиксации
+транзакции; подписчик - это очередь в цикле событий, без потока на клиента.
+Изменения из других процессов (например, run_dispatcher) подхватывает один
+на цикл событий опрос базы по всем заказам, на которые кто-то подписан.
+"""
+import asyncio
+import itertools
+import json
+import re
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+
+TERMINAL_STATUSES = frozenset({'completed', 'cancelled'})
+# Сколько событий может ждать медленного клиента; старые вытесняются
+QUEUE_SIZE = 16
+# Как часто процесс проверяет изменения, сделанные другими процессами
+POLL_SECONDS = 1.0
+# Комментарий-пинг держит соединение живым через прокси
+HEARTBEAT_SECONDS = 15
+# Через сколько миллисекунд EventSource переподключается после закрытия потока
+RETRY_MS = 3000
+
+
+def payload(order_id, status, driver):
+    """Данные события: статус заказа и назначенный водитель"""
+    from .models import Order
+    return {
+        'order': order_id,
+        'status': status,
+        'status_display': dict(Order.STATUS_CHOICES).get(status, status),
+        'driver': driver and {
+            'id': driver.pk,
+            'name': driver.name,
+            'car_model': driver.car_model,
+            'car_number': driver.car_number,
+            'phone': driver.phone,
+        },
+    }
+
+
+def order_payload(order):
+    return payload(order.pk, order.status, order.driver if order.driver_id else None)
+
+
+def _load_states(order_ids):
+    from .models import Order
+    close_old_connections()
+    return {order.pk: order_payload(order) for order in Order.objects.select_related('driver').filter(pk__in=order_ids)}
+
+
+def _state(data):
+    return data['status'], data['driver'] and data['driver']['id']
+
+
+def _call_in_loop(loop, callback, *args):
+    """Планирует вызов в цикле событий из любого потока; False, если цикл уже закрыт"""
+    if loop.is_closed():
+        return False
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # Цикл закрылся между проверкой и вызовом
+        return False
+    return True
+
+
+class Subscription:
+    """Подписка одного клиента на события одного заказа"""
+
+    def __init__(self, broker, order_id, loop):
+        self.broker = broker
+        self.order_id = order_id
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Выполняется в цикле событий подписчика
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """Следующее событие (id, данные) или None, если за timeout ничего не пришло"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class OrderEventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        # Последнее разосланное состояние (status, driver_id) каждого заказа -
+        # повторы (сигнал и опрос об одном изменении) отбрасываются
+        self._states = {}
+        self._ids = itertools.count(1)
+        self._loop_subscribers = Counter()
+        self._pollers = {}
+        # Все запросы брокера к базе - в одном потоке на процесс, а не в потоке соединения
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='order-events')
+
+    def subscribe(self, order_id):
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(self, order_id, loop)
+        with self._lock:
+            self._subscribers[order_id].add(subscription)
+            self._loop_subscribers[loop] += 1
+            if loop not in self._pollers:
+                self._pollers[loop] = loop.create_task(self._poll(loop))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.order_id)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.order_id]
+                self._states.pop(subscription.order_id, None)
+            loop = subscription.loop
+            self._loop_subscribers[loop] -= 1
+            if self._loop_subscribers[loop]:
+                return
+            del self._loop_subscribers[loop]
+            poller = self._pollers.pop(loop, None)
+        if poller is not None:
+            _call_in_loop(loop, poller.cancel)
+
+    def watching(self, order_id):
+        return order_id in self._subscribers
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(self._loop_subscribers.values())
+
+    async def load(self, order_ids):
+        """Текущие данные событий по заказам {id: данные}"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, _load_states, list(order_ids))
+
+    def seen(self, data):
+        """Запоминает состояние, уже отправленное клиенту при подключении"""
+        with self._lock:
+            if data['order'] in self._subscribers:
+                self._states.setdefault(data['order'], _state(data))
+
+    def publish(self, data):
+        """Рассылает состояние заказа подписчикам; можно вызывать из любого потока"""
+        order_id, state = data['order'], _state(data)
+        with self._lock:
+            subscribers = list(self._subscribers.get(order_id, ()))
+            if not subscribers or self._states.get(order_id) == state:
+                return
+            self._states[order_id] = state
+            event = (next(self._ids), data)
+        for subscription in subscribers:
+            if not _call_in_loop(subscription.loop, subscription.deliver, event):
+                # Цикл подписчика закрыт без отписки: доставлять некуда
+                self.unsubscribe(subscription)
+
+    async def _poll(self, loop):
+        """Один запрос в POLL_SECONDS на все заказы, которые смотрят клиенты этого цикла"""
+        while True:
+            await asyncio.sleep(POLL_SECONDS)
+            with self._lock:
+                watched = {
+                    order_id: self._states.get(order_id)
+                    for order_id, subscribers in self._subscribers.items()
+                    if any(subscription.loop is loop for subscription in subscribers)
+                }
+            if not watched:
+                continue
+            for order_id, data in (await self.load(watched)).items():
+                if watched[order_id] != _state(data):
+                    self.publish(data)
+
+
+broker = OrderEventBroker()
+
+
+def publish_on_commit(order_id, status, driver):
+    """
+    Публикует состояние заказа после фиксации транзакции, если на него кто-то
+    подписан в этом процессе (остальные процессы узнают об изменении опросом)
+    """
+    if broker.watching(order_id):
+        data = payload(order_id, status, driver)
+        transaction.on_commit(lambda: broker.publish(data))
+
+
+def format_event(event_id, data):
+    return f"id: {event_id}\nevent: status\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def snapshot(current):
+    """
+    Начало потока: интервал переподключения и текущее состояние. Без живого
+    потока (см. views.order_events) этим ответ и ограничивается, а EventSource
+    опрашивает сервер, переподключаясь через RETRY_MS.
+    """
+    return f"retry: {RETRY_MS}\n{format_event(0, current)}"
+
+
+async def stream(subscription, current):
+    """
+    Текст потока Server-Sent Events: текущее состояние сразу, затем каждое
+    изменение; поток заканчивается после финального статуса
+    """
+    try:
+        yield snapshot(current)
+        status = current['status']
+        while status not in TERMINAL_STATUSES:
+            event = await subscription.get(HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": ping\n\n"
+                continue
+            event_id, data = event
+            status = data['status']
+            yield format_event(event_id, data)
+    finally:
+        subscription.close()
+
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    # Не даём nginx буферизовать поток
+    (b'x-accel-buffering', b'no'),
+]
+EVENTS_PATH = re.compile(r'^/order/(?P<pk>[0-9]+)/events$')
+
+
+def route_order_events(application):
+    """
+    ASGI-обёртка: потоки событий заказов обслуживаются до Django. Ответ
+    Django держит свой поток (middleware работает через sync_to_async) до конца
+    ответа, и для долгого SSE это поток на соединение. Здесь соединение -
+    только корутина; сессии и авторизация потоку не нужны.
+    """
+    async def router(scope, receive, send):
+        match = scope['type'] == 'http' and scope['method'] == 'GET' and EVENTS_PATH.match(scope['path'])
+        if not match:
+            return await application(scope, receive, send)
+        await order_events_application(int(match['pk']), receive, send)
+    return router
+
+
+async def order_events_application(order_id, receive, send):
+    subscription = broker.subscribe(order_id)
+    current = (await broker.load([order_id])).get(order_id)
+    if current is None:
+        subscription.close()
+        await send({'type': 'http.response.start', 'status': 404,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': 'Заказ не найден'.encode()})
+        return
+    broker.seen(current)
+
+    async def pump():
+        await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+        async for chunk in stream(subscription, current):
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        subscription.close()
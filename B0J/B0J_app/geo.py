@@ -0,0 +1,89 @@
+"""Геопространственные утилиты: geohash и расстояние по поверхности Земли"""
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Точность, с которой geohash хранится у водителя (~150 x 150 м)
+GEOHASH_PRECISION = 7
+
+
+def encode_geohash(lat, lon, precision=GEOHASH_PRECISION):
+    """Кодирует координаты в строку geohash заданной длины"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Размер ячейки geohash в градусах: (широта, долгота)"""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def neighbour_cells(lat, lon, precision, rings=1):
+    """
+    Ячейка точки и окружающие её кольца ячеек на заданной точности.
+    При rings=1 это блок 3x3, при rings=2 - 5x5 и т.д.
+    """
+    dlat, dlon = cell_size(precision)
+    offsets = range(-rings, rings + 1)
+    cells = set()
+    for i in offsets:
+        cell_lat = max(-90.0, min(90.0, lat + i * dlat))
+        for j in offsets:
+            cell_lon = (lon + j * dlon + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(cell_lat, cell_lon, precision))
+    return sorted(cells)
+
+
+def covered_radius_km(lat, precision):
+    """
+    Радиус вокруг точки, который гарантированно покрыт одним кольцом ячеек.
+    Любая точка ближе этого расстояния лежит в блоке 3x3 вокруг точки;
+    для N колец радиус растёт в N раз.
+    """
+    dlat, dlon = cell_size(precision)
+    lat_km = dlat * KM_PER_DEGREE
+    lon_km = dlon * KM_PER_DEGREE * math.cos(math.radians(lat))
+    return min(lat_km, lon_km)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Расстояние между двумя точками по большому кругу в километрах"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,191 @@
+"""
+Приём сигналов присутствия (heartbeat) от приложений водителей.
+
+Приложение присылает позицию и статус раз в несколько секунд. Отчёты копятся
+в памяти процесса, от каждого водителя хранится только последний; раз в
+FLUSH_SECONDS фоновый поток записывает их в одной транзакции: позиции одним
+executemany, смены статуса - условными UPDATE по спискам id. Там же водители,
+от которых нет сигнала дольше OFFLINE_AFTER_SECONDS, переводятся в offline.
+
+Статус busy ведут заказы (dispatch.py, matcher.py): сигнал обновляет позицию
+занятого водителя, но не его статус, и по таймауту снимаются только свободные.
+Водители без единого сигнала (last_seen_at пуст) таймаутом не затрагиваются.
+
+Приложение подписывает сигнал токеном своего водителя (driver_token, выдаёт
+команда driver_token): это HMAC от id на SECRET_KEY, и он проверяется без
+обращения к базе.
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from . import counters
+from .bulk import chunked
+from .models import Driver
+from .surge import engine as surge_engine
+
+FLUSH_SECONDS = 1.0
+# 6 пропущенных сигналов при интервале приложения 5 секунд
+OFFLINE_AFTER_SECONDS = 30
+# Статусы, которые водитель выбирает сам; busy назначает диспетчер
+REPORTED_STATUSES = ('available', 'offline')
+# Размер списков id в условиях IN
+ID_CHUNK = 900
+
+# Соль токенов приложения водителя: токены других подписей Django сюда не подходят
+TOKEN_SALT = 'B0J_app.heartbeats.driver'
+
+Report = namedtuple('Report', ['latitude', 'longitude', 'status', 'seen_at'])
+
+
+class FlushResult:
+    """Итоги одной записи буфера"""
+
+    def __init__(self):
+        self.reports = 0
+        self.online = 0
+        self.offline = 0
+        self.timed_out = 0
+        self.started = time.perf_counter()
+        self.ms = 0.0
+
+    def __str__(self):
+        return (
+            f"сигналов {self.reports}, вышли на линию {self.online}, ушли {self.offline}, "
+            f"сняты по таймауту {self.timed_out}, {self.ms:.1f} мс"
+        )
+
+
+def driver_token(driver_id):
+    """Токен приложения водителя для подписи сигналов"""
+    return salted_hmac(TOKEN_SALT, str(driver_id), algorithm='sha256').hexdigest()
+
+
+def check_token(driver_id, token):
+    """True, если токен выдан именно этому водителю"""
+    return bool(token) and constant_time_compare(driver_token(driver_id), token)
+
+
+def _position_sql():
+    quote = connection.ops.quote_name
+    # Не даём отчёту, задержавшемуся в другом процессе, перезаписать более свежий
+    return (
+        f"UPDATE {quote(Driver._meta.db_table)} SET "
+        f"latitude = COALESCE(%s, latitude), longitude = COALESCE(%s, longitude), "
+        f"geohash = COALESCE(%s, geohash), last_seen_at = %s "
+        f"WHERE id = %s AND (last_seen_at IS NULL OR last_seen_at < %s)"
+    )
+
+
+def _switch(ids, old_status, new_status):
+    """Переводит водителей из old_status в new_status, возвращает id тех, кого перевели"""
+    switched = []
+    for chunk in chunked(ids, ID_CHUNK):
+        found = list(
+            Driver.objects.select_for_update().filter(pk__in=chunk, status=old_status).values_list('pk', flat=True)
+        )
+        if found:
+            Driver.objects.filter(pk__in=found).update(status=new_status)
+            switched.extend(found)
+    return switched
+
+
+def write_reports(reports, now=None):
+    """
+    Записывает отчёты {id водителя: Report} и снимает с линии молчащих
+    водителей. Одна транзакция; счётчики статусов и surge правятся по
+    фактически переведённым водителям.
+    """
+    now = now or timezone.now()
+    result = FlushResult()
+    result.reports = len(reports)
+    adapt = connection.ops.adapt_datetimefield_value
+    rows = []
+    for driver_id, report in reports.items():
+        geohash = None if report.latitude is None else Driver.compute_geohash(report.latitude, report.longitude)
+        seen_at = adapt(report.seen_at)
+        rows.append((report.latitude, report.longitude, geohash, seen_at, driver_id, seen_at))
+    by_status = {status: [pk for pk, report in reports.items() if report.status == status] for status in REPORTED_STATUSES}
+    with transaction.atomic():
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(_position_sql(), rows)
+        online = _switch(by_status['available'], 'offline', 'available')
+        offline = _switch(by_status['offline'], 'available', 'offline')
+        stale = list(
+            Driver.objects.select_for_update()
+            .filter(status='available', last_seen_at__lt=now - timedelta(seconds=OFFLINE_AFTER_SECONDS))
+            .values_list('pk', flat=True)
+        )
+        for chunk in chunked(stale, ID_CHUNK):
+            Driver.objects.filter(pk__in=chunk, status='available').update(status='offline')
+        went_offline = len(offline) + len(stale)
+        if online or went_offline:
+            # UPDATE минует сигналы модели: счётчики (и версию страниц водителей) правим явно
+            counters.adjust({'available': len(online) - went_offline, 'offline': went_offline - len(online)})
+    for pk in online:
+        surge_engine.driver_status_changed(pk, 'available')
+    for pk in offline + stale:
+        surge_engine.driver_status_changed(pk, 'offline')
+    result.online, result.offline, result.timed_out = len(online), len(offline), len(stale)
+    result.ms = (time.perf_counter() - result.started) * 1000
+    return result
+
+
+class HeartbeatBuffer:
+    """
+    Последние отчёты водителей до следующей записи. Фоновый поток
+    запускается при первом отчёте, если autoflush включён.
+    """
+
+    def __init__(self, interval=FLUSH_SECONDS, autoflush=True):
+        self.interval = interval
+        self.autoflush = autoflush
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reports = {}
+        self._thread = None
+
+    def record(self, driver_id, latitude=None, longitude=None, status='available', seen_at=None):
+        report = Report(latitude, longitude, status, seen_at or timezone.now())
+        with self._lock:
+            self._reports[driver_id] = report
+            if self.autoflush and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='driver-heartbeats', daemon=True)
+                self._thread.start()
+
+    def pending(self):
+        with self._lock:
+            return len(self._reports)
+
+    def flush(self):
+        """Забирает накопленные отчёты и записывает их; одновременно пишет только один поток"""
+        with self._flush_lock:
+            with self._lock:
+                reports, self._reports = self._reports, {}
+            try:
+                return write_reports(reports)
+            except Exception:
+                # Не теряем отчёты: более свежие, пришедшие за время записи, важнее
+                with self._lock:
+                    for driver_id, report in reports.items():
+                        self._reports.setdefault(driver_id, report)
+                raise
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                # База занята или недоступна: отчёты остались в буфере, повторим на следующем шаге
+                connection.close()
+
+
+buffer = HeartbeatBuffer()
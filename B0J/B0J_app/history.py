@@ -0,0 +1,42 @@
+"""
+Чтение истории заказов из рабочей таблицы и архива как из одной.
+Активные заказы (диспетчеризация, SSE, оформление) читают только Order.
+"""
+import heapq
+
+from asgiref.sync import sync_to_async
+
+from .models import ArchivedOrder, Order
+from .pagination import keyset_query, keyset_result
+
+HISTORY_ORDERING = ['-created_at', '-id']
+RELATED = ('tariff', 'driver', 'payment_method')
+
+
+def get_order(pk, related=RELATED):
+    """Заказ по id из рабочей таблицы или архива; Order.DoesNotExist, если его нет нигде"""
+    for model in (Order, ArchivedOrder):
+        try:
+            return model.objects.select_related(*related).get(pk=pk)
+        except model.DoesNotExist:
+            pass
+    raise Order.DoesNotExist(f"Заказ {pk} не найден")
+
+
+async def aget_order(pk, related=RELATED):
+    """Асинхронный вариант get_order"""
+    return await sync_to_async(get_order)(pk, related)
+
+
+def history_page(cursor=None, per_page=20, **filters):
+    """
+    Страница истории по обеим таблицам, от новых к старым. Из каждой таблицы
+    читается не больше per_page + 1 строк после курсора, затем они сливаются.
+    """
+    items = []
+    for model in (Order, ArchivedOrder):
+        queryset = model.objects.select_related(*RELATED).filter(**filters)
+        queryset, cursor = keyset_query(queryset, HISTORY_ORDERING, cursor)
+        items.append(list(queryset[:per_page + 1]))
+    merged = heapq.merge(*items, key=lambda order: (order.created_at, order.pk), reverse=True)
+    return keyset_result(list(merged)[:per_page + 1], HISTORY_ORDERING, cursor, per_page)
@@ -0,0 +1,42 @@
+"""Общие помощники для команд-бенчмарков"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def rollback_after():
+    """Выполняет блок в транзакции и откатывает её, чтобы не засорять базу"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(func, repeat):
+    """Запускает func repeat раз и возвращает задержки в миллисекундах"""
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    """Перцентиль по отсортированной выборке (метод ближайшего ранга)"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summary(samples):
+    """Краткая сводка по задержкам"""
+    return (
+        f"mean={statistics.fmean(samples):.3f} ms  "
+        f"p50={percentile(samples, 50):.3f} ms  "
+        f"p95={percentile(samples, 95):.3f} ms"
+    )
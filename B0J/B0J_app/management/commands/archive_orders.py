@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from B0J_app.archive import ARCHIVE_BATCH, ARCHIVE_PAUSE, archive_orders
+
+
+class Command(BaseCommand):
+    help = "Переносит старые завершённые и отменённые заказы в архив короткими транзакциями"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Возраст заказа в днях (по умолчанию ORDER_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH, help="Заказов в одной транзакции")
+        parser.add_argument('--pause', type=float, default=ARCHIVE_PAUSE, help="Пауза между пачками, с")
+        parser.add_argument('--limit', type=int, help="Перенести не больше стольких заказов")
+
+    def handle(self, *args, **options):
+        run = archive_orders(
+            days=options['days'], batch_size=options['batch_size'],
+            pause=options['pause'], limit=options['limit'],
+        )
+        self.stdout.write(self.style.SUCCESS(str(run)))
@@ -0,0 +1,103 @@
+import random
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from B0J_app.admin import OrderAdmin
+from B0J_app.bulk import keep_timestamps, random_name, random_street
+from B0J_app.models import Driver, Order, PaymentMethod, Tariff
+
+from ._bench import measure, rollback_after, summary
+
+STATUSES = [status for status, _ in Order.STATUS_CHOICES]
+
+
+class LegacyOrderAdmin(admin.ModelAdmin):
+    """Прежняя настройка: без JOIN, точный COUNT(*), поиск LIKE '%...%' по всем полям"""
+    list_display = ['id', 'customer_name', 'customer_phone', 'tariff', 'driver', 'total_price', 'status', 'is_paid', 'created_at']
+    list_filter = ['status', 'is_paid', 'tariff', 'payment_method']
+    search_fields = ['customer_name', 'customer_phone', 'pickup_address', 'destination_address']
+    list_editable = ['status', 'is_paid']
+
+
+class Command(BaseCommand):
+    help = "Время открытия списка заказов в админке на большой таблице: прежняя настройка против новой"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000000, help="Сколько заказов должно быть в таблице")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with rollback_after():
+            missing = options['orders'] - Order.objects.count()
+            if missing > 0:
+                self.stdout.write(f"Досоздаём {missing} заказов (будут откачены)")
+                self.seed(random.Random(options['seed']), missing)
+            phone = Order.objects.order_by('-pk').values_list('customer_phone', flat=True).first()
+            user = get_user_model().objects.create_superuser('bench-admin', 'bench@example.com', 'bench')
+            year = timezone.localdate().year
+            pages = [
+                ('список', {}),
+                ('страница 200', {'p': 200}),
+                ('фильтр статуса', {'status__exact': 'completed'}),
+                ('поиск телефона', {'q': phone[:8]}),
+                ('год в иерархии дат', {'created_at__year': year}),
+            ]
+            with override_settings(ALLOWED_HOSTS=['localhost'], DEBUG=False):
+                for label, variant in [('прежняя', LegacyOrderAdmin), ('новая', OrderAdmin)]:
+                    self.stdout.write(f"--- {label} настройка")
+                    self.run(user, variant(Order, admin.site), pages, options['repeat'])
+
+    def seed(self, rng, count):
+        tariffs = list(Tariff.objects.all()) or [
+            Tariff.objects.create(name=name, base_price=100, price_per_km=20, price_per_minute=5)
+            for name, _ in Tariff.TARIFF_TYPES
+        ]
+        payment_methods = list(PaymentMethod.objects.all())
+        drivers = list(Driver.objects.all()[:1000]) or Driver.objects.bulk_create(
+            Driver(name=f"Bench {i}", car_model="Bench", car_number=f"B{i:06d}", phone="+70000000000")
+            for i in range(1000)
+        )
+        now = timezone.now()
+        with keep_timestamps(Order, 'created_at'):
+            for start in range(0, count, 20000):
+                Order.objects.bulk_create([
+                    Order(
+                        customer_name=random_name(rng), customer_phone=f"+79{rng.randrange(10**9):09d}",
+                        pickup_address=random_street(rng), destination_address=random_street(rng),
+                        tariff=rng.choice(tariffs), driver=rng.choice(drivers), payment_method=rng.choice(payment_methods),
+                        total_price=rng.randrange(150, 3000), status=rng.choice(STATUSES), is_paid=rng.random() < 0.6,
+                        created_at=now - timedelta(seconds=rng.randrange(2 * 365 * 86400)),
+                    )
+                    for _ in range(min(20000, count - start))
+                ], batch_size=2000)
+
+    def run(self, user, model_admin, pages, repeat):
+        factory = RequestFactory(HTTP_HOST='localhost')
+
+        def load(params):
+            request = factory.get('/admin/B0J_app/order/?' + urlencode(params))
+            request.user = user
+            response = model_admin.changelist_view(request)
+            if response.status_code != 200:
+                raise CommandError(f"{params}: код ответа {response.status_code}")
+            response.render()
+            return response
+
+        for label, params in pages:
+            queries = []
+            with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+                response = load(params)
+            samples = measure(lambda i: load(params), repeat)
+            self.stdout.write(
+                f"{label:<20} строк {response.context_data['cl'].result_count:>8}  запросов {len(queries):>3}  "
+                f"{summary(samples)}"
+            )
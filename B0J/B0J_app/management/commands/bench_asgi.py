@@ -0,0 +1,183 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+
+from ._bench import percentile
+
+BENCH_MARKER = "bench-asgi"
+PAGES = ['/', '/drivers/', '/payment-methods/', '/calculate/']
+# Задержка каждого SQL-запроса в серверах бенчмарка: имитация сетевой СУБД
+LATENCY_ENV = 'B0J_BENCH_DB_LATENCY_MS'
+
+
+def _delay_query(execute, sql, params, many, context):
+    time.sleep(float(os.environ[LATENCY_ENV]) / 1000)
+    return execute(sql, params, many, context)
+
+
+def _delay_queries(sender, connection, **kwargs):
+    # Объект соединения переживает переподключения - обёртку добавляем один раз
+    if _delay_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_delay_query)
+
+
+def _install_latency():
+    if float(os.environ.get(LATENCY_ENV) or 0):
+        connection_created.connect(_delay_queries)
+
+
+def wsgi_application():
+    """Фабрика приложения для gunicorn (с задержкой запросов, если она задана)"""
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+    _install_latency()
+    return application
+
+
+def asgi_application():
+    """Фабрика приложения для uvicorn (с задержкой запросов, если она задана)"""
+    from django.core.asgi import get_asgi_application
+    application = get_asgi_application()
+    _install_latency()
+    return application
+
+
+async def fetch(port, path):
+    """
+    GET по новому соединению с Connection: close - одинаково для обоих серверов
+    (keep-alive в gthread добавляет собственные задержки цикла опроса)
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def load(port, concurrency, total):
+    """concurrency одновременных клиентов, всего total запросов"""
+    latencies, errors = [], []
+    remaining = iter(range(total))
+
+    async def client(number):
+        for i in remaining:
+            started = time.perf_counter()
+            try:
+                status = await fetch(port, PAGES[(number + i) % len(PAGES)])
+            except (OSError, IndexError, ValueError) as error:
+                errors.append(error)
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                errors.append(status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Сервер завершился с кодом {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"Сервер не открыл порт {port} за {timeout} с")
+
+
+class Command(BaseCommand):
+    help = "Страницы только для чтения: WSGI (gunicorn, потоки) против ASGI (uvicorn, async-представления)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='4,16,64', help="Уровни одновременных клиентов через запятую")
+        parser.add_argument('--requests', type=int, default=1000, help="Запросов на каждый уровень")
+        parser.add_argument('--threads', type=int, default=4, help="Потоков у процесса gunicorn")
+        parser.add_argument('--drivers', type=int, default=200)
+        parser.add_argument('--db-latency-ms', type=float, default=0.0,
+                            help="Добавить задержку к каждому SQL-запросу (как у СУБД по сети)")
+
+    def handle(self, *args, **options):
+        from B0J_app.models import Driver, Tariff
+
+        for module in ('uvicorn', 'gunicorn'):
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f"Для бенчмарка нужен пакет {module}: pip install {module}")
+
+        tariff = Tariff.objects.create(
+            name='economy', base_price=100, price_per_km=20, price_per_minute=5, description=BENCH_MARKER,
+        )
+        try:
+            drivers = Driver.objects.bulk_create(
+                Driver(name=f"Bench {i}", car_model=BENCH_MARKER, car_number=f"B{i:06d}", phone="+70000000000")
+                for i in range(options['drivers'])
+            )
+            Through = Driver.available_tariffs.through
+            Through.objects.bulk_create(Through(driver_id=d.pk, tariff_id=tariff.pk) for d in drivers)
+            levels = [int(level) for level in options['concurrency'].split(',')]
+            servers = {
+                f"WSGI gunicorn, 1 процесс x {options['threads']} потока": [
+                    sys.executable, '-m', 'gunicorn', f'{__name__}:wsgi_application()',
+                    '--workers', '1', '--worker-class', 'gthread', '--threads', str(options['threads']),
+                    '--log-level', 'warning',
+                ],
+                "ASGI uvicorn, 1 процесс": [
+                    sys.executable, '-m', 'uvicorn', f'{__name__}:asgi_application', '--factory',
+                    '--workers', '1', '--log-level', 'warning', '--no-access-log',
+                ],
+            }
+            if options['db_latency_ms']:
+                self.stdout.write(f"Задержка каждого SQL-запроса: {options['db_latency_ms']} мс")
+            for label, command in servers.items():
+                self.run_server(label, command, levels, options['requests'], options['db_latency_ms'])
+        finally:
+            Driver.objects.filter(car_model=BENCH_MARKER).delete()
+            tariff.delete()
+
+    def run_server(self, label, command, levels, total, latency_ms):
+        port = free_port()
+        if 'uvicorn' in command:
+            command = command + ['--port', str(port)]
+        else:
+            command = command + ['--bind', f'127.0.0.1:{port}']
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'B0J_project.settings'),
+            **{LATENCY_ENV: str(latency_ms)},
+        )
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            wait_for_port(port, process)
+            # Прогрев: загрузка шаблонов и справочников
+            asyncio.run(load(port, 2, 20))
+            self.stdout.write(label)
+            for concurrency in levels:
+                latencies, errors, elapsed = asyncio.run(load(port, concurrency, total))
+                self.stdout.write(
+                    f"  клиентов {concurrency:>4}: {len(latencies) / elapsed:7.1f} запр/с, "
+                    f"p50={percentile(latencies, 50):.1f} ms p95={percentile(latencies, 95):.1f} ms "
+                    f"p99={percentile(latencies, 99):.1f} ms, ошибок {len(errors)}"
+                )
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
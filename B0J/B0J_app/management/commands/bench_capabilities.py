@@ -0,0 +1,86 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from B0J_app.bulk import random_point
+from B0J_app.dispatch import eligible_drivers
+from B0J_app.models import Driver, Tariff
+
+from ._bench import measure, rollback_after, summary
+
+
+def joined_drivers(tariff, child_seat=False, cargo_space=False, passengers=0):
+    """Прежний отбор: JOIN с таблицей связей и отдельные колонки оснащения"""
+    queryset = Driver.objects.filter(status='available', available_tariffs=tariff)
+    if child_seat:
+        queryset = queryset.filter(has_child_seat=True)
+    if cargo_space:
+        queryset = queryset.filter(has_cargo_space=True)
+    if passengers:
+        queryset = queryset.filter(max_passengers__gte=passengers)
+    return queryset
+
+
+class Command(BaseCommand):
+    help = "Отбор подходящих водителей: JOIN с тарифами против битовой маски возможностей"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drivers', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=20, help="Сколько водителей выбирает один запрос")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with rollback_after():
+            tariffs = [
+                Tariff.objects.create(name=name, base_price=100, price_per_km=20, price_per_minute=5)
+                for name, _ in Tariff.TARIFF_TYPES
+            ]
+            self.create_drivers(rng, tariffs, options['drivers'])
+            requests = [
+                (rng.choice(tariffs), rng.random() < 0.3, rng.random() < 0.2, rng.choice([0, 0, 4, 6, 7]))
+                for _ in range(options['queries'])
+            ]
+            self.compare(requests, options['limit'])
+
+    def create_drivers(self, rng, tariffs, count):
+        drivers = []
+        for i in range(count):
+            lat, lon = random_point(rng)
+            drivers.append(Driver(
+                name=f"Bench {i}", car_model="Bench", car_number=f"B{i:06d}", phone="+70000000000",
+                status=rng.choices(['available', 'busy', 'offline'], weights=[6, 3, 1])[0],
+                has_child_seat=rng.random() < 0.2,
+                has_cargo_space=rng.random() < 0.15,
+                max_passengers=rng.choice([4, 4, 4, 5, 6, 7, 8]),
+                latitude=lat, longitude=lon, geohash=Driver.compute_geohash(lat, lon),
+            ))
+        drivers = Driver.objects.bulk_create(drivers, batch_size=2000)
+        Through = Driver.available_tariffs.through
+        Through.objects.bulk_create(
+            (Through(driver_id=d.pk, tariff_id=t.pk) for d in drivers for t in rng.sample(tariffs, rng.randint(1, 3))),
+            batch_size=5000,
+        )
+        Driver.refresh_capabilities([d.pk for d in drivers])
+        self.stdout.write(f"Создано водителей: {len(drivers)}")
+
+    def compare(self, requests, limit):
+        sample = requests[0]
+        for label, build in [("до (JOIN)", joined_drivers), ("после (маска)", eligible_drivers)]:
+            self.stdout.write(f"\nПлан {label}, выборка по рейтингу:\n{build(*sample).explain()}")
+            self.stdout.write(f"План {label}, подсчёт:\n{build(*sample).order_by().explain()}")
+        self.stdout.write("")
+
+        mismatches = 0
+        for request in requests[:20]:
+            before = set(joined_drivers(*request).values_list('pk', flat=True))
+            after = set(eligible_drivers(*request).values_list('pk', flat=True))
+            mismatches += before != after
+
+        for label, build in [("JOIN с тарифами", joined_drivers), ("Битовая маска", eligible_drivers)]:
+            fetch = measure(lambda i: list(build(*requests[i]).values_list('pk', flat=True)[:limit]), len(requests))
+            count = measure(lambda i: build(*requests[i]).count(), len(requests))
+            self.stdout.write(f"{label}: первые {limit}: {summary(fetch)}")
+            self.stdout.write(f"{' ' * len(label)}  count():    {summary(count)}")
+        self.stdout.write(f"Расхождений в наборах водителей: {mismatches}")
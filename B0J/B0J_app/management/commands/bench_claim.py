@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from B0J_app import counters
+from B0J_app.dispatch import place_order
+from B0J_app.models import Driver, Order, Tariff
+
+BENCH_MARKER = "bench-claim"
+
+
+class Command(BaseCommand):
+    help = "Нагрузочная проверка атомарного захвата водителей при создании заказов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=2000, help="Всего заказов")
+        parser.add_argument('--drivers', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        tariff = Tariff.objects.create(
+            name='economy', base_price=100, price_per_km=20, price_per_minute=5,
+            description=BENCH_MARKER, is_active=False,
+        )
+        try:
+            self.run(tariff, options)
+        finally:
+            # Убираем за собой все тестовые данные (заказы удалятся каскадом)
+            Driver.objects.filter(car_model=BENCH_MARKER).delete()
+            tariff.delete()
+
+    def run(self, tariff, options):
+        drivers = Driver.objects.bulk_create(
+            Driver(name=f"Bench {i}", car_model=BENCH_MARKER, car_number=f"B{i:06d}", phone="+70000000000")
+            for i in range(options['drivers'])
+        )
+        Through = Driver.available_tariffs.through
+        Through.objects.bulk_create(Through(driver_id=d.pk, tariff_id=tariff.pk) for d in drivers)
+        # bulk_create минует сигналы - маску возможностей и счётчики статусов считаем явно,
+        # иначе удаление водителей в конце уведёт счётчики в минус
+        Driver.refresh_capabilities([d.pk for d in drivers])
+        counters.adjust({'available': len(drivers)})
+
+        per_thread = options['orders'] // options['threads']
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(per_thread):
+                    order = Order(
+                        customer_name=BENCH_MARKER, customer_phone="+70000000000",
+                        pickup_address="A", destination_address="B", tariff=tariff,
+                    )
+                    place_order(order, attempts=100)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        orders = Order.objects.filter(tariff=tariff)
+        created = orders.count()
+        assigned = Counter(orders.exclude(driver=None).values_list('driver_id', flat=True))
+        doubles = sum(1 for count in assigned.values() if count > 1)
+
+        self.stdout.write(f"Потоков: {options['threads']}, заказов: {created}, ошибок: {len(errors)}")
+        self.stdout.write(f"Назначено водителей: {len(assigned)}, двойных назначений: {doubles}")
+        self.stdout.write(f"Пропускная способность: {created / elapsed:.1f} заказов/с")
+        if errors:
+            self.stderr.write(f"Первая ошибка: {errors[0]!r}")
@@ -0,0 +1,98 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from B0J_app.bulk import random_point
+from B0J_app.dispatch import eligible_drivers, nearest_drivers, nearest_drivers_linear
+from B0J_app.geo import haversine_km
+from B0J_app.models import Driver, Tariff
+
+from ._bench import measure, rollback_after, summary
+
+
+class Command(BaseCommand):
+    help = "Сравнивает подбор водителя через geohash-индекс с линейным фильтром"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drivers', type=int, default=20000, help="Число водителей онлайн")
+        parser.add_argument('--queries', type=int, default=200, help="Число запросов подбора")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with rollback_after():
+            tariffs = self.create_tariffs()
+            self.create_drivers(rng, tariffs, options['drivers'])
+            pickups = [(random_point(rng), rng.choice(tariffs)) for _ in range(options['queries'])]
+            self.run(pickups)
+
+    def create_tariffs(self):
+        return [
+            Tariff.objects.create(name=name, base_price=100, price_per_km=20, price_per_minute=5)
+            for name, _ in Tariff.TARIFF_TYPES
+        ]
+
+    def create_drivers(self, rng, tariffs, count):
+        drivers = []
+        for i in range(count):
+            lat, lon = random_point(rng)
+            drivers.append(Driver(
+                name=f"Bench {i}",
+                car_model="Bench",
+                car_number=f"B{i:06d}",
+                phone="+70000000000",
+                rating=round(rng.uniform(3.5, 5.0), 2),
+                status=rng.choices(['available', 'busy', 'offline'], weights=[6, 3, 1])[0],
+                latitude=lat,
+                longitude=lon,
+                geohash=Driver.compute_geohash(lat, lon),
+            ))
+        drivers = Driver.objects.bulk_create(drivers, batch_size=2000)
+
+        Through = Driver.available_tariffs.through
+        links = [
+            Through(driver_id=driver.pk, tariff_id=tariff.pk)
+            for driver in drivers
+            for tariff in rng.sample(tariffs, rng.randint(1, 3))
+        ]
+        Through.objects.bulk_create(links, batch_size=5000)
+        # bulk_create минует сигналы - маску возможностей считаем явно
+        Driver.refresh_capabilities([driver.pk for driver in drivers])
+        self.stdout.write(f"Создано водителей: {len(drivers)}, связей с тарифами: {len(links)}")
+
+    def run(self, pickups):
+        def current(i):
+            (lat, lon), tariff = pickups[i]
+            driver = eligible_drivers(tariff).first()
+            if driver is not None:
+                current_distances.append(haversine_km(lat, lon, driver.latitude, driver.longitude))
+
+        def linear(i):
+            (lat, lon), tariff = pickups[i]
+            linear_results.append(nearest_drivers_linear(lat, lon, k=1, tariff=tariff))
+
+        def indexed(i):
+            (lat, lon), tariff = pickups[i]
+            indexed_results.append(nearest_drivers(lat, lon, k=1, tariff=tariff))
+
+        current_distances, linear_results, indexed_results = [], [], []
+        repeat = len(pickups)
+        current_ms = measure(current, repeat)
+        linear_ms = measure(linear, repeat)
+        indexed_ms = measure(indexed, repeat)
+
+        mismatches = sum(
+            1 for a, b in zip(linear_results, indexed_results)
+            if [d.pk for d in a] != [d.pk for d in b]
+        )
+        nearest_distances = [r[0].distance_km for r in indexed_results if r]
+
+        self.stdout.write(f"Текущий фильтр .first():  {summary(current_ms)}")
+        self.stdout.write(f"Линейный поиск ближайшего: {summary(linear_ms)}")
+        self.stdout.write(f"Geohash-индекс:            {summary(indexed_ms)}")
+        if current_distances and nearest_distances:
+            self.stdout.write(
+                f"Среднее расстояние до водителя: текущий {sum(current_distances) / len(current_distances):.2f} км, "
+                f"ближайший {sum(nearest_distances) / len(nearest_distances):.2f} км"
+            )
+        self.stdout.write(f"Расхождений с полным перебором: {mismatches}")
@@ -0,0 +1,76 @@
+import json
+import random
+import statistics
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from B0J_app import heartbeats, views
+from B0J_app.bulk import random_point
+from B0J_app.models import Driver
+
+from ._bench import measure, rollback_after, summary
+
+
+class Command(BaseCommand):
+    help = "Сигналы водителей: приём, пакетная запись буфера и запись каждого сигнала через save()"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drivers', type=int, default=10000)
+        parser.add_argument('--interval', type=float, default=5.0, help="Интервал сигналов приложения, с")
+        parser.add_argument('--cycles', type=int, default=5, help="Сколько раз каждый водитель присылает сигнал")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        count = options['drivers']
+        with rollback_after():
+            drivers = Driver.objects.bulk_create(
+                (Driver(name=f"Bench {i}", car_model="Bench", car_number=f"B{i:06d}", phone="+7", status='offline')
+                 for i in range(count)),
+                batch_size=2000,
+            )
+            ids = [driver.pk for driver in drivers]
+            rate = count / options['interval']
+            self.stdout.write(f"{count} водителей, сигнал раз в {options['interval']:g} с: {rate:.0f} сигналов в секунду")
+
+            factory = RequestFactory()
+            buffer = heartbeats.HeartbeatBuffer(autoflush=False)
+            heartbeats.buffer, saved_buffer = buffer, heartbeats.buffer
+            try:
+                requests = [
+                    factory.post('/api/drivers/heartbeat', data=json.dumps(
+                        {'driver': pk, 'lat': lat, 'lon': lon, 'status': 'available'}), content_type='application/json',
+                        HTTP_AUTHORIZATION=f"Bearer {heartbeats.driver_token(pk)}")
+                    for pk, (lat, lon) in ((pk, random_point(rng)) for pk in ids)
+                ]
+                accept = measure(lambda i: views.driver_heartbeat(requests[i]), count)
+                self.stdout.write(f"Приём сигнала (представление): {summary(accept)}")
+                flushes = [buffer.flush()]
+                for _ in range(options['cycles'] - 1):
+                    for pk in ids:
+                        buffer.record(pk, *random_point(rng))
+                    flushes.append(buffer.flush())
+            finally:
+                heartbeats.buffer = saved_buffer
+            self.stdout.write(f"Первая запись (все выходят на линию): {flushes[0]}")
+            steady = [flush.ms for flush in flushes[1:]]
+            if steady:
+                self.stdout.write(
+                    f"Запись буфера {count} позиций: {summary(steady)}; "
+                    f"они приходят за {options['interval']:g} с, запись занимает "
+                    f"{statistics.fmean(steady) / 1000 / options['interval']:.1%} этого времени"
+                )
+
+            sample = drivers[:1000]
+
+            def save_each(i):
+                driver = sample[i]
+                driver.latitude, driver.longitude = random_point(rng)
+                driver.save(update_fields=['latitude', 'longitude'])
+
+            samples = measure(save_each, len(sample))
+            self.stdout.write(
+                f"Для сравнения save() на каждый сигнал: {summary(samples)}; "
+                f"{rate:.0f} сигналов/с заняли бы {statistics.fmean(samples) * rate / 1000:.0%} времени одного ядра"
+            )
@@ -0,0 +1,77 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from B0J_app.bulk import random_point
+from B0J_app.geo import haversine_km
+from B0J_app.matcher import run_tick
+from B0J_app.models import Driver, Order, Tariff
+
+from ._bench import rollback_after
+
+
+class Command(BaseCommand):
+    help = "Один проход диспетчера на синтетических данных; сравнение с жадным назначением"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=3000)
+        parser.add_argument('--drivers', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with rollback_after():
+            tariffs = [
+                Tariff.objects.create(name=name, base_price=100, price_per_km=20, price_per_minute=5)
+                for name, _ in Tariff.TARIFF_TYPES
+            ]
+            drivers = []
+            for i in range(options['drivers']):
+                lat, lon = random_point(rng)
+                drivers.append(Driver(
+                    name=f"Bench {i}", car_model="Bench", car_number=f"B{i:06d}", phone="+7",
+                    latitude=lat, longitude=lon, geohash=Driver.compute_geohash(lat, lon),
+                ))
+            drivers = Driver.objects.bulk_create(drivers, batch_size=2000)
+            Through = Driver.available_tariffs.through
+            Through.objects.bulk_create(
+                [Through(driver_id=d.pk, tariff_id=t.pk) for d in drivers for t in rng.sample(tariffs, 2)],
+                batch_size=5000,
+            )
+            Driver.refresh_capabilities([d.pk for d in drivers])
+            orders = []
+            for i in range(options['orders']):
+                lat, lon = random_point(rng)
+                orders.append(Order(
+                    customer_name=f"Bench {i}", customer_phone="+7", pickup_address="A", destination_address="B",
+                    tariff=rng.choice(tariffs), pickup_latitude=lat, pickup_longitude=lon,
+                ))
+            Order.objects.bulk_create(orders, batch_size=2000)
+
+            greedy_km, greedy_count = self.greedy(drivers, orders)
+            tick = run_tick(seed=options['seed'])
+            self.stdout.write(f"Пакетный проход: {tick}")
+            self.stdout.write(
+                f"Жадно по порядку заказов: назначено {greedy_count}, подача {greedy_km:.1f} км; "
+                f"пакетно: назначено {tick.assigned}, подача {tick.total_cost / 1000:.1f} км"
+            )
+
+    def greedy(self, drivers, orders):
+        """Первый пришёл - ближайший свободный водитель (в памяти, для сравнения)"""
+        tariffs_of = {}
+        for driver_id, tariff_id in Driver.available_tariffs.through.objects.values_list('driver_id', 'tariff_id'):
+            tariffs_of.setdefault(driver_id, set()).add(tariff_id)
+        free = {d.pk: d for d in drivers}
+        total, count = 0.0, 0
+        for order in orders:
+            best, best_distance = None, 15.0
+            for driver in free.values():
+                if order.tariff_id in tariffs_of.get(driver.pk, ()):
+                    distance = haversine_km(order.pickup_latitude, order.pickup_longitude, driver.latitude, driver.longitude)
+                    if distance <= best_distance:
+                        best, best_distance = driver, distance
+            if best is not None:
+                del free[best.pk]
+                total += best_distance
+                count += 1
+        return total, count
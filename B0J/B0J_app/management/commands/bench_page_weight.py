@@ -0,0 +1,64 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from B0J_app.models import Driver, Tariff
+
+from ._bench import rollback_after
+
+PAGES = ['/', '/drivers/', '/calculate/', '/order/', '/payment-methods/', '/history/']
+ASSET = re.compile(rb'<(?:link[^>]+href|script[^>]+src)="(?P<url>/static/[^"]+)"')
+
+
+def body(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    help = "Байты на странице: всё несжатым (как при встроенных CSS/JS) против сжатия и кэша статики"
+
+    def handle(self, *args, **options):
+        if not (settings.STATIC_ROOT / 'staticfiles.json').exists():
+            raise CommandError("Сначала соберите статику: manage.py collectstatic")
+        with rollback_after():
+            tariffs = [
+                Tariff.objects.create(name=name, base_price=100 + i * 50, price_per_km=20, price_per_minute=5)
+                for i, (name, _) in enumerate(Tariff.TARIFF_TYPES)
+            ]
+            drivers = Driver.objects.bulk_create(
+                Driver(name=f"Bench {i}", car_model="bench", car_number=f"B{i:06d}", phone="+70000000000")
+                for i in range(24)
+            )
+            Through = Driver.available_tariffs.through
+            Through.objects.bulk_create(
+                Through(driver_id=d.pk, tariff_id=tariffs[i % len(tariffs)].pk) for i, d in enumerate(drivers)
+            )
+            # Как в боевом режиме: имена статики с хэшем
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost']):
+                self.report()
+
+    def report(self):
+        plain = Client(HTTP_HOST='localhost')
+        compressed = Client(HTTP_HOST='localhost', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.stdout.write(f"{'страница':<18}{'несжатым':>10}{'1-й визит':>11}{'повторный':>11}  статика")
+        for page in PAGES:
+            html = plain.get(page)
+            if html.status_code != 200:
+                raise CommandError(f"{page}: код ответа {html.status_code}")
+            assets = [match['url'].decode() for match in ASSET.finditer(html.content)]
+            uncompressed = len(html.content) + sum(len(body(plain.get(url))) for url in assets)
+            html_wire = len(body(compressed.get(page)))
+            assets_wire, policies = 0, set()
+            for url in assets:
+                response = compressed.get(url)
+                assets_wire += len(body(response))
+                policies.add(f"{response.get('Content-Encoding', 'identity')}, {response['Cache-Control']}")
+            self.stdout.write(
+                f"{page:<18}{uncompressed:>10}{html_wire + assets_wire:>11}{html_wire:>11}  "
+                f"({len(assets)}) {'; '.join(sorted(policies)) or '-'}"
+            )
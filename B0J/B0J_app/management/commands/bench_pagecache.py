@@ -0,0 +1,65 @@
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from B0J_app import catalog, counters, pagecache, views
+from B0J_app.models import Driver, Tariff
+
+from ._bench import measure, rollback_after, summary
+
+PAGES = [('index', views.index), ('drivers', views.drivers),
+         ('calculate_price', views.calculate_price), ('payment_methods', views.payment_methods)]
+
+
+class Command(BaseCommand):
+    help = "Страницы справочников: сборка заново, с кэшем фрагментов и из кэша страниц"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500)
+        parser.add_argument('--drivers', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with rollback_after():
+            tariffs = [
+                Tariff.objects.create(name=name, base_price=100 + i * 50, price_per_km=20, price_per_minute=5)
+                for i, (name, _) in enumerate(Tariff.TARIFF_TYPES)
+            ]
+            drivers = Driver.objects.bulk_create(
+                Driver(name=f"Bench {i}", car_model="bench", car_number=f"B{i:06d}", phone="+70000000000")
+                for i in range(options['drivers'])
+            )
+            Through = Driver.available_tariffs.through
+            Through.objects.bulk_create(
+                Through(driver_id=d.pk, tariff_id=tariffs[i % len(tariffs)].pk) for i, d in enumerate(drivers)
+            )
+            counters.reconcile()
+            self.run(options['repeat'])
+
+    def run(self, repeat):
+        factory = RequestFactory(HTTP_HOST='localhost')
+        for name, view in PAGES:
+            call = async_to_sync(view)
+            original = view.__wrapped__
+
+            def rebuild(i):
+                # Каждый раз новая версия справочника: страница и фрагменты собираются заново
+                catalog.invalidate()
+                async_to_sync(original)(factory.get(f'/{name}/'))
+
+            def fragments(i):
+                async_to_sync(original)(factory.get(f'/{name}/'))
+
+            def cached(i):
+                call(factory.get(f'/{name}/'))
+
+            call(factory.get(f'/{name}/'))
+            self.stdout.write(name)
+            for label, func in [("без кэша", rebuild), ("кэш фрагментов", fragments), ("кэш страницы", cached)]:
+                self.stdout.write(f"  {label:<16} {summary(measure(func, repeat))}")
+
+        # Только обёртка: версии из общего кэша и готовый ответ из памяти процесса
+        request = factory.get('/')
+        key = pagecache._cache_key(request, (catalog.CATALOG, counters.DRIVERS))
+        samples = measure(lambda i: pagecache.caches[pagecache.PAGE_CACHE].get(
+            pagecache._cache_key(request, (catalog.CATALOG, counters.DRIVERS))), repeat)
+        self.stdout.write(f"Попадание без цикла событий (ключ {key[:12]}...): {summary(samples)}")
@@ -0,0 +1,74 @@
+import statistics
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from B0J_app import catalog, profiling
+from B0J_app.profiling import ProfilingMiddleware
+from B0J_app.models import Driver, Tariff
+
+from ._bench import measure, rollback_after, summary
+
+PAGES = ['index', 'calculate_price', 'order_history', 'api_quote']
+MIDDLEWARE = 'B0J_app.profiling.ProfilingMiddleware'
+
+
+class Command(BaseCommand):
+    help = "Накладные расходы профилирования: те же страницы с ProfilingMiddleware и без него"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=300)
+        parser.add_argument('--rounds', type=int, default=10, help="Чередований замеров с профилированием и без")
+
+    def handle(self, *args, **options):
+        with rollback_after():
+            if not Tariff.objects.exists():
+                for name, _ in Tariff.TARIFF_TYPES:
+                    Tariff.objects.create(name=name, base_price=100, price_per_km=20, price_per_minute=5)
+                Driver.objects.create(name="Bench", car_model="bench", car_number="B000001", phone="+7")
+            catalog.invalidate()
+            baseline = override_settings(
+                MIDDLEWARE=[name for name in settings.MIDDLEWARE if name != MIDDLEWARE],
+                TEMPLATES=[dict(settings.TEMPLATES[0], BACKEND='django.template.backends.django.DjangoTemplates')],
+            )
+            with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False):
+                results = {label: {page: [] for page in PAGES} for label in ('без профилирования', 'с профилированием')}
+                for _ in range(options['rounds']):
+                    with baseline:
+                        connection.execute_wrappers.remove(profiling.record_query)
+                        try:
+                            self.run(results['без профилирования'], options['repeat'])
+                        finally:
+                            profiling.install(connection)
+                    self.run(results['с профилированием'], options['repeat'])
+        plain, profiled = results.values()
+        for page in PAGES:
+            self.stdout.write(page)
+            for label, samples in results.items():
+                self.stdout.write(f"  {label:<20} {summary(samples[page])}")
+            # Медиана устойчивее к паузам сборщика мусора, чем среднее
+            before = statistics.median(plain[page])
+            after = statistics.median(profiled[page])
+            self.stdout.write(f"  накладные расходы    {(after - before) * 1000:+.1f} мкс ({(after / before - 1) * 100:+.1f}%)")
+
+        # Сама обвязка вокруг пустого ответа: разница не тонет в шуме страниц
+        request = RequestFactory().get('/')
+        response = HttpResponse()
+        middleware = ProfilingMiddleware(lambda request: response)
+        bare = statistics.median(measure(lambda i: response, 100000))
+        wrapped = statistics.median(measure(lambda i: middleware(request), 100000))
+        self.stdout.write(f"Middleware вокруг пустого ответа: {(wrapped - bare) * 1000:.1f} мкс на запрос")
+
+    def run(self, results, repeat):
+        client = Client()
+        for page in PAGES:
+            url = reverse(page)
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{url}: код ответа {response.status_code}")
+            results[page].extend(measure(lambda i: client.get(url), repeat))
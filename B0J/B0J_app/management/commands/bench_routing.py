@@ -0,0 +1,45 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from B0J_app.bulk import random_point
+from B0J_app.routing import RoadFactorGrid, RouteEstimator
+
+from ._bench import measure, summary
+
+
+class Command(BaseCommand):
+    help = "Оценка маршрутов: поштучно без кэша и с кэшем, пачкой через NumPy"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=10000, help="Поездок в пачке")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        trips = [random_point(rng) + random_point(rng) for _ in range(options['trips'])]
+        # Сетка с коэффициентами на весь город, чтобы словарь читался по-настоящему
+        grid = RoadFactorGrid()
+        for lat, lon, *_ in trips:
+            grid.factors.setdefault(grid.cell(lat, lon), round(rng.uniform(1.1, 1.6), 2))
+        columns = list(zip(*trips))
+        self.stdout.write(f"{len(trips)} поездок, ячеек сетки {len(grid.factors)}")
+
+        def single(estimator):
+            for trip in trips:
+                estimator.estimate(*trip)
+
+        def cold(i):
+            estimator = RouteEstimator(grid)
+            single(estimator)
+
+        warm_estimator = RouteEstimator(grid)
+        single(warm_estimator)
+        rows = [
+            ('поштучно, пустой кэш', cold),
+            ('поштучно, всё в кэше', lambda i: single(warm_estimator)),
+            ('пачкой', lambda i: RouteEstimator(grid).estimate_many(*columns)),
+        ]
+        for label, func in rows:
+            self.stdout.write(f"{label:<22} {summary(measure(func, options['repeat']))}")
@@ -0,0 +1,56 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from B0J_app import search
+from B0J_app.models import Order
+
+from ._bench import measure, summary
+
+
+class Command(BaseCommand):
+    help = "Поиск заказов по словам адреса и имени: индекс FTS5 против icontains по таблице"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        total = Order.objects.count()
+        if not total:
+            raise CommandError("Таблица заказов пуста: сначала заполните базу")
+        rng = random.Random(options['seed'])
+        last = Order.objects.order_by('-pk').values_list('pk', flat=True).first()
+        rows = []
+        while len(rows) < options['queries']:
+            row = Order.objects.filter(pk__gte=rng.randrange(last) + 1).values_list(*search.SEARCH_FIELDS).first()
+            if row:
+                rows.append(row)
+        # Как ищет поддержка: улица с номером дома, фамилия; и случайные пары слов из заказа
+        query_sets = {
+            'улица и дом': [' '.join(search.WORD.findall(rng.choice(row[1:]))[1:3]) for row in rows],
+            'имя клиента': [search.WORD.findall(row[0])[-1] for row in rows],
+            'случайные слова': [
+                ' '.join(rng.sample(words, min(2, len(words))))
+                for words in (search.WORD.findall(' '.join(row)) for row in rows)
+            ],
+        }
+        self.stdout.write(f"заказов: {total}, запросов в наборе: {len(rows)}")
+        for label, texts in query_sets.items():
+            samples = measure(lambda i: search.search_orders(texts[i]), len(texts))
+            self.stdout.write(f"FTS5, {label:<18} {summary(samples)}")
+
+        texts = query_sets['улица и дом']
+
+        def icontains(i):
+            queryset = Order.objects.all()
+            for word in search.WORD.findall(texts[i]):
+                queryset = queryset.filter(
+                    Q(pickup_address__icontains=word) | Q(destination_address__icontains=word)
+                    | Q(customer_name__icontains=word)
+                )
+            list(queryset.order_by('-created_at')[:search.SEARCH_LIMIT])
+
+        scan = measure(icontains, min(len(texts), 5))
+        self.stdout.write(f"icontains, улица и дом  {summary(scan)}")
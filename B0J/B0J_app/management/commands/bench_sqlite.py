@@ -0,0 +1,110 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from B0J_app.models import Driver, Order, PaymentMethod, Tariff
+
+from ._bench import percentile
+
+BENCH_MARKER = "bench-sqlite"
+
+
+class Command(BaseCommand):
+    help = "Чтение страниц на фоне конкурентного создания заказов (запускать в обоих режимах базы)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10.0)
+        parser.add_argument('--drivers', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        self.stdout.write(f"Режим базы: {settings.DATABASE_MODE}, journal_mode={journal_mode}")
+
+        tariff = Tariff.objects.create(
+            name='economy', base_price=100, price_per_km=20, price_per_minute=5,
+            description=BENCH_MARKER, is_active=False,
+        )
+        payment_method = PaymentMethod.objects.create(name='cash', icon='💵', description=BENCH_MARKER, is_active=False)
+        try:
+            drivers = Driver.objects.bulk_create(
+                Driver(name=f"Bench {i}", car_model=BENCH_MARKER, car_number=f"B{i:06d}", phone="+70000000000")
+                for i in range(options['drivers'])
+            )
+            Through = Driver.available_tariffs.through
+            Through.objects.bulk_create(Through(driver_id=d.pk, tariff_id=tariff.pk) for d in drivers)
+            Driver.refresh_capabilities([d.pk for d in drivers])
+            self.run(tariff, payment_method, options)
+        finally:
+            # Убираем за собой все тестовые данные (заказы удалятся каскадом)
+            Driver.objects.filter(car_model=BENCH_MARKER).delete()
+            tariff.delete()
+            payment_method.delete()
+
+    def run(self, tariff, payment_method, options):
+        deadline = time.monotonic() + options['seconds']
+        reads, read_errors, writes, write_errors = [], [], [], []
+        pages = [reverse('index'), reverse('drivers')]
+        order_form = {
+            'customer_name': BENCH_MARKER, 'customer_phone': '+70000000000',
+            'pickup_address': 'A', 'destination_address': 'B',
+            'tariff': tariff.pk, 'payment_method': payment_method.pk, 'distance': 5,
+        }
+
+        def reader(number):
+            client = Client(HTTP_HOST='localhost')
+            i = number
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        response = client.get(pages[i % len(pages)])
+                        if response.status_code != 200:
+                            read_errors.append(response.status_code)
+                    except Exception as error:
+                        read_errors.append(error)
+                    reads.append((time.perf_counter() - started) * 1000)
+                    i += 1
+            finally:
+                connections.close_all()
+
+        def writer(number):
+            client = Client(HTTP_HOST='localhost')
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        client.post(reverse('create_order'), order_form)
+                    except Exception as error:
+                        write_errors.append(error)
+                    writes.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        created = Order.objects.filter(tariff=tariff).count()
+        seconds = options['seconds']
+        for label, samples, errors in [("Чтение страниц", reads, read_errors), ("Создание заказов", writes, write_errors)]:
+            self.stdout.write(
+                f"{label}: {len(samples)} запросов ({len(samples) / seconds:.1f}/с), ошибок {len(errors)}, "
+                f"p50={percentile(samples, 50):.1f} ms p95={percentile(samples, 95):.1f} ms "
+                f"p99={percentile(samples, 99):.1f} ms max={max(samples, default=0):.1f} ms"
+            )
+        self.stdout.write(f"Заказов сохранено: {created} из {len(writes)} попыток")
+        errors = read_errors + write_errors
+        if errors:
+            self.stderr.write(f"Первая ошибка: {errors[0]!r}")
@@ -0,0 +1,124 @@
+import asyncio
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ._bench import percentile
+from .bench_asgi import free_port, wait_for_port
+
+BENCH_MARKER = "bench-sse"
+
+
+def process_usage(pid):
+    """(RSS в КБ, число потоков) процесса сервера"""
+    with open(f'/proc/{pid}/status') as status:
+        fields = dict(line.split(':', 1) for line in status)
+    return int(fields['VmRSS'].split()[0]), int(fields['Threads'])
+
+
+async def open_stream(port, order_id):
+    """Подключается к потоку заказа и дочитывает первое (текущее) событие"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET /order/{order_id}/events HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    await read_event(reader)
+    return reader, writer
+
+
+async def read_event(reader):
+    """Блок события целиком (до пустой строки); пинги пропускаются"""
+    while True:
+        block = await reader.readuntil(b"\n\n")
+        if b"data:" in block:
+            return block
+
+
+class Command(BaseCommand):
+    help = "Тысячи ожидающих SSE-соединений в одном процессе uvicorn: память и задержка доставки"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=100, help="Заказов, на которые делятся соединения")
+
+    def handle(self, *args, **options):
+        from B0J_app.models import Order, Tariff
+
+        if importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("Для бенчмарка нужен пакет uvicorn: pip install uvicorn")
+        tariff = Tariff.objects.create(
+            name='economy', base_price=100, price_per_km=20, price_per_minute=5,
+            description=BENCH_MARKER, is_active=False,
+        )
+        try:
+            orders = Order.objects.bulk_create(
+                Order(customer_name=BENCH_MARKER, customer_phone='+7', pickup_address='A',
+                      destination_address='B', tariff=tariff)
+                for _ in range(options['orders'])
+            )
+            self.run([order.pk for order in orders], options['connections'])
+        finally:
+            tariff.delete()
+
+    def run(self, order_ids, total):
+        from B0J_app.models import Order
+
+        port = free_port()
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'B0J_project.settings'))
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'B0J_project.asgi:application', '--port', str(port),
+             '--log-level', 'warning', '--no-access-log'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+
+        async def scenario():
+            # Прогрев: импорт представлений и первое подключение
+            _, writer = await open_stream(port, order_ids[0])
+            writer.close()
+            await asyncio.sleep(1)
+            idle_kb, idle_threads = process_usage(process.pid)
+            started = time.perf_counter()
+            streams = []
+            for start in range(0, total, 100):
+                streams += await asyncio.gather(*(
+                    open_stream(port, order_ids[i % len(order_ids)]) for i in range(start, min(start + 100, total))
+                ))
+            connect_s = time.perf_counter() - started
+            await asyncio.sleep(1)
+            loaded_kb, loaded_threads = process_usage(process.pid)
+
+            # Изменение из этого процесса - сервер узнаёт о нём общим опросом
+            changed = time.perf_counter()
+            await Order.objects.filter(pk__in=order_ids).aupdate(status='cancelled')
+            latencies = []
+
+            async def receive(reader):
+                await read_event(reader)
+                latencies.append((time.perf_counter() - changed) * 1000)
+
+            await asyncio.gather(*(receive(reader) for reader, _ in streams))
+            for _, writer in streams:
+                writer.close()
+            return (idle_kb, idle_threads), (loaded_kb, loaded_threads), connect_s, latencies
+
+        try:
+            wait_for_port(port, process)
+            (idle_kb, idle_threads), (loaded_kb, loaded_threads), connect_s, latencies = asyncio.run(scenario())
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+        self.stdout.write(
+            f"Соединений {total} на {len(order_ids)} заказов, открыты за {connect_s:.2f} с"
+        )
+        self.stdout.write(
+            f"Память сервера: {idle_kb / 1024:.1f} МБ без клиентов, {loaded_kb / 1024:.1f} МБ с клиентами "
+            f"({(loaded_kb - idle_kb) / total:.1f} КБ на соединение); потоков {idle_threads} -> {loaded_threads}"
+        )
+        self.stdout.write(
+            f"Доставка изменения всем клиентам: p50={percentile(latencies, 50):.0f} ms "
+            f"p99={percentile(latencies, 99):.0f} ms max={max(latencies):.0f} ms"
+        )
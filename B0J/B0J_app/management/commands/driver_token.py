@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from B0J_app.heartbeats import driver_token
+from B0J_app.models import Driver
+
+
+class Command(BaseCommand):
+    help = "Токены приложения водителя для подписи сигналов присутствия (heartbeat)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('driver_ids', nargs='+', type=int, help="id водителей")
+
+    def handle(self, *args, **options):
+        found = set(Driver.objects.filter(pk__in=options['driver_ids']).values_list('pk', flat=True))
+        missing = [pk for pk in options['driver_ids'] if pk not in found]
+        if missing:
+            raise CommandError(f"Водители не найдены: {', '.join(map(str, missing))}")
+        for pk in options['driver_ids']:
+            self.stdout.write(f"{pk}\t{driver_token(pk)}")
@@ -0,0 +1,330 @@
+import asyncio
+import json
+import random
+import re
+import statistics
+import time
+from collections import Counter, namedtuple
+from html.parser import HTMLParser
+from itertools import count
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from B0J_app.bulk import random_name, random_point, random_street
+
+from ._bench import percentile
+
+SCENARIOS = ('index', 'drivers', 'quote', 'order')
+DEFAULT_MIX = 'index=30,drivers=20,quote=35,order=15'
+# Запросы, на которые раскладывается сценарий заказа: форма и её отправка
+ORDER_STEPS = ('order_form', 'order_submit')
+ORDER_LOCATION = re.compile(r'^/order/\d+/$')
+# Сообщение Django на странице (форма заказа показывает так ошибки сохранения)
+MESSAGE = re.compile(r'<div class="message[^"]*">\s*([^<]+?)\s*</div>')
+
+Response = namedtuple('Response', ['status', 'headers', 'body'])
+
+
+async def http_request(host, port, method, path, headers=(), body=b''):
+    """
+    Один запрос по новому соединению с Connection: close, как в bench_asgi:
+    ответ читается до закрытия, разбирать длину и chunked не нужно.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close", *headers]
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+        raw = await reader.read()
+    finally:
+        writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode('latin-1').split("\r\n")
+    parsed = [tuple(part.strip() for part in line.split(':', 1)) for line in header_lines if ':' in line]
+    return Response(int(status_line.split(' ', 2)[1]), parsed, payload)
+
+
+class OrderForm(HTMLParser):
+    """Из формы заказа нужны токен CSRF и варианты тарифа и способа оплаты"""
+
+    def __init__(self, html):
+        super().__init__()
+        self.token = None
+        self.choices = {'tariff': [], 'payment_method': []}
+        self.feed(html)
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'input':
+            return
+        attrs = dict(attrs)
+        name, value = attrs.get('name'), attrs.get('value')
+        if name == 'csrfmiddlewaretoken':
+            self.token = value
+        elif name in self.choices and value:
+            self.choices[name].append(value)
+
+
+class ScenarioStats:
+    """Задержки успешных ответов, коды ответов и ошибки одного вида запросов"""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+
+    @property
+    def requests(self):
+        return len(self.latencies) + sum(self.errors.values())
+
+    def report(self, elapsed):
+        requests, errors = self.requests, sum(self.errors.values())
+        return {
+            'requests': requests,
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else 0.0,
+            'throughput_rps': round(len(self.latencies) / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': latency_report(self.latencies),
+            'statuses': {str(status): number for status, number in sorted(self.statuses.items())},
+            'error_kinds': dict(self.errors.most_common()),
+        }
+
+
+def latency_report(samples):
+    if not samples:
+        return {'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    return {
+        'mean': round(statistics.fmean(samples), 2),
+        'p50': round(percentile(samples, 50), 2),
+        'p95': round(percentile(samples, 95), 2),
+        'p99': round(percentile(samples, 99), 2),
+        'max': round(max(samples), 2),
+    }
+
+
+class VirtualClient:
+    """
+    Посетитель со своими cookie: смотрит главную и список водителей,
+    считает стоимость, оформляет заказ через форму с токеном CSRF.
+    """
+
+    def __init__(self, host, port, rng, stats, timeout):
+        self.host, self.port = host, port
+        self.rng = rng
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = {}
+
+    async def call(self, name, method, path, expected, headers=(), body=b'', location=None):
+        """
+        Запрос с замером; None, если ответ не тот, что ожидался. location -
+        шаблон пути, на который должен вести редирект.
+        """
+        stats = self.stats[name]
+        if self.cookies:
+            headers = [*headers, "Cookie: " + "; ".join(f"{key}={value}" for key, value in self.cookies.items())]
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                http_request(self.host, self.port, method, path, headers, body), self.timeout,
+            )
+        except asyncio.TimeoutError:
+            stats.errors['timeout'] += 1
+            return None
+        except (OSError, IndexError, ValueError) as error:
+            stats.errors[type(error).__name__] += 1
+            return None
+        latency = (time.perf_counter() - started) * 1000
+        stats.statuses[response.status] += 1
+        if response.status != expected:
+            message = MESSAGE.search(response.body.decode('utf-8', 'replace'))
+            stats.errors[f'status {response.status}' + (f': {message[1][:100]}' if message else '')] += 1
+            return None
+        headers = [(header.lower(), value) for header, value in response.headers]
+        if location is not None and not any(
+            header == 'location' and location.match(urlsplit(value).path) for header, value in headers
+        ):
+            stats.errors['unexpected redirect'] += 1
+            return None
+        for header, value in headers:
+            if header == 'set-cookie':
+                key, _, rest = value.partition('=')
+                self.cookies[key] = rest.split(';', 1)[0]
+        stats.latencies.append(latency)
+        return response
+
+    async def index(self):
+        await self.call('index', 'GET', '/', 200)
+
+    async def drivers(self):
+        await self.call('drivers', 'GET', '/drivers/', 200)
+
+    async def quote(self):
+        if self.rng.random() < 0.5:
+            params = {'distance': f"{self.rng.uniform(1, 30):.2f}"}
+        else:
+            (plat, plon), (dlat, dlon) = random_point(self.rng), random_point(self.rng)
+            params = {'pickup_lat': plat, 'pickup_lon': plon, 'destination_lat': dlat, 'destination_lon': dlon}
+        await self.call('quote', 'GET', '/api/quote?' + urlencode(params), 200)
+
+    async def order(self):
+        form = await self.call('order_form', 'GET', '/order/', 200)
+        if form is None:
+            return
+        fields = OrderForm(form.body.decode('utf-8', 'replace'))
+        if not fields.token or not all(fields.choices.values()):
+            self.stats['order_submit'].errors['form without token or choices'] += 1
+            return
+        (plat, plon), (dlat, dlon) = random_point(self.rng), random_point(self.rng)
+        body = urlencode({
+            'csrfmiddlewaretoken': fields.token,
+            'customer_name': random_name(self.rng),
+            'customer_phone': f"+79{self.rng.randrange(10**9):09d}",
+            'pickup_address': random_street(self.rng),
+            'destination_address': random_street(self.rng),
+            'pickup_lat': plat, 'pickup_lon': plon, 'destination_lat': dlat, 'destination_lon': dlon,
+            'tariff': self.rng.choice(fields.choices['tariff']),
+            'payment_method': self.rng.choice(fields.choices['payment_method']),
+        }).encode()
+        # Неудачная отправка тоже отвечает 302, но обратно на форму
+        await self.call(
+            'order_submit', 'POST', '/order/', 302,
+            headers=["Content-Type: application/x-www-form-urlencoded"], body=body, location=ORDER_LOCATION,
+        )
+
+
+def parse_mix(text):
+    """'index=30,order=15' -> {сценарий: вес}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise CommandError(f"Неизвестный сценарий {name!r}; есть {', '.join(SCENARIOS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f"Вес сценария {name} должен быть числом: {part!r}")
+        if mix[name] < 0:
+            raise CommandError(f"Вес сценария {name} отрицательный")
+    if not any(mix.values()):
+        raise CommandError("Нужен хотя бы один сценарий с ненулевым весом")
+    return mix
+
+
+async def run_load(host, port, mix, concurrency, duration, total, seed, timeout):
+    """concurrency посетителей до истечения duration или total сценариев; (статистика, секунды)"""
+    steps = [step for name in mix for step in (ORDER_STEPS if name == 'order' else (name,))]
+    stats = {step: ScenarioStats() for step in steps}
+    names, weights = zip(*mix.items())
+    budget = iter(range(total)) if total else count()
+    deadline = time.perf_counter() + duration
+
+    async def visitor(number):
+        client = VirtualClient(host, port, random.Random(seed * 100003 + number), stats, timeout)
+        for _ in budget:
+            if time.perf_counter() >= deadline:
+                break
+            await getattr(client, client.rng.choices(names, weights)[0])()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(visitor(number) for number in range(concurrency)))
+    return stats, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест запущенного сервера: смесь просмотров главной и водителей, расчётов "
+        "стоимости и заказов через форму с CSRF. Отчёт с p50/p95/p99, пропускной способностью и "
+        "долей ошибок - JSON; с порогами команда завершается с ошибкой, если они превышены. "
+        "Клиент делит процессор с сервером: на одной машине цифры ниже, чем с отдельного хоста"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Адрес запущенного сервера")
+        parser.add_argument('--concurrency', type=int, default=16, help="Одновременных посетителей")
+        parser.add_argument('--duration', type=float, default=30.0, help="Длительность, с")
+        parser.add_argument('--requests', type=int, default=0,
+                            help="Остановиться после стольких сценариев (заказ - два запроса); 0 - по времени")
+        parser.add_argument('--mix', default=DEFAULT_MIX, help="Веса сценариев: " + ', '.join(SCENARIOS))
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--timeout', type=float, default=10.0, help="Тайм-аут одного запроса, с")
+        parser.add_argument('--output', default='-', help="Файл для JSON-отчёта; '-' - stdout")
+        parser.add_argument('--max-error-rate', type=float, help="Порог доли ошибок, например 0.01")
+        parser.add_argument('--max-p95-ms', type=float, help="Порог p95 по всем запросам, мс")
+        parser.add_argument('--max-p99-ms', type=float, help="Порог p99 по всем запросам, мс")
+
+    def handle(self, *args, **options):
+        target = urlsplit(options['url'])
+        if target.scheme != 'http' or not target.hostname:
+            raise CommandError(f"Нужен адрес вида http://host:port, а не {options['url']!r}")
+        host, port = target.hostname, target.port or 80
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency должен быть не меньше 1")
+        mix = parse_mix(options['mix'])
+        try:
+            response = asyncio.run(http_request(host, port, 'GET', '/'))
+        except OSError as error:
+            raise CommandError(f"Сервер {options['url']} недоступен ({error}): запустите runserver или gunicorn")
+        if response.status != 200:
+            raise CommandError(f"Главная страница ответила {response.status}")
+
+        stats, elapsed = asyncio.run(run_load(
+            host, port, mix, options['concurrency'], options['duration'], options['requests'],
+            options['seed'], options['timeout'],
+        ))
+        report = self.build_report(options, stats, elapsed)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(text)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as target_file:
+                target_file.write(text + '\n')
+            self.write_summary(report)
+        if not report['passed']:
+            raise CommandError("Пороги превышены: " + '; '.join(report['violations']))
+
+    def build_report(self, options, stats, elapsed):
+        latencies = [latency for scenario in stats.values() for latency in scenario.latencies]
+        requests = sum(scenario.requests for scenario in stats.values())
+        errors = sum(sum(scenario.errors.values()) for scenario in stats.values())
+        overall = latency_report(latencies)
+        error_rate = round(errors / requests, 4) if requests else 0.0
+        violations = []
+        if options['max_error_rate'] is not None and error_rate > options['max_error_rate']:
+            violations.append(f"доля ошибок {error_rate} > {options['max_error_rate']}")
+        for key in ('p95', 'p99'):
+            limit = options[f'max_{key}_ms']
+            if limit is not None and (overall[key] is None or overall[key] > limit):
+                violations.append(f"{key} {overall[key]} мс > {limit} мс")
+        orders = stats.get('order_submit')
+        return {
+            'url': options['url'],
+            'concurrency': options['concurrency'],
+            'mix': parse_mix(options['mix']),
+            'seed': options['seed'],
+            'duration_seconds': round(elapsed, 3),
+            'requests': requests,
+            'errors': errors,
+            'error_rate': error_rate,
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            'orders_per_second': round(len(orders.latencies) / elapsed, 2) if orders and elapsed else 0.0,
+            'latency_ms': overall,
+            'scenarios': {name: scenario.report(elapsed) for name, scenario in stats.items()},
+            'passed': not violations,
+            'violations': violations,
+        }
+
+    def write_summary(self, report):
+        self.stdout.write(
+            f"{report['requests']} запросов за {report['duration_seconds']} с: {report['throughput_rps']} запр/с, "
+            f"заказов {report['orders_per_second']}/с, ошибок {report['error_rate']:.2%}"
+        )
+        for name, scenario in report['scenarios'].items():
+            latency = scenario['latency_ms']
+            self.stdout.write(
+                f"  {name:<13} {scenario['requests']:>7} запр. p50={latency['p50']} p95={latency['p95']} "
+                f"p99={latency['p99']} мс, ошибок {scenario['errors']}"
+            )
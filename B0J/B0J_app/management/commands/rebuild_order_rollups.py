@@ -0,0 +1,16 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from B0J_app import rollups
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сводные таблицы заказов по рабочей таблице и архиву"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help="Пересчитать только дни начиная с ГГГГ-ММ-ДД")
+
+    def handle(self, *args, **options):
+        rows = rollups.rebuild(since=options['since'])
+        self.stdout.write(self.style.SUCCESS(f"Сводка пересчитана: {rows} строк"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from B0J_app import counters
+
+
+class Command(BaseCommand):
+    help = "Сверяет счётчики статусов водителей с таблицей водителей и исправляет расхождения"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = counters.reconcile()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Счётчики совпадают с таблицей водителей"))
+            return
+        for status, delta in drift.items():
+            self.stdout.write(f"{status}: расхождение {delta:+d}")
+        self.stdout.write(self.style.SUCCESS("Счётчики исправлены"))
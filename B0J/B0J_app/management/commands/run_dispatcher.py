@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from B0J_app.matcher import DEFAULT_BATCH_LIMIT, run_tick
+
+
+class Command(BaseCommand):
+    help = "Фоновый диспетчер: раз в несколько секунд пакетно назначает водителей на ожидающие заказы"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=3.0, help="Пауза между проходами, с")
+        parser.add_argument('--limit', type=int, default=DEFAULT_BATCH_LIMIT, help="Заказов за один проход")
+        parser.add_argument('--once', action='store_true', help="Выполнить один проход и выйти")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            close_old_connections()
+            tick = run_tick(limit=options['limit'])
+            self.stdout.write(str(tick))
+            if options['once']:
+                return
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
@@ -0,0 +1,298 @@
+import datetime
+import math
+import random
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from B0J_app import counters, rollups, routing, search
+from B0J_app.bulk import (
+    FIRST_NAMES, LAST_NAMES, deferred_indexes, insert_rows, random_city_point, random_name, random_street,
+)
+from B0J_app.models import Driver, Order, PaymentMethod, Tariff
+from B0J_app.pricing import RateTable, commission_kopecks, percent_hundredths
+
+CAR_MODELS = ['Kia Rio', 'Hyundai Solaris', 'Skoda Octavia', 'Toyota Camry', 'Volkswagen Polo', 'Kia K5',
+              'Mercedes E-класс', 'BMW 5', 'Lada Vesta', 'Geely Coolray']
+PLATE_LETTERS = 'АВЕКМНОРСТУХ'
+
+# Ставки (база, за км, за минуту) и доля заказов по типам тарифа
+TARIFF_RATES = {
+    'economy': (100, 20, 5), 'comfort': (150, 25, 7), 'business': (300, 40, 10),
+    'premium': (500, 60, 15), 'cargo': (250, 35, 8), 'family': (180, 28, 7),
+}
+TARIFF_DEMAND = {'economy': 45, 'comfort': 25, 'business': 8, 'premium': 3, 'cargo': 7, 'family': 12}
+# Доля заказов по способам оплаты (по имени), остальные делят поровну малую долю
+PAYMENT_DEMAND = {'card': 50, 'cash': 25, 'sbp': 15, 'apple_pay': 5, 'google_pay': 5}
+# Заказы по часам суток: утренний и вечерний пик
+HOUR_WEIGHTS = [3, 2, 1, 1, 1, 2, 4, 8, 10, 8, 6, 5, 5, 5, 5, 6, 7, 9, 10, 8, 7, 6, 5, 4]
+# Заказы по дням недели, понедельник первым
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.05, 1.2, 1.15, 0.85]
+PEAK_HOURS = {7, 8, 9, 17, 18, 19}
+DRIVER_STATUSES = (('available', 55), ('busy', 30), ('offline', 15))
+# Заказы моложе этого ещё в работе, старше - завершены или отменены
+ACTIVE_WINDOW = datetime.timedelta(hours=2)
+CANCEL_RATE = 0.12
+# Медиана и разброс длины поездки по дорогам, км
+TRIP_MEDIAN_KM = 6.0
+TRIP_SIGMA = 0.6
+ORDER_CHUNK = 20000
+ADDRESS_POOL = 200000
+ORDER_FIELDS = [
+    'customer_name', 'customer_phone', 'pickup_address', 'destination_address',
+    'pickup_latitude', 'pickup_longitude', 'destination_latitude', 'destination_longitude',
+    'tariff', 'driver', 'distance', 'estimated_time', 'total_price', 'surge_multiplier',
+    'payment_method', 'is_paid', 'payment_date', 'commission_amount', 'status', 'created_at', 'updated_at',
+]
+
+
+def decimal_text(hundredths):
+    """Целые сотые (копейки, сотые доли км) строкой с двумя знаками - значение DecimalField для базы"""
+    return f"{hundredths // 100}.{hundredths % 100:02d}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Синтетические данные для нагрузочных тестов: тарифы, водители с тарифами и оснащением, "
+        "история заказов. Один и тот же --seed с --end в прошлом даёт одни и те же данные; "
+        "данные добавляются к уже существующим"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tariffs', type=int, default=len(Tariff.TARIFF_TYPES),
+                            help="Сколько тарифов создать (типы повторяются по кругу)")
+        parser.add_argument('--drivers', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=365, help="За сколько дней история заказов")
+        parser.add_argument('--end', type=datetime.date.fromisoformat,
+                            help="Последний день истории ГГГГ-ММ-ДД (по умолчанию сегодня)")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk', type=int, default=ORDER_CHUNK, help="Заказов в одной транзакции")
+
+    def handle(self, *args, **options):
+        if options['tariffs'] < 1 or options['days'] < 1:
+            raise CommandError("Нужен хотя бы один тариф и один день истории")
+        payment_methods = list(PaymentMethod.objects.filter(is_active=True).order_by('order', 'pk'))
+        if not payment_methods:
+            raise CommandError("Нет активных способов оплаты: выполните migrate")
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        tariffs = self.create_tariffs(options['tariffs'])
+        self.stdout.write(f"Тарифов: {len(tariffs)}")
+        drivers = self.create_drivers(rng, tariffs, options['drivers'])
+        self.stdout.write(f"Водителей: {options['drivers']} ({time.perf_counter() - started:.1f} с)")
+
+        end = options['end'] or timezone.localdate()
+        orders_started = time.perf_counter()
+        # id связей взяты из только что прочитанных строк: проверка внешних ключей
+        # на каждую вставку ничего не ловит, а стоит заметную долю времени загрузки
+        connection = connections[router.db_for_write(Order)]
+        with connection.constraint_checks_disabled(), search.deferred_indexing(), deferred_indexes(Order):
+            created = self.create_orders(
+                rng, tariffs, drivers, payment_methods, options['orders'], end, options['days'], options['chunk'],
+            )
+        seconds = time.perf_counter() - orders_started
+        self.stdout.write(self.style.SUCCESS(
+            f"Заказов: {created} за {seconds:.1f} с ({created / max(seconds, 1e-9):.0f} в секунду), "
+            f"всего {time.perf_counter() - started:.1f} с"
+        ))
+
+    def create_tariffs(self, count):
+        # По одному через save(): тарифов мало, а сигналы сбрасывают кэш справочников
+        tariffs = []
+        for i in range(count):
+            name, _ = Tariff.TARIFF_TYPES[i % len(Tariff.TARIFF_TYPES)]
+            base, per_km, per_minute = TARIFF_RATES[name]
+            tariffs.append(Tariff.objects.create(
+                name=name, base_price=base, price_per_km=per_km, price_per_minute=per_minute,
+            ))
+        return tariffs
+
+    def create_drivers(self, rng, tariffs, count):
+        """Водители пачками bulk_create; возвращает {id тарифа: [id водителей]}"""
+        by_type = {}
+        for tariff in tariffs:
+            by_type.setdefault(tariff.name, []).append(tariff)
+        statuses, status_weights = zip(*DRIVER_STATUSES)
+        drivers, links = [], []
+        for i in range(count):
+            types = {'economy'}
+            if rng.random() < 0.55:
+                types.add('comfort')
+                if rng.random() < 0.3:
+                    types.add('business')
+                    if rng.random() < 0.3:
+                        types.add('premium')
+            cargo = rng.random() < 0.08
+            family = rng.random() < 0.15
+            if cargo:
+                types.add('cargo')
+            if family:
+                types.add('family')
+            lat, lon = random_city_point(rng)
+            drivers.append(Driver(
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                car_model=rng.choice(CAR_MODELS),
+                car_number=(f"{rng.choice(PLATE_LETTERS)}{rng.randrange(1, 1000):03d}"
+                            f"{rng.choice(PLATE_LETTERS)}{rng.choice(PLATE_LETTERS)}{rng.choice([77, 97, 99, 177, 199, 777])}"),
+                phone=f"+79{rng.randrange(10**9):09d}",
+                rating=round(rng.triangular(3.8, 5.0, 4.9), 2),
+                experience=rng.randrange(1, 31),
+                has_child_seat=family or rng.random() < 0.1,
+                has_cargo_space=cargo or rng.random() < 0.1,
+                max_passengers=rng.choice([6, 7, 8]) if family and rng.random() < 0.5 else 4,
+                status=rng.choices(statuses, status_weights)[0],
+                latitude=lat, longitude=lon, geohash=Driver.compute_geohash(lat, lon),
+            ))
+            links.append([tariff for name in sorted(types) for tariff in by_type.get(name, ())])
+
+        tariff_drivers = {tariff.pk: [] for tariff in tariffs}
+        Link = Driver.available_tariffs.through
+        with transaction.atomic():
+            drivers = Driver.objects.bulk_create(drivers, batch_size=2000)
+            rows = []
+            for driver, driver_tariffs in zip(drivers, links):
+                for tariff in driver_tariffs:
+                    rows.append(Link(driver_id=driver.pk, tariff_id=tariff.pk))
+                    tariff_drivers[tariff.pk].append(driver.pk)
+            Link.objects.bulk_create(rows, batch_size=5000)
+            # bulk_create обходит сигналы: маска возможностей и счётчики статусов - явно
+            Driver.refresh_capabilities([driver.pk for driver in drivers])
+            counters.reconcile()
+        return tariff_drivers
+
+    def day_counts(self, count, end, days, now):
+        """
+        (день, заказов, часов) по дням: будни и выходные, медленный рост к
+        концу периода. Сегодня заказы идут только до начала текущего часа.
+        """
+        first = end - datetime.timedelta(days=days - 1)
+        dates = [first + datetime.timedelta(days=i) for i in range(days)]
+        hours = [24 if day < now.date() else now.hour if day == now.date() else 0 for day in dates]
+        weights = [
+            WEEKDAY_WEIGHTS[day.weekday()] * (0.7 + 0.3 * i / max(days - 1, 1))
+            * sum(HOUR_WEIGHTS[:open_hours]) / sum(HOUR_WEIGHTS)
+            for i, (day, open_hours) in enumerate(zip(dates, hours))
+        ]
+        total = sum(weights) or 1
+        counts, assigned, running = [], 0, 0.0
+        for weight in weights:
+            running += weight
+            target = round(count * running / total)
+            counts.append(target - assigned)
+            assigned = target
+        return list(zip(dates, counts, hours))
+
+    def create_orders(self, rng, tariffs, tariff_drivers, payment_methods, count, end, days, chunk_size):
+        """
+        Заказы по дням от старых к новым, транзакция на пачку. Строки пишутся
+        executemany (bulk.insert_rows) уже готовыми для базы: деньги и
+        расстояния - строками из целых копеек, без Decimal. Вклад в сводку
+        копится в копейках тут же и уходит в rollups.apply той же транзакцией.
+        """
+        rates = RateTable(tariffs)
+        tariff_weights = [TARIFF_DEMAND[tariff.name] for tariff in tariffs]
+        payment_weights = [PAYMENT_DEMAND.get(method.name, 2) for method in payment_methods]
+        tariff_ids = [tariff.pk for tariff in tariffs]
+        method_ids = [method.pk for method in payment_methods]
+        cash = {method.pk for method in payment_methods if method.name == 'cash'}
+        commissions = {method.pk: percent_hundredths(method.commission) for method in payment_methods}
+        hour_cum = list(accumulate(HOUR_WEIGHTS))
+        estimator = routing.estimator
+        # Клиенты и адреса повторяются, как в настоящей истории заказов
+        customers = [(random_name(rng), f"+79{rng.randrange(10**9):09d}") for _ in range(max(count // 8, 1))]
+        addresses = [random_street(rng) for _ in range(min(max(count // 4, 1), ADDRESS_POOL))]
+        multipliers = {surge: decimal_text(surge) for surge in [100, *range(110, 190, 10)]}
+        mu = math.log(TRIP_MEDIAN_KM)
+        now = timezone.localtime().replace(tzinfo=None)
+        cut = now - ACTIVE_WINDOW
+        current_tz = timezone.get_current_timezone()
+        rows, created = [], 0
+        deltas = defaultdict(lambda: [0, 0, 0, 0])
+
+        def flush():
+            nonlocal rows, deltas, created
+            with transaction.atomic():
+                insert_rows(Order, ORDER_FIELDS, rows)
+                rollups.apply(deltas)
+            created += len(rows)
+            rows, deltas = [], defaultdict(lambda: [0, 0, 0, 0])
+
+        for day, day_count, open_hours in self.day_counts(count, end, days, now):
+            if not day_count:
+                continue
+            rand = rng.random
+            midnight = timezone.make_aware(datetime.datetime.combine(day, datetime.time()), current_tz)
+            midnight_utc = midnight.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+            # Заказы, начатые позже этой секунды дня, ещё в работе
+            active_after = (cut - datetime.datetime.combine(day, datetime.time())).total_seconds()
+            weekend = 24 if day.weekday() >= 5 else 0
+            day_cum = hour_cum[:open_hours]
+            offsets = sorted(
+                bisect_right(day_cum, rng.random() * day_cum[-1]) * 3600 + rng.randrange(3600)
+                for _ in range(day_count)
+            )
+            day_tariffs = rng.choices(tariff_ids, tariff_weights, k=day_count)
+            day_methods = rng.choices(method_ids, payment_weights, k=day_count)
+            trips = []
+            for offset in offsets:
+                hour = offset // 3600
+                road_km = min(80.0, max(0.5, rng.lognormvariate(mu, TRIP_SIGMA)))
+                hundredths = int(road_km * 100)
+                minutes = routing.minutes_for(hundredths, estimator.speeds[weekend + hour])
+                surge = 100
+                if hour in PEAK_HOURS and rng.random() < 0.3:
+                    surge = rng.randrange(110, 190, 10)
+                trips.append((hundredths, minutes, surge))
+            hundredths, minutes, surges = zip(*trips)
+            prices = rates.price(day_tariffs, hundredths, minutes, surge=surges)
+
+            for offset, tariff_id, method_id, (trip_hundredths, trip_minutes, surge), kopecks in zip(
+                offsets, day_tariffs, day_methods, trips, prices,
+            ):
+                created_at = midnight_utc + datetime.timedelta(seconds=offset)
+                if offset > active_after:
+                    status = rng.choice(['pending', 'accepted', 'in_progress'])
+                else:
+                    status = 'cancelled' if rng.random() < CANCEL_RATE else 'completed'
+                candidates = tariff_drivers.get(tariff_id)
+                driver_id = None
+                if candidates and status != 'pending' and (status != 'cancelled' or rng.random() < 0.5):
+                    driver_id = candidates[int(rand() * len(candidates))]
+                # Даты строкой один раз: адаптер sqlite3 форматировал бы их на каждое из трёх полей
+                finished_at = str(created_at + datetime.timedelta(minutes=trip_minutes))
+                is_paid = status == 'completed' and (method_id not in cash or rng.random() < 0.98)
+                # Прямая до точки назначения короче пути по дорогам в DEFAULT_ROAD_FACTOR раз
+                straight_km = trip_hundredths / 100 / routing.DEFAULT_ROAD_FACTOR
+                bearing = rng.random() * 2 * math.pi
+                lat, lon = random_city_point(rng)
+                dest_lat = lat + straight_km * math.cos(bearing) / 111.2
+                dest_lon = lon + straight_km * math.sin(bearing) / (111.2 * math.cos(math.radians(lat)))
+                name, phone = customers[int(rand() * len(customers))]
+                commission = commission_kopecks(kopecks, commissions[method_id]) if is_paid else 0
+                rows.append((
+                    name, phone, addresses[int(rand() * len(addresses))], addresses[int(rand() * len(addresses))],
+                    round(lat, 6), round(lon, 6), round(dest_lat, 6), round(dest_lon, 6),
+                    tariff_id, driver_id, decimal_text(trip_hundredths), trip_minutes,
+                    decimal_text(kopecks), multipliers[surge], method_id, is_paid,
+                    finished_at if is_paid else None, decimal_text(commission), status, str(created_at), finished_at,
+                ))
+                if status not in rollups.EXCLUDED_STATUSES:
+                    # Тот же вклад, что rollups.contribution, но без Decimal: день - местный день заказа
+                    measures = deltas[day, tariff_id, method_id]
+                    measures[0] += 1
+                    measures[1] += kopecks
+                    if is_paid:
+                        measures[2] += kopecks
+                        measures[3] += commission
+                if len(rows) >= chunk_size:
+                    flush()
+        if rows:
+            flush()
+        return created
@@ -0,0 +1,301 @@
+"""Пакетное назначение водителей на ожидающие заказы"""
+import heapq
+import math
+import random
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from . import catalog, counters, events
+from .dispatch import claim_driver
+from .geo import KM_PER_DEGREE, haversine_km
+from .models import Driver, Order, Tariff
+from .surge import engine as surge_engine
+
+# Дальше этого расстояния водителя на подачу не отправляем
+MAX_PICKUP_KM = 15
+# Сколько ближайших подходящих водителей рассматриваем для каждого заказа
+CANDIDATES_PER_ORDER = 8
+# Стоимость подачи в метрах, если положение водителя или точка подачи неизвестны
+UNKNOWN_LOCATION_COST = 10_000
+# Стоимость оставить заказ без водителя: дороже любой допустимой подачи
+UNASSIGNED_COST = MAX_PICKUP_KM * 1000 + UNKNOWN_LOCATION_COST
+# Размер ячейки сетки для поиска кандидатов (~2 км)
+GRID_DEGREES = 0.02
+DEFAULT_BATCH_LIMIT = 5000
+# Назначений в одной транзакции: меньше запросов, но блокировка записи недолгая
+APPLY_CHUNK = 200
+
+
+class Tick:
+    """Результат одного прохода диспетчера"""
+
+    def __init__(self):
+        self.pending = 0
+        self.drivers = 0
+        self.assigned = 0
+        self.total_cost = 0
+        self.load_ms = 0.0
+        self.solve_ms = 0.0
+        self.apply_ms = 0.0
+
+    @property
+    def total_ms(self):
+        return self.load_ms + self.solve_ms + self.apply_ms
+
+    def __str__(self):
+        return (
+            f"заказов {self.pending}, водителей {self.drivers}, назначено {self.assigned}, "
+            f"подача {self.total_cost / 1000:.1f} км; "
+            f"загрузка {self.load_ms:.1f} мс, решение {self.solve_ms:.1f} мс, "
+            f"запись {self.apply_ms:.1f} мс, всего {self.total_ms:.1f} мс"
+        )
+
+
+def _cell(lat, lon):
+    return int(lat // GRID_DEGREES), int(lon // (2 * GRID_DEGREES))
+
+
+class CandidateIndex:
+    """Сетка свободных водителей в памяти: поиск кандидатов без запросов к базе"""
+
+    def __init__(self, drivers):
+        # drivers: список (driver_id, lat, lon, набор tariff_id)
+        self.cells = defaultdict(list)
+        self.unlocated = defaultdict(list)
+        for driver in drivers:
+            driver_id, lat, lon, tariffs = driver
+            for tariff_id in tariffs:
+                if lat is None or lon is None:
+                    self.unlocated[tariff_id].append(driver_id)
+                else:
+                    self.cells[tariff_id, _cell(lat, lon)].append(driver)
+        self.by_tariff = defaultdict(list)
+        for driver in drivers:
+            for tariff_id in driver[3]:
+                self.by_tariff[tariff_id].append(driver[0])
+
+    def candidates(self, tariff_id, lat, lon, rng):
+        """Список (driver_id, стоимость в метрах) для заказа"""
+        if lat is None or lon is None:
+            pool = self.by_tariff.get(tariff_id, [])
+            chosen = rng.sample(pool, min(CANDIDATES_PER_ORDER, len(pool)))
+            return [(driver_id, UNKNOWN_LOCATION_COST) for driver_id in chosen]
+
+        # Обходим кольца ячеек вокруг точки, пока следующее кольцо не может
+        # дать водителя ближе уже найденного K-го или дальше MAX_PICKUP_KM
+        lat_cell_km = GRID_DEGREES * KM_PER_DEGREE
+        lon_cell_km = 2 * GRID_DEGREES * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+        ring_km = min(lat_cell_km, lon_cell_km)
+        max_rings = math.ceil(MAX_PICKUP_KM / ring_km)
+        row, col = _cell(lat, lon)
+        found = []
+        for ring in range(max_rings + 1):
+            for i in range(row - ring, row + ring + 1):
+                step = 1 if abs(i - row) == ring else 2 * ring
+                for j in range(col - ring, col + ring + 1, step or 1):
+                    for driver_id, d_lat, d_lon, _ in self.cells.get((tariff_id, (i, j)), ()):
+                        distance = haversine_km(lat, lon, d_lat, d_lon)
+                        if distance <= MAX_PICKUP_KM:
+                            found.append((driver_id, int(distance * 1000)))
+            if len(found) >= CANDIDATES_PER_ORDER:
+                found.sort(key=lambda item: item[1])
+                if found[CANDIDATES_PER_ORDER - 1][1] <= ring * ring_km * 1000:
+                    break
+        found.sort(key=lambda item: item[1])
+        found = found[:CANDIDATES_PER_ORDER]
+        if len(found) < CANDIDATES_PER_ORDER:
+            pool = self.unlocated.get(tariff_id, [])
+            extra = rng.sample(pool, min(CANDIDATES_PER_ORDER - len(found), len(pool)))
+            found.extend((driver_id, UNKNOWN_LOCATION_COST) for driver_id in extra)
+        return found
+
+
+def solve_assignment(candidates):
+    """
+    Минимизирует суммарную стоимость подачи: последовательные кратчайшие
+    увеличивающие пути (Дейкстра с потенциалами) на разреженном графе кандидатов.
+    candidates: {order_id: [(driver_id, стоимость), ...]}; стоимости - целые метры.
+    Каждый заказ может остаться без водителя по цене UNASSIGNED_COST, поэтому
+    задача разрешима при любом соотношении заказов и водителей.
+    Возвращает {order_id: driver_id} для назначенных заказов.
+    """
+    # Столбцы - водители плюс у каждого заказа свой столбец "без водителя"
+    rows = {
+        order_id: list(options) + [((None, order_id), UNASSIGNED_COST)]
+        for order_id, options in candidates.items() if options
+    }
+    potential = defaultdict(int)
+    owner = {}
+    column_of = {}
+    # Стоимость текущего назначения заказа: нужна для приведённых стоимостей
+    assigned_cost = {}
+
+    for start in rows:
+        # Кратчайший путь от нового заказа до любого свободного столбца
+        dist = {}
+        prev = {}
+        heap = []
+        for column, cost in rows[start]:
+            d = cost - potential[column]
+            if column not in dist or d < dist[column]:
+                dist[column] = d
+                prev[column] = (start, cost)
+                heapq.heappush(heap, (d, isinstance(column, tuple), column))
+        done = {}
+        while True:
+            d, _, column = heapq.heappop(heap)
+            if column in done or d > dist[column]:
+                continue
+            done[column] = d
+            order_id = owner.get(column)
+            if order_id is None:
+                break
+            # Заказ уже стоит на этом столбце: его приведённая стоимость равна нулю
+            base = d - assigned_cost[order_id] + potential[column]
+            for next_column, cost in rows[order_id]:
+                if next_column in done:
+                    continue
+                nd = base + cost - potential[next_column]
+                if next_column not in dist or nd < dist[next_column]:
+                    dist[next_column] = nd
+                    prev[next_column] = (order_id, cost)
+                    heapq.heappush(heap, (nd, isinstance(next_column, tuple), next_column))
+        # Обновление потенциалов сохраняет неотрицательность приведённых стоимостей
+        for scanned, scanned_dist in done.items():
+            potential[scanned] -= d - scanned_dist
+        # Переназначение вдоль найденного пути
+        while True:
+            order_id, cost = prev[column]
+            previous = column_of.get(order_id)
+            owner[column] = order_id
+            column_of[order_id] = column
+            assigned_cost[order_id] = cost
+            if order_id == start:
+                break
+            column = previous
+
+    return {
+        order_id: column for order_id, column in column_of.items()
+        if not isinstance(column, tuple)
+    }
+
+
+def load_state(limit):
+    """Ожидающие заказы (старые первыми) и свободные водители с тарифами"""
+    pending = list(
+        Order.objects.filter(status='pending', driver__isnull=True)
+        .order_by('created_at', 'id')
+        .values_list('id', 'tariff_id', 'pickup_latitude', 'pickup_longitude')[:limit]
+    )
+    # Тарифы водителя берём из маски возможностей - без чтения таблицы связей.
+    # Бит в маске - тип тарифа: для типов с несколькими тарифами допуск читаем из связей
+    tariff_bits, shared = {}, set()
+    for tariff_id, name in Tariff.objects.filter(pk__in={row[1] for row in pending}).values_list('pk', 'name'):
+        if catalog.tariff_type_is_shared(name):
+            shared.add(tariff_id)
+        else:
+            tariff_bits[tariff_id] = Tariff.CAPABILITY_BITS.get(name, 0)
+    approved = defaultdict(set)
+    if shared:
+        links = Driver.available_tariffs.through.objects.filter(tariff_id__in=shared, driver__status='available')
+        for driver_id, tariff_id in links.values_list('driver_id', 'tariff_id'):
+            approved[driver_id].add(tariff_id)
+    drivers = [
+        (driver_id, lat, lon, {tariff_id for tariff_id, bit in tariff_bits.items() if caps & bit} | approved[driver_id])
+        for driver_id, lat, lon, caps in Driver.objects.filter(status='available').values_list(
+            'id', 'latitude', 'longitude', 'capabilities'
+        )
+    ]
+    return pending, drivers
+
+
+def _apply_chunk(pairs):
+    """
+    Пачка назначений тремя запросами. Если хоть один водитель или заказ успел
+    измениться, пачка откатывается и возвращается False.
+    """
+    with transaction.atomic():
+        claimed = Driver.objects.filter(pk__in=[driver.pk for _, driver in pairs], status='available').update(
+            status='busy'
+        )
+        updated = claimed == len(pairs) and Order.objects.filter(
+            pk__in=[order_id for order_id, _ in pairs], status='pending', driver__isnull=True
+        ).update(
+            driver_id=Case(*(When(pk=order_id, then=Value(driver.pk)) for order_id, driver in pairs)),
+            status='accepted',
+        )
+        if updated != len(pairs):
+            transaction.set_rollback(True)
+            return False
+        counters.adjust({'available': -len(pairs), 'busy': len(pairs)})
+        for order_id, driver in pairs:
+            events.publish_on_commit(order_id, 'accepted', driver)
+    for _, driver in pairs:
+        surge_engine.driver_status_changed(driver.pk, 'busy')
+        driver.status = driver._loaded_status = 'busy'
+    return True
+
+
+def _apply_one(order_id, driver):
+    """Одно назначение; водитель захватывается тем же условным UPDATE, что и в create_order"""
+    with transaction.atomic():
+        if not claim_driver(driver):
+            return False
+        updated = Order.objects.filter(pk=order_id, status='pending', driver__isnull=True).update(
+            driver=driver, status='accepted'
+        )
+        if not updated:
+            # Заказ успели отменить или назначить - откатываем захват водителя
+            transaction.set_rollback(True)
+        else:
+            events.publish_on_commit(order_id, 'accepted', driver)
+    return bool(updated)
+
+
+def apply_assignment(assignment):
+    """
+    Записывает назначения пачками по APPLY_CHUNK. При гонке с create_order
+    или отменой заказа пачка повторяется поштучно.
+    """
+    assigned = 0
+    drivers = {d.pk: d for d in Driver.objects.filter(pk__in=assignment.values())}
+    pairs = [(order_id, drivers[driver_id]) for order_id, driver_id in assignment.items() if driver_id in drivers]
+    for start in range(0, len(pairs), APPLY_CHUNK):
+        chunk = pairs[start:start + APPLY_CHUNK]
+        if _apply_chunk(chunk):
+            assigned += len(chunk)
+        else:
+            assigned += sum(_apply_one(order_id, driver) for order_id, driver in chunk)
+    return assigned
+
+
+def run_tick(limit=DEFAULT_BATCH_LIMIT, seed=None):
+    """Один проход: собрать заказы и водителей, решить назначение, записать"""
+    tick = Tick()
+    rng = random.Random(seed)
+
+    started = time.perf_counter()
+    pending, drivers = load_state(limit)
+    tick.pending, tick.drivers = len(pending), len(drivers)
+    tick.load_ms = (time.perf_counter() - started) * 1000
+    if not pending or not drivers:
+        return tick
+
+    started = time.perf_counter()
+    index = CandidateIndex(drivers)
+    candidates = {
+        order_id: index.candidates(tariff_id, lat, lon, rng)
+        for order_id, tariff_id, lat, lon in pending
+    }
+    assignment = solve_assignment(candidates)
+    costs = {(order_id, driver_id): cost for order_id, options in candidates.items() for driver_id, cost in options}
+    tick.total_cost = sum(costs[order_id, driver_id] for order_id, driver_id in assignment.items())
+    tick.solve_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    tick.assigned = apply_assignment(assignment)
+    tick.apply_ms = (time.perf_counter() - started) * 1000
+    return tick
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0004_paymentmethod_order"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="driver",
+            name="geohash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                max_length=12,
+                verbose_name="Geohash",
+            ),
+        ),
+        migrations.AddField(
+            model_name="driver",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True, verbose_name="Широта"),
+        ),
+        migrations.AddField(
+            model_name="driver",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True, verbose_name="Долгота"),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="pickup_latitude",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Широта подачи"
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="pickup_longitude",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Долгота подачи"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="driver",
+            index=models.Index(
+                fields=["status", "geohash"], name="driver_status_geohash_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Driver = apps.get_model("B0J_app", "Driver")
+    DriverStatusCounter = apps.get_model("B0J_app", "DriverStatusCounter")
+    counts = dict.fromkeys(["available", "busy", "offline"], 0)
+    counts.update(
+        Driver.objects.values_list("status").annotate(n=Count("id")).order_by()
+    )
+    DriverStatusCounter.objects.bulk_create(
+        DriverStatusCounter(status=status, count=count)
+        for status, count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0005_driver_location"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DriverStatusCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("available", "🟢 Свободен"),
+                            ("busy", "🔴 Занят"),
+                            ("offline", "⚫ Не в сети"),
+                        ],
+                        max_length=20,
+                        unique=True,
+                        verbose_name="Статус",
+                    ),
+                ),
+                ("count", models.IntegerField(default=0, verbose_name="Количество")),
+            ],
+            options={
+                "verbose_name": "Счётчик статусов водителей",
+                "verbose_name_plural": "Счётчики статусов водителей",
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
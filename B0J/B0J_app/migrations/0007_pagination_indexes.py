@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0006_driverstatuscounter"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="driver",
+            index=models.Index(fields=["rating", "id"], name="driver_rating_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="driver",
+            index=models.Index(
+                fields=["status", "rating", "id"], name="driver_status_rating_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["created_at", "id"], name="order_created_id_idx"
+            ),
+        ),
+    ]
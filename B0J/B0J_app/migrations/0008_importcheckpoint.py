@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0007_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        max_length=500, unique=True, verbose_name="Источник"
+                    ),
+                ),
+                (
+                    "position",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Обработано записей"
+                    ),
+                ),
+                (
+                    "imported",
+                    models.BigIntegerField(default=0, verbose_name="Загружено заказов"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+            ],
+            options={
+                "verbose_name": "Контрольная точка импорта",
+                "verbose_name_plural": "Контрольные точки импорта",
+            },
+        ),
+    ]
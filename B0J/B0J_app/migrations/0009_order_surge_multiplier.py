@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0008_importcheckpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="surge_multiplier",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=1,
+                max_digits=4,
+                verbose_name="Повышающий коэффициент",
+            ),
+        ),
+    ]
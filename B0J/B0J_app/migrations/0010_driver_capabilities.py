@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:19
+
+from django.db import migrations, models
+
+from B0J_app import capabilities
+
+
+def fill_capabilities(apps, schema_editor):
+    Driver = apps.get_model("B0J_app", "Driver")
+    names = ["economy", "comfort", "business", "premium", "cargo", "family"]
+    bits = {name: capabilities.tariff_bit(i) for i, name in enumerate(names)}
+    tariff_bits = {}
+    links = Driver.available_tariffs.through.objects.values_list(
+        "driver_id", "tariff__name"
+    )
+    for driver_id, name in links:
+        tariff_bits[driver_id] = tariff_bits.get(driver_id, 0) | bits.get(name, 0)
+    drivers = list(
+        Driver.objects.only("has_child_seat", "has_cargo_space", "max_passengers")
+    )
+    for driver in drivers:
+        driver.capabilities = tariff_bits.get(
+            driver.pk, 0
+        ) | capabilities.equipment_bits(
+            driver.has_child_seat, driver.has_cargo_space, driver.max_passengers
+        )
+    Driver.objects.bulk_update(drivers, ["capabilities"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0009_order_surge_multiplier"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="driver",
+            name="capabilities",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="Возможности"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="driver",
+            index=models.Index(
+                fields=["status", "capabilities"], name="driver_status_caps_idx"
+            ),
+        ),
+        migrations.RunPython(fill_capabilities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,159 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0010_driver_capabilities"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedOrder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "customer_name",
+                    models.CharField(max_length=100, verbose_name="Имя клиента"),
+                ),
+                (
+                    "customer_phone",
+                    models.CharField(max_length=20, verbose_name="Телефон клиента"),
+                ),
+                ("pickup_address", models.TextField(verbose_name="Адрес подачи")),
+                (
+                    "destination_address",
+                    models.TextField(verbose_name="Адрес назначения"),
+                ),
+                (
+                    "pickup_latitude",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Широта подачи"
+                    ),
+                ),
+                (
+                    "pickup_longitude",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Долгота подачи"
+                    ),
+                ),
+                (
+                    "distance",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=6,
+                        verbose_name="Расстояние (км)",
+                    ),
+                ),
+                (
+                    "estimated_time",
+                    models.IntegerField(
+                        default=0, verbose_name="Примерное время (мин)"
+                    ),
+                ),
+                (
+                    "total_price",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=10,
+                        verbose_name="Итоговая цена (₽)",
+                    ),
+                ),
+                (
+                    "surge_multiplier",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=1,
+                        max_digits=4,
+                        verbose_name="Повышающий коэффициент",
+                    ),
+                ),
+                ("is_paid", models.BooleanField(default=False, verbose_name="Оплачен")),
+                (
+                    "payment_date",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Дата оплаты"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "⏳ Ожидание"),
+                            ("accepted", "✅ Принят"),
+                            ("in_progress", "🚗 В пути"),
+                            ("completed", "🏁 Завершен"),
+                            ("cancelled", "❌ Отменен"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Статус заказа",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создан"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлен"),
+                ),
+                (
+                    "driver",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="B0J_app.driver",
+                        verbose_name="Водитель",
+                    ),
+                ),
+                (
+                    "payment_method",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="B0J_app.paymentmethod",
+                        verbose_name="Способ оплаты",
+                    ),
+                ),
+                (
+                    "tariff",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="B0J_app.tariff",
+                        verbose_name="Тариф",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Архивный заказ",
+                "verbose_name_plural": "Архив заказов",
+                "ordering": ["-created_at"],
+                "abstract": False,
+                "indexes": [
+                    models.Index(
+                        fields=["created_at", "id"],
+                        name="archived_order_created_id_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0011_archivedorder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "orders_count",
+                    models.IntegerField(default=0, verbose_name="Заказов"),
+                ),
+                (
+                    "total_amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Сумма заказов (₽)",
+                    ),
+                ),
+                (
+                    "paid_amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Оплачено (₽)",
+                    ),
+                ),
+                (
+                    "commission_amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Комиссия (₽)",
+                    ),
+                ),
+                (
+                    "payment_method",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="B0J_app.paymentmethod",
+                        verbose_name="Способ оплаты",
+                    ),
+                ),
+                (
+                    "tariff",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="B0J_app.tariff",
+                        verbose_name="Тариф",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сводка заказов",
+                "verbose_name_plural": "Сводки заказов",
+                "ordering": ["-day", "tariff", "payment_method"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "tariff", "payment_method"),
+                        name="order_rollup_key",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("payment_method__isnull", True)),
+                        fields=("day", "tariff"),
+                        name="order_rollup_key_no_payment",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+from django.db import migrations
+
+# Полнотекстовый индекс FTS5 над адресами и именем клиента (только SQLite)
+TABLES = ["B0J_app_order", "B0J_app_archivedorder"]
+COLUMNS = ["customer_name", "pickup_address", "destination_address"]
+
+
+def _statements(table):
+    fts = f"{table}_fts"
+    columns = ", ".join(COLUMNS)
+    new = ", ".join(f"new.{column}" for column in COLUMNS)
+    old = ", ".join(f"old.{column}" for column in COLUMNS)
+    changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in COLUMNS)
+    return [
+        f'CREATE VIRTUAL TABLE "{fts}" USING fts5({columns}, content="{table}", content_rowid="id", '
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f'CREATE TRIGGER "{fts}_insert" AFTER INSERT ON "{table}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, {columns}) VALUES (new.id, {new}); END',
+        f'CREATE TRIGGER "{fts}_delete" AFTER DELETE ON "{table}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, {columns}) VALUES (\'delete\', old.id, {old}); END',
+        # Смена статуса и прочих полей индекс не трогает
+        f'CREATE TRIGGER "{fts}_update" AFTER UPDATE ON "{table}" WHEN {changed} BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, {columns}) VALUES (\'delete\', old.id, {old}); '
+        f'INSERT INTO "{fts}"(rowid, {columns}) VALUES (new.id, {new}); END',
+        f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')',
+    ]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table in TABLES:
+        for statement in _statements(table):
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table in TABLES:
+        fts = f"{table}_fts"
+        for trigger in ["insert", "delete", "update"]:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{fts}_{trigger}"')
+        schema_editor.execute(f'DROP TABLE IF EXISTS "{fts}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0013_order_search_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="archivedorder",
+            name="archived_order_name_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="order",
+            name="order_customer_name_idx",
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
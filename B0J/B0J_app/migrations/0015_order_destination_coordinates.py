@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0014_order_search_fts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedorder",
+            name="destination_latitude",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Широта назначения"
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedorder",
+            name="destination_longitude",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Долгота назначения"
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="destination_latitude",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Широта назначения"
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="destination_longitude",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Долгота назначения"
+            ),
+        ),
+    ]
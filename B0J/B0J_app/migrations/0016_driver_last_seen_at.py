@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0015_order_destination_coordinates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="driver",
+            name="last_seen_at",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="Последний сигнал"
+            ),
+        ),
+    ]
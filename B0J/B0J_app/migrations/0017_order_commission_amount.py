@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:46
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+from B0J_app.bulk import chunked
+from B0J_app.pricing import (
+    commission_kopecks,
+    from_kopecks,
+    percent_hundredths,
+    to_kopecks,
+)
+
+# Новый NOT NULL столбец SQLite добавляет пересборкой таблицы, а она теряет
+# триггеры FTS5: индекс снимаем до неё и строим заново после
+search_fts = import_module("B0J_app.migrations.0014_order_search_fts")
+
+FILL_CHUNK = 2000
+
+
+def fill_commission(apps, schema_editor):
+    # Ставки на момент оплаты не сохранились - прошлым заказам берём текущие,
+    # по ним же были посчитаны сводки
+    PaymentMethod = apps.get_model("B0J_app", "PaymentMethod")
+    rates = {
+        pk: percent_hundredths(rate)
+        for pk, rate in PaymentMethod.objects.values_list("pk", "commission")
+    }
+    for name in ["Order", "ArchivedOrder"]:
+        model = apps.get_model("B0J_app", name)
+        orders = (
+            model.objects.filter(is_paid=True, payment_method__isnull=False)
+            .only("total_price", "payment_method_id")
+            .iterator(chunk_size=FILL_CHUNK)
+        )
+        # Пачками: вся история оплаченных заказов в память не помещается
+        for batch in chunked(orders, FILL_CHUNK):
+            for order in batch:
+                order.commission_amount = from_kopecks(
+                    commission_kopecks(
+                        to_kopecks(order.total_price), rates[order.payment_method_id]
+                    )
+                )
+            model.objects.bulk_update(batch, ["commission_amount"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("B0J_app", "0016_driver_last_seen_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search_fts.drop_search_index, search_fts.create_search_index
+        ),
+        migrations.AddField(
+            model_name="archivedorder",
+            name="commission_amount",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                max_digits=10,
+                verbose_name="Комиссия (₽)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="commission_amount",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                max_digits=10,
+                verbose_name="Комиссия (₽)",
+            ),
+        ),
+        migrations.RunPython(fill_commission, migrations.RunPython.noop),
+        migrations.RunPython(
+            search_fts.create_search_index, search_fts.drop_search_index
+        ),
+    ]
@@ -1,6 +1,33 @@
+import datetime
+from decimal import Decimal
+
 from django.db import models
 from django.db.models.signals import post_migrate
 from django.dispatch import receiver
+from django.utils import timezone
+
+from . import capabilities, pricing
+from .geo import encode_geohash
+
+# Тексты карточек тарифов; собираются один раз при импорте, а не при каждом вызове
+TARIFF_FEATURES = {
+    'economy': ("Недорого", "Быстро", "Базовые условия"),
+    'comfort': ("Комфорт", "Чистый салон", "Водитель с опытом"),
+    'business': ("VIP-обслуживание", "Премиум автомобиль", "Вода в салоне"),
+    'premium': ("Лучшие автомобили", "Личный водитель", "Максимальный комфорт"),
+    'cargo': ("Перевозка грузов", "Просторный багажник", "Помощь с погрузкой"),
+    'family': ("Детское кресло", "Безопасная езда", "Игрушки для детей"),
+}
+DEFAULT_TARIFF_FEATURES = ("Стандартные условия",)
+TARIFF_EXTRA_INFO = {
+    'cargo': "Автомобили с большим багажником или микроавтобусы",
+    'family': "Автомобили оборудованные детскими креслами",
+    'economy': "Бюджетный вариант для коротких поездок",
+    'comfort': "Идеально для деловых встреч",
+    'business': "Для важных переговоров и встреч",
+    'premium': "Максимум комфорта и приватности",
+}
+
 
 class Tariff(models.Model):
     """Модель тарифа такси"""
@@ -12,6 +39,8 @@ class Tariff(models.Model):
         ('cargo', '🚚 Грузовой'),
         ('family', '👨‍👩‍👧‍👦 С детьми'),
     ]
+    # Бит типа тарифа в маске возможностей водителя
+    CAPABILITY_BITS = {name: capabilities.tariff_bit(i) for i, (name, _) in enumerate(TARIFF_TYPES)}
     
     name = models.CharField(max_length=20, choices=TARIFF_TYPES, verbose_name="Тип тарифа")
     base_price = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="Базовая цена (₽)")
@@ -26,27 +55,11 @@ class Tariff(models.Model):
     
     def get_features(self):
         """Возвращает список преимуществ тарифов"""
-        features = {
-            'economy': ["Недорого", "Быстро", "Базовые условия"],
-            'comfort': ["Комфорт", "Чистый салон", "Водитель с опытом"],
-            'business': ["VIP-обслуживание", "Премиум автомобиль", "Вода в салоне"],
-            'premium': ["Лучшие автомобили", "Личный водитель", "Максимальный комфорт"],
-            'cargo': ["Перевозка грузов", "Просторный багажник", "Помощь с погрузкой"],
-            'family': ["Детское кресло", "Безопасная езда", "Игрушки для детей"],
-        }
-        return features.get(self.name, ["Стандартные условия"])
+        return TARIFF_FEATURES.get(self.name, DEFAULT_TARIFF_FEATURES)
     
     def get_extra_info(self):
         """Дополнительная информация для тарифов"""
-        info = {
-            'cargo': "Автомобили с большим багажником или микроавтобусы",
-            'family': "Автомобили оборудованные детскими креслами",
-            'economy': "Бюджетный вариант для коротких поездок",
-            'comfort': "Идеально для деловых встреч",
-            'business': "Для важных переговоров и встреч",
-            'premium': "Максимум комфорта и приватности",
-        }
-        return info.get(self.name, "")
+        return TARIFF_EXTRA_INFO.get(self.name, "")
     
     class Meta:
         verbose_name = "Тариф"
@@ -82,9 +95,79 @@ class Driver(models.Model):
         verbose_name="Статус"
     )
     
+    # Текущее положение водителя и его ячейка пространственного индекса
+    latitude = models.FloatField(null=True, blank=True, verbose_name="Широта")
+    longitude = models.FloatField(null=True, blank=True, verbose_name="Долгота")
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False, verbose_name="Geohash")
+    # Время последнего сигнала от приложения водителя (см. heartbeats.py)
+    last_seen_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Последний сигнал")
+    # Тарифы и оснащение одной битовой маской (см. capabilities.py)
+    capabilities = models.IntegerField(default=0, editable=False, verbose_name="Возможности")
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Статус на момент загрузки из базы - по нему считаются переходы для счётчиков
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
     def __str__(self):
         return f"{self.name} - {self.car_model}"
     
+    def save(self, *args, **kwargs):
+        self.geohash = self.compute_geohash(self.latitude, self.longitude)
+        # Биты тарифов ведёт сигнал m2m_changed, здесь - только оснащение
+        self.capabilities = (self.capabilities & capabilities.TARIFFS) | capabilities.equipment_bits(
+            self.has_child_seat, self.has_cargo_space, self.max_passengers
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if {'latitude', 'longitude'} & update_fields:
+                update_fields.add('geohash')
+            if {'has_child_seat', 'has_cargo_space', 'max_passengers'} & update_fields:
+                update_fields.add('capabilities')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def compute_geohash(latitude, longitude):
+        """Geohash для координат водителя (пустая строка, если позиция неизвестна)"""
+        if latitude is None or longitude is None:
+            return ''
+        return encode_geohash(latitude, longitude)
+    
+    @classmethod
+    def refresh_capabilities(cls, pks=None, batch_size=2000):
+        """
+        Пересчитывает маску возможностей по тарифам и оснащению.
+        pks - водители для пересчёта (None - все). Возвращает число изменённых.
+        """
+        queryset = cls.objects.order_by('pk')
+        if pks is not None:
+            queryset = queryset.filter(pk__in=list(pks))
+        Link = cls.available_tariffs.through
+        changed = 0
+        rows = queryset.values_list('pk', 'has_child_seat', 'has_cargo_space', 'max_passengers', 'capabilities')
+        last_pk = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            tariff_bits = dict.fromkeys((row[0] for row in batch), 0)
+            links = Link.objects.filter(driver_id__in=list(tariff_bits)).values_list('driver_id', 'tariff__name')
+            for driver_id, name in links:
+                tariff_bits[driver_id] |= Tariff.CAPABILITY_BITS.get(name, 0)
+            updates = []
+            for pk, child_seat, cargo_space, passengers, stored in batch:
+                value = tariff_bits[pk] | capabilities.equipment_bits(child_seat, cargo_space, passengers)
+                if value != stored:
+                    updates.append(cls(pk=pk, capabilities=value))
+            cls.objects.bulk_update(updates, ['capabilities'], batch_size=batch_size)
+            changed += len(updates)
+        return changed
+    
     def get_special_features(self):
         """Возвращает специальные возможности водителя"""
         features = []
@@ -100,6 +183,27 @@ class Driver(models.Model):
         verbose_name = "Водитель"
         verbose_name_plural = "Водители"
         ordering = ['-rating']
+        indexes = [
+            models.Index(fields=['status', 'geohash'], name='driver_status_geohash_idx'),
+            # Ключи курсорной пагинации списка водителей
+            models.Index(fields=['rating', 'id'], name='driver_rating_id_idx'),
+            models.Index(fields=['status', 'rating', 'id'], name='driver_status_rating_id_idx'),
+            # Отбор по маске: статус ищется по индексу, маска проверяется по записям индекса
+            models.Index(fields=['status', 'capabilities'], name='driver_status_caps_idx'),
+        ]
+
+
+class DriverStatusCounter(models.Model):
+    """Счётчик водителей в каждом статусе, поддерживается инкрементально"""
+    status = models.CharField(max_length=20, choices=Driver.STATUS_CHOICES, unique=True, verbose_name="Статус")
+    count = models.IntegerField(default=0, verbose_name="Количество")
+    
+    def __str__(self):
+        return f"{self.get_status_display()}: {self.count}"
+    
+    class Meta:
+        verbose_name = "Счётчик статусов водителей"
+        verbose_name_plural = "Счётчики статусов водителей"
 
 
 class PaymentMethod(models.Model):
@@ -168,8 +272,65 @@ class PaymentMethod(models.Model):
         ordering = ['order', 'name']
 
 
-class Order(models.Model):
-    """Модель заказа такси"""
+def _period_start(value, kind):
+    if kind == 'year':
+        return datetime.datetime(value.year, 1, 1)
+    if kind == 'month':
+        return datetime.datetime(value.year, value.month, 1)
+    return datetime.datetime(value.year, value.month, value.day)
+
+
+def _next_period(start, kind):
+    if kind == 'year':
+        return start.replace(year=start.year + 1)
+    if kind == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + datetime.timedelta(days=1)
+
+
+class OrderQuerySet(models.QuerySet):
+    """
+    Выборка заказов для таблиц на миллионы строк. Иерархия дат в админке
+    спрашивает datetimes() и MIN/MAX даты; здесь они отвечают по индексу
+    created_at, не читая всю таблицу.
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        """
+        Периоды, в которых есть строки: один поиск по индексу (LIMIT 1) на период
+        вместо DISTINCT по усечённой дате для каждой строки
+        """
+        if kind not in ('year', 'month', 'day'):
+            return super().datetimes(field_name, kind, order, tzinfo)
+        tzinfo = tzinfo or timezone.get_current_timezone()
+        periods, lower = [], None
+        while True:
+            probe = self
+            if lower:
+                # Своя граница первой: SQLite начинает поиск по индексу с первого условия на поле
+                probe = self.model._base_manager.using(self.db).filter(**{f'{field_name}__gte': lower}) & self
+            value = probe.order_by(field_name).values_list(field_name, flat=True).first()
+            if value is None:
+                break
+            start = _period_start(timezone.localtime(value, tzinfo), kind)
+            periods.append(timezone.make_aware(start, tzinfo))
+            lower = timezone.make_aware(_next_period(start, kind), tzinfo)
+        return periods[::-1] if order == 'DESC' else periods
+
+    def aggregate(self, *args, **kwargs):
+        # SQLite находит MIN или MAX по индексу, только если он в запросе один
+        if not args and len(kwargs) > 1 and all(
+            isinstance(value, (models.Min, models.Max)) and not value.filter for value in kwargs.values()
+        ):
+            result = {}
+            for name, value in kwargs.items():
+                result.update(super().aggregate(**{name: value}))
+            return result
+        return super().aggregate(*args, **kwargs)
+
+
+class OrderRecord(models.Model):
+    """Поля заказа: общие для рабочей таблицы заказов и архива"""
     STATUS_CHOICES = [
         ('pending', '⏳ Ожидание'),
         ('accepted', '✅ Принят'),
@@ -182,12 +343,17 @@ class Order(models.Model):
     customer_phone = models.CharField(max_length=20, verbose_name="Телефон клиента")
     pickup_address = models.TextField(verbose_name="Адрес подачи")
     destination_address = models.TextField(verbose_name="Адрес назначения")
+    pickup_latitude = models.FloatField(null=True, blank=True, verbose_name="Широта подачи")
+    pickup_longitude = models.FloatField(null=True, blank=True, verbose_name="Долгота подачи")
+    destination_latitude = models.FloatField(null=True, blank=True, verbose_name="Широта назначения")
+    destination_longitude = models.FloatField(null=True, blank=True, verbose_name="Долгота назначения")
     tariff = models.ForeignKey(Tariff, on_delete=models.CASCADE, verbose_name="Тариф")
     driver = models.ForeignKey(Driver, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Водитель")
     
     distance = models.DecimalField(max_digits=6, decimal_places=2, default=0, verbose_name="Расстояние (км)")
     estimated_time = models.IntegerField(default=0, verbose_name="Примерное время (мин)")
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Итоговая цена (₽)")
+    surge_multiplier = models.DecimalField(max_digits=4, decimal_places=2, default=1, verbose_name="Повышающий коэффициент")
     
     payment_method = models.ForeignKey(
         PaymentMethod,
@@ -203,6 +369,10 @@ class Order(models.Model):
         blank=True,
         verbose_name="Дата оплаты"
     )
+    # Ставка способа оплаты на момент оплаты: её смена прошлые заказы не пересчитывает
+    commission_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, editable=False, verbose_name="Комиссия (₽)"
+    )
     
     status = models.CharField(
         max_length=20,
@@ -214,21 +384,176 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создан")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлен")
     
+    objects = OrderQuerySet.as_manager()
+    
     def __str__(self):
         return f"Заказ #{self.id} - {self.customer_name}"
     
-    def calculate_price(self):
-        """Расчет стоимости поездки"""
-        base = self.tariff.base_price
-        distance_price = self.distance * self.tariff.price_per_km
-        time_price = (self.estimated_time / 60) * self.tariff.price_per_minute
-        self.total_price = base + distance_price + time_price
+    def calculate_price(self, surge_multiplier=None):
+        """
+        Расчет стоимости поездки (точно, в копейках - см. pricing.py).
+        Коэффициент задаётся в сотых долях; по умолчанию берётся текущий surge тарифа.
+        """
+        if surge_multiplier is None:
+            from .surge import engine
+            surge_multiplier = engine.multiplier(self.tariff_id)
+        kopecks = pricing.price_kopecks(
+            pricing.TariffRates.from_tariff(self.tariff),
+            pricing.distance_hundredths(self.distance),
+            self.estimated_time,
+        )
+        self.surge_multiplier = Decimal(surge_multiplier) / 100
+        self.total_price = pricing.from_kopecks(pricing.apply_surge(kopecks, surge_multiplier))
         return self.total_price
     
+    def set_commission(self, rate):
+        """Комиссия по ставке rate (%) с оплаченной суммы; у неоплаченного заказа - ноль"""
+        paid = pricing.to_kopecks(self.total_price) if self.is_paid else 0
+        self.commission_amount = pricing.from_kopecks(pricing.commission_kopecks(paid, pricing.percent_hundredths(rate)))
+    
     class Meta:
+        abstract = True
+        ordering = ['-created_at']
+
+
+class Order(OrderRecord):
+    """
+    Модель заказа такси. Здесь только "горячие" заказы: завершённые и
+    отменённые старше ORDER_ARCHIVE_AFTER_DAYS переносятся в ArchivedOrder
+    (см. archive.py), историю по обеим таблицам читает history.py.
+    Полнотекстовый поиск по адресам и именам - search.py.
+    """
+    
+    # Поля, от которых зависит вклад заказа в сводные таблицы (см. rollups.py)
+    ROLLUP_FIELDS = (
+        'created_at', 'tariff_id', 'payment_method_id', 'status', 'is_paid', 'total_price', 'commission_amount',
+    )
+    # Поля, при изменении которых комиссия считается заново по текущей ставке
+    COMMISSION_FIELDS = ('payment_method_id', 'is_paid', 'total_price')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения на момент загрузки: по ним из сводки вычитается прежний вклад
+        instance._loaded_rollup = instance.rollup_values()
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self._payment_changed():
+            self.set_commission(self.commission_rate())
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'commission_amount'}
+        super().save(*args, **kwargs)
+    
+    def _payment_changed(self):
+        """Новый заказ или изменились оплата, способ оплаты или цена с момента загрузки"""
+        if self._state.adding:
+            return True
+        loaded = getattr(self, '_loaded_rollup', None)
+        if loaded is None:
+            # Прежнее состояние неизвестно - сохранённую комиссию не трогаем
+            return False
+        before = dict(zip(self.ROLLUP_FIELDS, loaded))
+        return any(before[field] != getattr(self, field) for field in self.COMMISSION_FIELDS)
+    
+    def commission_rate(self):
+        """Текущая ставка комиссии способа оплаты (%)"""
+        if self.payment_method_id is None:
+            return Decimal(0)
+        from . import catalog
+        try:
+            return catalog.get_payment_method(self.payment_method_id).commission
+        except PaymentMethod.DoesNotExist:
+            return Decimal(0)
+    
+    def rollup_values(self):
+        """Значения ROLLUP_FIELDS или None, если часть полей не загружена"""
+        values = tuple(self.__dict__.get(field) for field in self.ROLLUP_FIELDS)
+        if any(value is None for i, value in enumerate(values) if self.ROLLUP_FIELDS[i] != 'payment_method_id'):
+            return None
+        return values
+    
+    class Meta(OrderRecord.Meta):
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
-        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            models.Index(fields=['customer_phone'], name='order_phone_idx'),
+        ]
+
+
+class ArchivedOrder(OrderRecord):
+    """Завершённый или отменённый заказ, перенесённый из Order с тем же id"""
+    TERMINAL_STATUSES = ('completed', 'cancelled')
+    
+    # Обратные связи нужны только рабочей таблице
+    tariff = models.ForeignKey(Tariff, on_delete=models.CASCADE, related_name='+', verbose_name="Тариф")
+    driver = models.ForeignKey(
+        Driver, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Водитель"
+    )
+    payment_method = models.ForeignKey(
+        PaymentMethod, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        verbose_name="Способ оплаты",
+    )
+    
+    class Meta(OrderRecord.Meta):
+        verbose_name = "Архивный заказ"
+        verbose_name_plural = "Архив заказов"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='archived_order_created_id_idx'),
+            models.Index(fields=['customer_phone'], name='archived_order_phone_idx'),
+        ]
+
+
+class OrderRollup(models.Model):
+    """
+    Сводка заказов за день по тарифу и способу оплаты. Обновляется
+    инкрементально при сохранении заказов (см. rollups.py), пересобирается
+    командой rebuild_order_rollups.
+    """
+    day = models.DateField(verbose_name="День")
+    tariff = models.ForeignKey(Tariff, on_delete=models.CASCADE, related_name='+', verbose_name="Тариф")
+    payment_method = models.ForeignKey(
+        PaymentMethod, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+        verbose_name="Способ оплаты",
+    )
+    orders_count = models.IntegerField(default=0, verbose_name="Заказов")
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Сумма заказов (₽)")
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Оплачено (₽)")
+    commission_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Комиссия (₽)")
+    
+    def __str__(self):
+        return f"{self.day} {self.tariff_id}/{self.payment_method_id}: {self.orders_count}"
+    
+    class Meta:
+        verbose_name = "Сводка заказов"
+        verbose_name_plural = "Сводки заказов"
+        ordering = ['-day', 'tariff', 'payment_method']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'tariff', 'payment_method'], name='order_rollup_key',
+            ),
+            # NULL в уникальном ключе не сравнивается - заказы без способа оплаты отдельно
+            models.UniqueConstraint(
+                fields=['day', 'tariff'], condition=models.Q(payment_method__isnull=True),
+                name='order_rollup_key_no_payment',
+            ),
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """Позиция, до которой загружен файл импорта; обновляется в транзакции пачки"""
+    source = models.CharField(max_length=500, unique=True, verbose_name="Источник")
+    position = models.BigIntegerField(default=0, verbose_name="Обработано записей")
+    imported = models.BigIntegerField(default=0, verbose_name="Загружено заказов")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+    
+    def __str__(self):
+        return f"{self.source}: {self.position}"
+    
+    class Meta:
+        verbose_name = "Контрольная точка импорта"
+        verbose_name_plural = "Контрольные точки импорта"
 
 
 # Автоматическое создание способов оплаты после миграции
@@ -0,0 +1,73 @@
+"""
+Кэш целых страниц для анонимных GET-запросов. Ключ включает версии данных
+(см. versions.py), поэтому правка в админке сразу даёт новый ключ во всех
+процессах, а старые страницы просто вытесняются из кэша.
+"""
+import hashlib
+import inspect
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.utils.cache import get_max_age
+
+from .versions import get_version
+
+PAGE_CACHE = 'default'
+# Страница без изменений данных живёт не дольше этого срока
+PAGE_TIMEOUT = 600
+
+
+def _cache_key(request, names):
+    """Ключ страницы или None, если запрос нельзя обслужить из кэша"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    # Без сессии нет ни пользователя, ни сообщений - страница у всех одинакова
+    if settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES:
+        return None
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    versions = ':'.join(get_version(name) for name in names)
+    return f'page:{path}:{versions}'
+
+
+def _store(key, request, response):
+    if key is None or response.status_code != 200 or response.streaming or response.cookies:
+        return
+    if get_max_age(response) == 0 or response.has_header('Vary'):
+        return
+    # В странице CSRF-токен, привязанный к cookie конкретного посетителя
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return
+    caches[PAGE_CACHE].set(key, response, PAGE_TIMEOUT)
+
+
+def cache_page_versioned(*names):
+    """
+    Кэширует страницу представления для анонимных посетителей, пока не
+    изменятся версии наборов данных names. Попадание в кэш - это чтение
+    версий и одна выборка из кэша, без базы и шаблонов.
+    """
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # Кэши здесь - память процесса и локальные файлы, поток не нужен
+                key = _cache_key(request, names)
+                response = key and caches[PAGE_CACHE].get(key)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    _store(key, request, response)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = _cache_key(request, names)
+            response = key and caches[PAGE_CACHE].get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                _store(key, request, response)
+            return response
+        return wrapper
+    return decorator
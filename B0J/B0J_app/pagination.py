@@ -0,0 +1,154 @@
+"""Курсорная (keyset) пагинация и постраничный вывод больших таблиц"""
+import base64
+import binascii
+import json
+import re
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
+
+
+class KeysetPage:
+    """Страница выборки и курсор для перехода к следующей"""
+
+    def __init__(self, items, next_cursor, cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return self.cursor is None
+
+
+def encode_cursor(values):
+    """Кодирует значения ключа последней строки в строку для URL"""
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, fields):
+    """Значения ключа из курсора или None, если курсор отсутствует или испорчен"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(fields):
+            return None
+        return [
+            model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(fields, values)
+        ]
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None
+
+
+def keyset_after(fields, values):
+    """
+    Условие "строго после" для составного ключа (a, b): a <= x AND (a < x OR (a = x AND b < y)).
+    Первое условие - граница по ведущему полю: без неё OR не даёт SQLite искать
+    по индексу, и каждая следующая страница читает индекс с начала.
+    """
+    first = fields[0]
+    bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]})
+    condition = Q()
+    for i, field in enumerate(fields):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        term = Q(**{f'{name}__{lookup}': values[i]})
+        for previous, value in zip(fields[:i], values[:i]):
+            term &= Q(**{previous.lstrip('-'): value})
+        condition |= term
+    return bound & condition
+
+
+def keyset_query(queryset, fields, cursor):
+    """Выборка, начинающаяся сразу после курсора, и нормализованный курсор"""
+    queryset = queryset.order_by(*fields)
+    values = decode_cursor(cursor, queryset.model, fields)
+    if values is None:
+        return queryset, None
+    return queryset.filter(keyset_after(fields, values)), cursor
+
+
+def keyset_result(items, fields, cursor, per_page):
+    """Страница из первых per_page строк; строка сверх них означает, что есть следующая"""
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in fields])
+    return KeysetPage(items, next_cursor, cursor)
+
+
+def keyset_page(queryset, fields, cursor=None, per_page=20):
+    """
+    Страница выборки, упорядоченной по fields (последнее поле - уникальное).
+    Стоимость любой страницы одинакова: поиск по индексу и чтение per_page строк.
+    """
+    queryset, cursor = keyset_query(queryset, fields, cursor)
+    return keyset_result(list(queryset[:per_page + 1]), fields, cursor, per_page)
+
+
+async def akeyset_page(queryset, fields, cursor=None, per_page=20):
+    """Асинхронный вариант keyset_page"""
+    queryset, cursor = keyset_query(queryset, fields, cursor)
+    items = [obj async for obj in queryset[:per_page + 1]]
+    return keyset_result(items, fields, cursor, per_page)
+
+
+# До этого числа строк админка считает точно, дальше - оценивает
+ESTIMATE_THRESHOLD = 10000
+# Сколько последних по id строк просматривается для оценки доли отфильтрованных
+ESTIMATE_SAMPLE = 10000
+_EXPLAIN_ROWS = re.compile(r'rows=(\d+)')
+
+
+def _pk_span(queryset):
+    table = queryset.model._default_manager.using(queryset.db)
+    # MIN и MAX отдельными запросами: так оба берутся из индекса
+    first = table.aggregate(value=Min('pk'))['value']
+    if first is None:
+        return 0, None
+    last = table.aggregate(value=Max('pk'))['value']
+    return last - first + 1, last
+
+
+def estimated_count(queryset, threshold=ESTIMATE_THRESHOLD):
+    """
+    Точное число строк, если их не больше threshold (считается не дальше
+    threshold + 1), иначе оценка: по плану запроса PostgreSQL или по диапазону
+    id и доле подходящих строк среди последних ESTIMATE_SAMPLE.
+    """
+    queryset = queryset.order_by()
+    exact = queryset[:threshold + 1].count()
+    if exact <= threshold:
+        return exact
+    if connections[queryset.db].vendor == 'postgresql':
+        match = _EXPLAIN_ROWS.search(queryset.explain())
+        estimate = int(match[1]) if match else 0
+    else:
+        span, last = _pk_span(queryset)
+        if queryset.query.where:
+            window = queryset.model._default_manager.using(queryset.db).filter(pk__gt=last - ESTIMATE_SAMPLE)
+            sample = window.count()
+            estimate = span * queryset.filter(pk__gt=last - ESTIMATE_SAMPLE).count() // sample if sample else 0
+        else:
+            estimate = span
+    return max(estimate, threshold + 1)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для больших таблиц: вместо COUNT(*) - estimated_count"""
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
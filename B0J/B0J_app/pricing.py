@@ -0,0 +1,120 @@
+"""Расчёт стоимости поездок в целых копейках"""
+from decimal import Decimal, ROUND_HALF_UP
+
+try:
+    import numpy as np
+except ImportError:  # NumPy указан в requirements.txt; без него пачки считаются в цикле
+    np = None
+
+KOPECKS = 100
+# Общий знаменатель для формулы: расстояние в сотых долях км (/100)
+# и время, которое тарифицируется как минуты / 60 (/60)
+_DENOMINATOR = 300
+# Минут в пути на 1 км, если время не передано явно
+MINUTES_PER_KM = 5
+# С какого размера пачки выгоднее считать через NumPy
+NUMPY_THRESHOLD = 64
+
+
+def to_kopecks(amount):
+    """Денежная сумма (Decimal, строка или число) в целых копейках"""
+    return int((Decimal(str(amount)) * KOPECKS).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_kopecks(kopecks):
+    """Копейки в Decimal с двумя знаками после запятой"""
+    return (Decimal(int(kopecks)) / KOPECKS).quantize(Decimal('0.01'))
+
+
+def percent_hundredths(rate):
+    """Ставка в процентах (Decimal, строка или число) в целых сотых долях процента: 2.50 -> 250"""
+    return to_kopecks(rate)
+
+
+def commission_kopecks(kopecks, rate):
+    """Комиссия в копейках по ставке в сотых долях процента (250 = 2,50%), округление половиной вверх"""
+    return (kopecks * rate + 5000) // 10000
+
+
+def distance_hundredths(distance):
+    """Расстояние в км в целых сотых долях километра"""
+    return int((Decimal(str(distance)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def estimate_minutes(hundredths):
+    """Примерное время поездки в минутах по расстоянию в сотых долях км"""
+    return hundredths * MINUTES_PER_KM // 100
+
+
+def _formula(base, per_km, per_minute, hundredths, minutes):
+    """
+    База + км * ставка + (минуты / 60) * ставка, округление половиной вверх.
+    Работает одинаково для целых чисел и для массивов NumPy.
+    """
+    numerator = base * _DENOMINATOR + hundredths * per_km * 3 + minutes * per_minute * 5
+    return (numerator + _DENOMINATOR // 2) // _DENOMINATOR
+
+
+def apply_surge(kopecks, multiplier):
+    """Применяет коэффициент в сотых долях (100 = x1.00) к цене в копейках"""
+    return (kopecks * multiplier + 50) // 100
+
+
+class TariffRates:
+    """Ставки тарифа в копейках"""
+    __slots__ = ('base', 'per_km', 'per_minute')
+
+    def __init__(self, base, per_km, per_minute):
+        self.base = base
+        self.per_km = per_km
+        self.per_minute = per_minute
+
+    @classmethod
+    def from_tariff(cls, tariff):
+        return cls(
+            to_kopecks(tariff.base_price),
+            to_kopecks(tariff.price_per_km),
+            to_kopecks(tariff.price_per_minute),
+        )
+
+
+def price_kopecks(rates, hundredths, minutes):
+    """Стоимость одной поездки в копейках"""
+    return _formula(rates.base, rates.per_km, rates.per_minute, hundredths, minutes)
+
+
+class RateTable:
+    """Ставки нескольких тарифов для расчёта пачек поездок за один проход"""
+
+    def __init__(self, tariffs):
+        self.rates = {tariff.pk: TariffRates.from_tariff(tariff) for tariff in tariffs}
+        self._index = {pk: i for i, pk in enumerate(self.rates)}
+        if np is not None:
+            columns = list(zip(*((r.base, r.per_km, r.per_minute) for r in self.rates.values()))) or [(), (), ()]
+            self._base, self._per_km, self._per_minute = (np.array(c, dtype=np.int64) for c in columns)
+
+    def __contains__(self, tariff_id):
+        return tariff_id in self.rates
+
+    def price(self, tariff_ids, hundredths, minutes, surge=None):
+        """
+        Стоимость пачки поездок в копейках (список int).
+        tariff_ids, hundredths и minutes - последовательности одинаковой длины;
+        surge - необязательные коэффициенты в сотых долях для каждой поездки.
+        """
+        if np is None or len(tariff_ids) < NUMPY_THRESHOLD:
+            prices = [
+                price_kopecks(self.rates[tariff_id], d, m)
+                for tariff_id, d, m in zip(tariff_ids, hundredths, minutes)
+            ]
+            if surge is not None:
+                prices = [apply_surge(k, multiplier) for k, multiplier in zip(prices, surge)]
+            return prices
+        index = np.fromiter((self._index[t] for t in tariff_ids), dtype=np.int64, count=len(tariff_ids))
+        prices = _formula(
+            self._base[index], self._per_km[index], self._per_minute[index],
+            np.asarray(hundredths, dtype=np.int64), np.asarray(minutes, dtype=np.int64),
+        )
+        if surge is not None:
+            prices = apply_surge(prices, np.asarray(surge, dtype=np.int64))
+        return prices.tolist()
@@ -0,0 +1,219 @@
+"""
+Профилирование запросов: число и время SQL-запросов, время отрисовки
+шаблонов и общее время ответа.
+
+Замеры текущего запроса лежат в contextvar, поэтому доходят и до потоков
+sync_to_async у асинхронных представлений. Ответ получает заголовок
+Server-Timing, а замеры копятся в гистограммах в памяти процесса, которые
+отдаёт /metrics в текстовом формате Prometheus. При нескольких процессах
+у каждого свои гистограммы: Prometheus суммирует их сам.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+PREFIX = 'b0j'
+# Границы корзин в секундах и в штуках запросов
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Метка для запросов, не дошедших ни до одного представления (404 и т.п.)
+UNMATCHED = 'unmatched'
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Замеры одного запроса"""
+    __slots__ = ('queries', 'db_time', 'template_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка execute_wrappers: считает запросы, пока идёт профилируемый запрос"""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.db_time += time.perf_counter() - started
+
+
+def install(connection):
+    """Подключает счётчик запросов к соединению (вызывается из connection_created)"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_time += time.perf_counter() - started
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """
+    Стандартный движок шаблонов, который засекает время отрисовки.
+    Вложенные {% include %} идут внутри внешнего render и отдельно не считаются.
+    """
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfiledTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: по счётчику на корзину, сумма и число наблюдений"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Корзина le="x" включает само значение x
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metric:
+    """Семейство гистограмм одной метрики с разбивкой по представлениям"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = f'{PREFIX}_{name}'
+        self.help = help_text
+        self.buckets = buckets
+        self.by_view = {}
+
+    def observe(self, view, value):
+        histogram = self.by_view.get(view)
+        if histogram is None:
+            histogram = self.by_view.setdefault(view, Histogram(self.buckets))
+        histogram.observe(value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for view, histogram in sorted(self.by_view.items()):
+            label = view.replace('\\', '\\\\').replace('"', '\\"')
+            for bound, total in histogram.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{view="{label}",le="{le}"}} {total}')
+            lines.append(f'{self.name}_sum{{view="{label}"}} {histogram.sum!r}')
+            lines.append(f'{self.name}_count{{view="{label}"}} {histogram.count}')
+        return '\n'.join(lines)
+
+
+class Registry:
+    """Гистограммы процесса; запись под одной блокировкой - несколько сложений на запрос"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.duration = Metric('request_duration_seconds', 'Полное время ответа', SECONDS_BUCKETS)
+            self.db_time = Metric('db_query_duration_seconds', 'Время SQL-запросов за ответ', SECONDS_BUCKETS)
+            self.queries = Metric('db_queries', 'Число SQL-запросов за ответ', QUERY_BUCKETS)
+            self.template_time = Metric('template_render_seconds', 'Время отрисовки шаблонов за ответ', SECONDS_BUCKETS)
+
+    def observe(self, view, profile, total):
+        with self._lock:
+            self.duration.observe(view, total)
+            self.db_time.observe(view, profile.db_time)
+            self.queries.observe(view, profile.queries)
+            self.template_time.observe(view, profile.template_time)
+
+    def render(self):
+        with self._lock:
+            metrics = [self.duration, self.db_time, self.queries, self.template_time]
+            return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+registry = Registry()
+
+
+def server_timing(profile, total):
+    """Значение заголовка Server-Timing; время в миллисекундах"""
+    return (
+        f'db;dur={profile.db_time * 1000:.2f};desc="{profile.queries} queries", '
+        f'tpl;dur={profile.template_time * 1000:.2f}, '
+        f'total;dur={total * 1000:.2f}'
+    )
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None and match.view_name else UNMATCHED
+
+
+class ProfilingMiddleware:
+    """
+    Замеряет каждый запрос и пишет итог в Server-Timing и в registry.
+    Стоит сразу после GZipMiddleware, чтобы total включал остальные middleware.
+    У потоковых ответов (SSE) замеряется время до первого байта.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile, time.perf_counter() - started)
+
+    def finish(self, request, response, profile, total):
+        registry.observe(view_label(request), profile, total)
+        response['Server-Timing'] = server_timing(profile, total)
+        return response
@@ -0,0 +1,38 @@
+"""Бюджет SQL-запросов для представлений"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def query_budget(limit):
+    """Декоратор: объявляет, сколько SQL-запросов может выполнить представление"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudgetMixin:
+    """Примесь для тестов: проверяет, что представление укладывается в свой бюджет"""
+
+    def assertWithinQueryBudget(self, url, view=None):
+        """Запрашивает url и сверяет число запросов с бюджетом представления"""
+        if view is None:
+            from django.urls import resolve
+            view = resolve(url.split('?')[0]).func
+        limit = getattr(view, 'query_budget', None)
+        if limit is None:
+            raise QueryBudgetExceeded(f"У представления {view.__name__} не объявлен бюджет запросов")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        used = len(context.captured_queries)
+        if used > limit:
+            queries = '\n'.join(f"{i}. {q['sql']}" for i, q in enumerate(context.captured_queries, 1))
+            raise QueryBudgetExceeded(
+                f"{url}: {used} запросов при бюджете {limit}\n{queries}"
+            )
+        return used
@@ -0,0 +1,189 @@
+"""
+Сводные таблицы заказов: день x тариф x способ оплаты. Вклад заказа
+считается одной функцией и при инкрементальном обновлении, и при пересборке,
+поэтому результаты совпадают до копейки.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .bulk import chunked
+from .models import ArchivedOrder, Order, OrderRollup
+from .pricing import from_kopecks, to_kopecks
+
+# Отменённые заказы выручки не приносят и в сводку не входят
+EXCLUDED_STATUSES = ('cancelled',)
+MEASURES = ('orders_count', 'total_amount', 'paid_amount', 'commission_amount')
+REBUILD_CHUNK = 5000
+# С этого числа ключей новые строки сводки создаются одним INSERT
+BULK_KEYS = 16
+
+
+def contribution(values, tz=None):
+    """
+    Ключ (день, тариф, способ оплаты) и вклад заказа в копейках по значениям
+    Order.ROLLUP_FIELDS; None, если заказ в сводку не входит. Комиссия берётся
+    сохранённая в заказе, а не по текущей ставке. Для пачек tz передаётся один раз.
+    """
+    if values is None:
+        return None
+    created_at, tariff_id, payment_method_id, status, is_paid, total_price, commission_amount = values
+    if status in EXCLUDED_STATUSES:
+        return None
+    total = to_kopecks(total_price)
+    paid = total if is_paid else 0
+    commission = to_kopecks(commission_amount) if is_paid else 0
+    return (timezone.localdate(created_at, tz), tariff_id, payment_method_id), (1, total, paid, commission)
+
+
+def _accumulate(deltas, item, sign):
+    if item is None:
+        return
+    key, measures = item
+    row = deltas[key]
+    for i, value in enumerate(measures):
+        row[i] += sign * value
+
+
+def _row(key, measures):
+    day, tariff_id, payment_method_id = key
+    count, total, paid, commission = measures
+    return OrderRollup(
+        day=day, tariff_id=tariff_id, payment_method_id=payment_method_id, orders_count=count,
+        total_amount=from_kopecks(total), paid_amount=from_kopecks(paid),
+        commission_amount=from_kopecks(commission),
+    )
+
+
+def _create_missing(deltas):
+    """
+    Создаёт одним INSERT строки для ключей, которых в сводке ещё нет, и
+    возвращает остальные изменения. При загрузке истории почти все ключи
+    новые, а по одному каждый стоит UPDATE, SELECT и INSERT.
+    """
+    existing = set()
+    for days in chunked(sorted({day for day, _, _ in deltas}), REBUILD_CHUNK):
+        existing.update(
+            OrderRollup.objects.filter(day__in=days).values_list('day', 'tariff_id', 'payment_method_id')
+        )
+    new = [key for key, measures in deltas.items() if key not in existing and measures[0] > 0]
+    if not new:
+        return deltas
+    try:
+        with transaction.atomic():
+            OrderRollup.objects.bulk_create([_row(key, deltas[key]) for key in new], batch_size=REBUILD_CHUNK)
+    except IntegrityError:
+        # Часть строк создали параллельно - все ключи пойдут обычным путём
+        return deltas
+    created = set(new)
+    return {key: measures for key, measures in deltas.items() if key not in created}
+
+
+def apply(deltas):
+    """Прибавляет к строкам сводки изменения {ключ: [заказов, сумма, оплачено, комиссия]} в копейках"""
+    if len(deltas) >= BULK_KEYS:
+        deltas = _create_missing(deltas)
+    for (day, tariff_id, payment_method_id), (count, total, paid, commission) in deltas.items():
+        if not any((count, total, paid, commission)):
+            continue
+        updated = OrderRollup.objects.filter(
+            day=day, tariff_id=tariff_id, payment_method_id=payment_method_id,
+        ).update(
+            orders_count=F('orders_count') + count,
+            total_amount=F('total_amount') + from_kopecks(total),
+            paid_amount=F('paid_amount') + from_kopecks(paid),
+            commission_amount=F('commission_amount') + from_kopecks(commission),
+        )
+        if updated or count < 0:
+            # Строку могли удалить вместе с тарифом - вычитать не из чего
+            continue
+        _, created = OrderRollup.objects.get_or_create(
+            day=day, tariff_id=tariff_id, payment_method_id=payment_method_id,
+            defaults={
+                'orders_count': count, 'total_amount': from_kopecks(total),
+                'paid_amount': from_kopecks(paid), 'commission_amount': from_kopecks(commission),
+            },
+        )
+        if not created:
+            # Строку создали параллельно между update и get_or_create
+            apply({(day, tariff_id, payment_method_id): [count, total, paid, commission]})
+
+
+def record_change(old_values, new_values):
+    """Переносит вклад заказа из старого состояния в новое; None - создание или удаление"""
+    old, new = contribution(old_values), contribution(new_values)
+    if old == new:
+        return
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    _accumulate(deltas, old, -1)
+    _accumulate(deltas, new, 1)
+    apply(deltas)
+
+
+def add_orders(orders):
+    """Учитывает пачку новых заказов (bulk_create обходит сигналы) одним обновлением на ключ"""
+    add_values(order.rollup_values() for order in orders)
+
+
+def add_values(rows):
+    """То же по кортежам значений Order.ROLLUP_FIELDS - для загрузок без объектов модели"""
+    tz = timezone.get_current_timezone()
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for values in rows:
+        _accumulate(deltas, contribution(values, tz), 1)
+    apply(deltas)
+
+
+def fold_payment_method(payment_method_id):
+    """Переносит строки удаляемого способа оплаты в строки без способа оплаты"""
+    rows = OrderRollup.objects.filter(payment_method_id=payment_method_id)
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for row in rows:
+        deltas[row.day, row.tariff_id, None] = [
+            row.orders_count, to_kopecks(row.total_amount),
+            to_kopecks(row.paid_amount), to_kopecks(row.commission_amount),
+        ]
+    rows.delete()
+    apply(deltas)
+
+
+def rebuild(since=None):
+    """
+    Пересчитывает сводку по рабочей таблице и архиву заново (с дня since или
+    целиком) и заменяет строки в одной транзакции. Заказы, изменённые во время
+    пересчёта, могут в него не попасть - запускайте, когда заказов мало.
+    Возвращает число строк сводки.
+    """
+    tz = timezone.get_current_timezone()
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for model in (Order, ArchivedOrder):
+        queryset = model.objects.exclude(status__in=EXCLUDED_STATUSES).order_by()
+        if since is not None:
+            queryset = queryset.filter(created_at__date__gte=since)
+        for values in queryset.values_list(*Order.ROLLUP_FIELDS).iterator(chunk_size=REBUILD_CHUNK):
+            _accumulate(deltas, contribution(values, tz), 1)
+    rows = [_row(key, measures) for key, measures in deltas.items()]
+    with transaction.atomic():
+        stale = OrderRollup.objects.all()
+        if since is not None:
+            stale = stale.filter(day__gte=since)
+        stale.delete()
+        OrderRollup.objects.bulk_create(rows, batch_size=REBUILD_CHUNK)
+    return len(rows)
+
+
+def totals(start, end, **filters):
+    """Итоги за дни с start по end включительно, например totals(d1, d2, tariff=t)"""
+    queryset = OrderRollup.objects.filter(day__gte=start, day__lte=end, **filters)
+    result = queryset.aggregate(**{measure: Sum(measure) for measure in MEASURES})
+    return {measure: result[measure] or 0 for measure in MEASURES}
+
+
+def by_day(start, end, **filters):
+    """Строки (день, заказов, сумма, оплачено, комиссия) по дням - для графиков"""
+    queryset = OrderRollup.objects.filter(day__gte=start, day__lte=end, **filters)
+    return list(
+        queryset.values('day').annotate(**{measure: Sum(measure) for measure in MEASURES}).order_by('day')
+    )
@@ -0,0 +1,59 @@
+"""Маршрутизация запросов: страницы только для чтения читают через отдельное соединение"""
+import contextvars
+import inspect
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ALIAS = 'read'
+
+_read_only = contextvars.ContextVar('read_only', default=False)
+
+
+def read_only(view):
+    """Помечает представление, все чтения которого можно отправить в соединение READ_ALIAS"""
+    if inspect.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            # Запросы асинхронного ORM выполняются в потоке через sync_to_async,
+            # контекстные переменные копируются туда вместе с флагом
+            token = _read_only.set(True)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _read_only.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _read_only.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+    return wrapper
+
+
+class ReadWriteRouter:
+    """
+    Запись всегда идёт в default. Чтение внутри представлений с read_only
+    уходит в READ_ALIAS - в режиме WAL оно не ждёт пишущих транзакций.
+    Внутри открытой транзакции default читаем из неё же, чтобы видеть свои изменения.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _read_only.get() or READ_ALIAS not in connections.settings:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Оба псевдонима указывают на один файл базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,157 @@
+"""
+Оценка длины маршрута и времени в пути по координатам, без внешних сервисов.
+
+Длина по дорогам - расстояние по большому кругу, умноженное на коэффициент
+извилистости из сетки ячеек (реки, мосты и тупики делают путь длиннее прямой);
+время - по средней скорости для часа и типа дня. Одиночные оценки кэшируются
+в LRU по квантованным координатам и часу, пачки считаются через NumPy.
+"""
+import math
+from collections import namedtuple
+from functools import lru_cache
+
+from django.utils import timezone
+
+from .geo import EARTH_RADIUS_KM
+
+try:
+    import numpy as np
+except ImportError:  # NumPy указан в requirements.txt; без него пачки считаются в цикле
+    np = None
+
+# Шаг квантования координат (~110 м): точки ближе считаются одной
+QUANTUM = 0.001
+# Шаг сетки коэффициентов извилистости в градусах (~5 км)
+GRID_STEP = 0.05
+# Коэффициент для ячеек, по которым нет данных
+DEFAULT_ROAD_FACTOR = 1.3
+# Средняя скорость в км/ч по часам суток: будни и выходные
+WEEKDAY_SPEEDS = (
+    40, 42, 44, 44, 42, 36, 28, 20, 16, 18, 22, 24,
+    24, 24, 23, 22, 20, 17, 16, 19, 24, 28, 32, 36,
+)
+WEEKEND_SPEEDS = (
+    36, 38, 42, 44, 44, 42, 40, 36, 32, 30, 28, 26,
+    25, 25, 25, 25, 25, 26, 26, 27, 28, 30, 32, 34,
+)
+CACHE_SIZE = 65536
+# С какого размера пачки выгоднее считать через NumPy
+NUMPY_THRESHOLD = 64
+
+Estimate = namedtuple('Estimate', ['hundredths', 'minutes'])
+
+
+def quantize(value):
+    """Координата в целых шагах QUANTUM"""
+    return int(math.floor(value / QUANTUM + 0.5))
+
+
+def time_bucket(when=None):
+    """Номер часа недели для таблиц скорости: 0-23 будни, 24-47 выходные"""
+    local = timezone.localtime(when) if when is not None else timezone.localtime()
+    return (24 if local.weekday() >= 5 else 0) + local.hour
+
+
+def minutes_for(hundredths, speed):
+    """Минуты в пути по расстоянию в сотых долях км и скорости в км/ч, не меньше минуты"""
+    minutes = (hundredths * 60 + speed * 50) // (speed * 100)
+    return max(minutes, 1) if hundredths else 0
+
+
+class RoadFactorGrid:
+    """
+    Коэффициенты извилистости по ячейкам GRID_STEP x GRID_STEP градусов.
+    Ключ ячейки - (строка, столбец), см. cell(); для поездки берётся среднее
+    коэффициентов ячеек начала и конца.
+    """
+
+    def __init__(self, factors=None, step=GRID_STEP, default=DEFAULT_ROAD_FACTOR):
+        self.factors = dict(factors or {})
+        self.step = step
+        self.default = default
+
+    def cell(self, lat, lon):
+        return math.floor(lat / self.step), math.floor(lon / self.step)
+
+    def factor(self, lat, lon):
+        return self.factors.get(self.cell(lat, lon), self.default)
+
+    def factors_many(self, lat, lon):
+        """Коэффициенты для массивов координат: словарь читается по разу на ячейку"""
+        if not self.factors:
+            return np.full(len(lat), self.default)
+        cells = np.stack([np.floor(lat / self.step), np.floor(lon / self.step)], axis=1).astype(np.int64)
+        unique, inverse = np.unique(cells, axis=0, return_inverse=True)
+        values = np.array([self.factors.get((int(row), int(col)), self.default) for row, col in unique])
+        return values[inverse.reshape(-1)]
+
+
+class RouteEstimator:
+    """
+    Длина поездки в сотых долях км и время в минутах.
+    Результат зависит только от квантованных координат и часа, поэтому
+    кэш не меняет ответов: промах и попадание дают одно и то же.
+    """
+
+    def __init__(self, grid=None, weekday_speeds=WEEKDAY_SPEEDS, weekend_speeds=WEEKEND_SPEEDS, cache_size=CACHE_SIZE):
+        self.grid = grid or RoadFactorGrid()
+        self.speeds = tuple(weekday_speeds) + tuple(weekend_speeds)
+        self._cached = lru_cache(maxsize=cache_size)(self._estimate_quantized)
+        if np is not None:
+            self._speeds = np.array(self.speeds, dtype=np.int64)
+
+    def clear(self):
+        self._cached.cache_clear()
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    def estimate(self, pickup_lat, pickup_lon, destination_lat, destination_lon, when=None):
+        """Оценка одной поездки с отправлением в when (по умолчанию - сейчас)"""
+        return self._cached(
+            quantize(pickup_lat), quantize(pickup_lon), quantize(destination_lat), quantize(destination_lon),
+            time_bucket(when),
+        )
+
+    def _estimate_quantized(self, lat1, lon1, lat2, lon2, bucket):
+        lat1, lon1, lat2, lon2 = (value * QUANTUM for value in (lat1, lon1, lat2, lon2))
+        phi1 = math.radians(lat1)
+        phi2 = math.radians(lat2)
+        a = (math.sin((phi2 - phi1) / 2) ** 2
+             + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+        straight = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+        factor = (self.grid.factor(lat1, lon1) + self.grid.factor(lat2, lon2)) / 2
+        hundredths = int(math.floor(straight * factor * 100 + 0.5))
+        return Estimate(hundredths, minutes_for(hundredths, self.speeds[bucket]))
+
+    def estimate_many(self, pickup_lat, pickup_lon, destination_lat, destination_lon, when=None):
+        """
+        Оценка пачки поездок с одним временем отправления: четыре
+        последовательности координат одинаковой длины. Возвращает
+        (список сотых долей км, список минут) в порядке поездок.
+        Ответы совпадают с estimate(), но кэш не читается и не заполняется.
+        """
+        bucket = time_bucket(when)
+        if np is None or len(pickup_lat) < NUMPY_THRESHOLD:
+            estimates = [
+                self._estimate_quantized(quantize(a), quantize(b), quantize(c), quantize(d), bucket)
+                for a, b, c, d in zip(pickup_lat, pickup_lon, destination_lat, destination_lon)
+            ]
+            return [e.hundredths for e in estimates], [e.minutes for e in estimates]
+        lat1, lon1, lat2, lon2 = (
+            np.floor(np.asarray(values, dtype=np.float64) / QUANTUM + 0.5) * QUANTUM
+            for values in (pickup_lat, pickup_lon, destination_lat, destination_lon)
+        )
+        phi1 = np.radians(lat1)
+        phi2 = np.radians(lat2)
+        a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2
+        straight = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+        factor = (self.grid.factors_many(lat1, lon1) + self.grid.factors_many(lat2, lon2)) / 2
+        hundredths = np.floor(straight * factor * 100 + 0.5).astype(np.int64)
+        speed = self._speeds[bucket]
+        minutes = (hundredths * 60 + speed * 50) // (speed * 100)
+        minutes = np.where(hundredths > 0, np.maximum(minutes, 1), 0)
+        return hundredths.tolist(), minutes.tolist()
+
+
+estimator = RouteEstimator()
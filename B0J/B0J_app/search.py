@@ -0,0 +1,149 @@
+"""
+Полнотекстовый поиск заказов по адресам и имени клиента.
+
+В SQLite у Order и ArchivedOrder есть теневые таблицы FTS5 (external content,
+см. миграцию 0014): строки в них добавляют и удаляют триггеры, поэтому индекс
+не отстаёт ни при save() и delete(), ни при bulk_create, update() и переносе в
+архив. На других СУБД поиск сводится к icontains.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import ArchivedOrder, Order
+
+SEARCH_FIELDS = ('customer_name', 'pickup_address', 'destination_address')
+# Веса колонок для bm25: совпадение в имени важнее, чем в адресе
+WEIGHTS = (2.0, 1.0, 1.0)
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+WORD = re.compile(r'\w+')
+# Слова, которые есть почти в каждом адресе: почти не сужают поиск, но
+# заставляют FTS5 читать огромные списки документов
+STOP_WORDS = frozenset([
+    'ул', 'улица', 'пр', 'проспект', 'пер', 'переулок', 'бул', 'бульвар', 'ш', 'шоссе',
+    'пл', 'площадь', 'наб', 'набережная', 'д', 'дом', 'к', 'корп', 'стр', 'кв', 'г', 'город',
+])
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def has_fts(model):
+    return connections[model.objects.db].vendor == 'sqlite'
+
+
+def match_expression(text):
+    """
+    Запрос пользователя в выражение FTS5: все слова, кроме STOP_WORDS,
+    обязательны, последнее (его могут ещё дописывать) ищется по началу, если
+    это не число. Поиск по началу каждого слова заметно дороже на частых
+    словах. Спецсимволы FTS5 в запрос не попадают. None, если слов нет.
+    """
+    words = WORD.findall(text.lower())
+    if not words:
+        return None
+    words = [word for word in words if word not in STOP_WORDS] or words
+    terms = [f'"{word}"' for word in words]
+    if not words[-1].isdigit():
+        # Номер дома набирают целиком, а "1"* совпал бы с тысячами номеров
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def filter_matching(queryset, text):
+    """Выборка, сужённая до заказов, в которых нашлись все слова text"""
+    expression = match_expression(text)
+    if expression is None:
+        return queryset
+    if not has_fts(queryset.model):
+        condition = Q()
+        for word in WORD.findall(text):
+            condition &= Q(*[Q(**{f'{field}__icontains': word}) for field in SEARCH_FIELDS], _connector=Q.OR)
+        return queryset.filter(condition)
+    table = fts_table(queryset.model)
+    return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM "{table}" WHERE "{table}" MATCH %s', [expression]))
+
+
+def _ranked_ids(model, expression, limit):
+    table = fts_table(model)
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    with connections[model.objects.db].cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, bm25("{table}", {weights}) FROM "{table}" WHERE "{table}" MATCH %s '
+            f'ORDER BY 2 LIMIT %s',
+            [expression, limit],
+        )
+        return cursor.fetchall()
+
+
+def search_orders(text, limit=SEARCH_LIMIT):
+    """
+    До limit заказов из рабочей таблицы и архива, лучшие совпадения первыми.
+    Возвращает список (заказ, оценка); чем меньше оценка bm25, тем лучше.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return []
+    found = []
+    for model in (Order, ArchivedOrder):
+        if has_fts(model):
+            ranked = _ranked_ids(model, expression, limit)
+        else:
+            ranked = [(pk, 0.0) for pk in filter_matching(model.objects.order_by('-created_at'), text)
+                      .values_list('pk', flat=True)[:limit]]
+        orders = model.objects.select_related('tariff').in_bulk([pk for pk, _ in ranked])
+        found.extend((orders[pk], score) for pk, score in ranked if pk in orders)
+    found.sort(key=lambda item: (item[1], -item[0].created_at.timestamp()))
+    return found[:limit]
+
+
+def prepare_connection(connection):
+    """
+    Загружает модуль FTS5 в соединение заранее. Иначе он читает свои настройки
+    при первой записи в заказы, а в общем кэше SQLite (тестовая база в памяти)
+    это чтение падает, если в то же время пишет другое соединение. Вызывать до
+    параллельной записи; DatabaseError, если индекса нет или таблица занята.
+    """
+    for model in (Order, ArchivedOrder):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM "{fts_table(model)}" LIMIT 0')
+
+
+def rebuild(models=(Order, ArchivedOrder)):
+    """Перестраивает индексы по содержимому таблиц (после загрузки в обход триггеров)"""
+    for model in models:
+        if has_fts(model):
+            table = fts_table(model)
+            with connections[model.objects.db].cursor() as cursor:
+                cursor.execute(f'INSERT INTO "{table}"("{table}") VALUES (\'rebuild\')')
+
+
+@contextmanager
+def deferred_indexing(model=Order):
+    """
+    Снимает триггер вставки на время массовой загрузки и перестраивает индекс
+    в конце: rebuild разбирает строки на слова в разы быстрее, чем триггер по
+    одной. Заказы, созданные в это время, до выхода из блока не ищутся.
+    """
+    if not has_fts(model):
+        yield
+        return
+    trigger = f'{model._meta.db_table}_fts_insert'
+    connection = connections[model.objects.db]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = %s", [trigger])
+        row = cursor.fetchone()
+        if row is not None:
+            cursor.execute(f'DROP TRIGGER "{trigger}"')
+    try:
+        yield
+    finally:
+        if row is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(row[0])
+        rebuild([model])
@@ -0,0 +1,124 @@
+"""Обработчики сигналов моделей"""
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import catalog, counters, events, profiling, rollups
+from .models import Driver, Order, PaymentMethod, Tariff
+from .surge import engine as surge_engine
+
+
+@receiver(post_save, sender=Driver)
+def track_driver_status(sender, instance, created, raw=False, **kwargs):
+    """Обновляет счётчики статусов при создании водителя и смене статуса"""
+    if raw:
+        return
+    old_status = None if created else getattr(instance, '_loaded_status', None)
+    if not created and old_status is None:
+        # Экземпляр создан вручную с pk - прежний статус неизвестен, сверка исправит
+        return
+    counters.record_transition(old_status, instance.status)
+    surge_engine.driver_status_changed_on_commit(instance.pk, instance.status)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Driver)
+def untrack_driver_status(sender, instance, **kwargs):
+    old_status = getattr(instance, '_loaded_status', None) or instance.status
+    counters.record_transition(old_status, None)
+    surge_engine.driver_deleted(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Driver)
+@receiver(m2m_changed, sender=Driver.available_tariffs.through)
+def invalidate_driver_pages(sender, raw=False, action=None, **kwargs):
+    """Любая правка водителя (не только статуса) меняет страницы со списками водителей"""
+    if not raw and action in (None, 'post_add', 'post_remove', 'post_clear'):
+        counters.invalidate()
+
+
+@receiver(m2m_changed, sender=Driver.available_tariffs.through)
+def track_driver_tariffs(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """Изменение тарифов водителя меняет предложение для surge и маску возможностей"""
+    if reverse and action == 'pre_clear':
+        # После очистки связей уже не узнать, каких водителей она затронула
+        instance._cleared_driver_ids = list(instance.driver_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Изменения со стороны тарифа затрагивают многих водителей - проще перечитать
+        surge_engine.reset()
+        Driver.refresh_capabilities(pk_set if pk_set is not None else instance.__dict__.pop('_cleared_driver_ids', []))
+        return
+    surge_engine.driver_tariffs_changed(instance.pk, instance.available_tariffs.values_list('pk', flat=True))
+    Driver.refresh_capabilities([instance.pk])
+
+
+@receiver(post_save, sender=Order)
+def track_order_demand(sender, instance, created, raw=False, **kwargs):
+    """Каждый новый заказ увеличивает спрос по своему тарифу после фиксации транзакции"""
+    if created and not raw:
+        surge_engine.record_order_on_commit(instance.tariff_id)
+
+
+@receiver(post_save, sender=Order)
+def publish_order_status(sender, instance, raw=False, **kwargs):
+    """Статус и водитель заказа уходят подписчикам SSE; повторы отбрасывает брокер"""
+    if not raw and events.broker.watching(instance.pk):
+        events.publish_on_commit(instance.pk, instance.status, instance.driver)
+
+
+@receiver(post_save, sender=Order)
+def track_order_rollup(sender, instance, created, raw=False, **kwargs):
+    """Переносит вклад заказа в сводных таблицах при создании и изменении"""
+    if raw:
+        return
+    old_values = None if created else getattr(instance, '_loaded_rollup', None)
+    if not created and old_values is None:
+        # Прежнее состояние неизвестно - исправит rebuild_order_rollups
+        return
+    new_values = instance.rollup_values()
+    rollups.record_change(old_values, new_values)
+    instance._loaded_rollup = new_values
+
+
+@receiver(post_delete, sender=Order)
+def untrack_order_rollup(sender, instance, **kwargs):
+    rollups.record_change(getattr(instance, '_loaded_rollup', None) or instance.rollup_values(), None)
+
+
+@receiver(pre_delete, sender=PaymentMethod)
+def fold_payment_method_rollups(sender, instance, **kwargs):
+    """У заказов способ оплаты обнулится - их вклад переходит в строки без способа оплаты"""
+    rollups.fold_payment_method(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Tariff)
+@receiver([post_save, post_delete], sender=PaymentMethod)
+def invalidate_catalog(sender, **kwargs):
+    """Любое изменение тарифов и способов оплаты (в том числе из админки) сбрасывает кэш"""
+    catalog.invalidate()
+
+
+@receiver(post_save, sender=Tariff)
+def refresh_tariff_capabilities(sender, instance, created, raw=False, **kwargs):
+    """Смена типа тарифа меняет бит у всех его водителей"""
+    if not created and not raw:
+        Driver.refresh_capabilities(instance.driver_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tariff)
+def remember_tariff_drivers(sender, instance, **kwargs):
+    # Связи удаляются каскадом без m2m_changed
+    instance._deleted_driver_ids = list(instance.driver_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tariff)
+def refresh_deleted_tariff_capabilities(sender, instance, **kwargs):
+    Driver.refresh_capabilities(getattr(instance, '_deleted_driver_ids', []))
+
+
+@receiver(connection_created)
+def install_query_profiler(sender, connection, **kwargs):
+    profiling.install(connection)
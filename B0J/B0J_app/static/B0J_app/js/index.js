@@ -0,0 +1,35 @@
+// Модальное окно
+function showOrderModal(tariffName) {
+    document.getElementById('orderModal').style.display = 'flex';
+}
+
+function hideOrderModal() {
+    document.getElementById('orderModal').style.display = 'none';
+}
+
+// Закрытие по клику на фон
+document.getElementById('orderModal').addEventListener('click', function(e) {
+    if (e.target === this) hideOrderModal();
+});
+
+// Плавная прокрутка
+document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+    anchor.addEventListener('click', function (e) {
+        e.preventDefault();
+        const targetId = this.getAttribute('href');
+        if (targetId === '#') return;
+
+        const targetElement = document.querySelector(targetId);
+        if (targetElement) {
+            targetElement.scrollIntoView({
+                behavior: 'smooth',
+                block: 'start'
+            });
+        }
+    });
+});
+
+// Перенаправление на страницу заказа
+function redirectToOrder(tariffName) {
+    window.location.href = '/order/';
+}
@@ -0,0 +1,109 @@
+// Текущие данные для расчета
+let currentTariff = null;
+let currentDistance = 0;
+
+// Инициализация при загрузке
+document.addEventListener('DOMContentLoaded', function() {
+    // Выделяем первый тариф и способ оплаты
+    const firstTariff = document.querySelector('.tariff-option');
+    const firstPayment = document.querySelector('.payment-option');
+    if (firstTariff) {
+        firstTariff.classList.add('selected');
+        currentTariff = {
+            id: firstTariff.querySelector('input[type="radio"]').value,
+            name: firstTariff.querySelector('.tariff-name').textContent
+        };
+    }
+    if (firstPayment) firstPayment.classList.add('selected');
+
+    // Координаты подачи нужны для поиска ближайшего водителя
+    if (navigator.geolocation) {
+        navigator.geolocation.getCurrentPosition(function(position) {
+            document.getElementById('pickup-lat').value = position.coords.latitude;
+            document.getElementById('pickup-lon').value = position.coords.longitude;
+        });
+    }
+
+    // Устанавливаем начальные значения
+    updateSummary();
+    calculatePrice();
+});
+
+function selectTariff(element, tariffId) {
+    // Снимаем выделение со всех тарифов
+    document.querySelectorAll('.tariff-option').forEach(el => {
+        el.classList.remove('selected');
+    });
+    // Выделяем выбранный
+    element.classList.add('selected');
+    // Устанавливаем radio кнопку
+    element.querySelector('input[type="radio"]').checked = true;
+
+    const tariffName = element.querySelector('.tariff-name').textContent;
+    currentTariff = {id: tariffId, name: tariffName};
+
+    // Обновляем сводку
+    document.getElementById('summary-tariff').textContent = tariffName;
+    calculatePrice();
+}
+
+function selectPayment(element, paymentId) {
+    // Снимаем выделение со всех способов оплаты
+    document.querySelectorAll('.payment-option').forEach(el => {
+        el.classList.remove('selected');
+    });
+    // Выделяем выбранный
+    element.classList.add('selected');
+    // Устанавливаем radio кнопку
+    element.querySelector('input[type="radio"]').checked = true;
+
+    // Обновляем сводку
+    const paymentName = element.querySelector('.payment-name').textContent;
+    document.getElementById('summary-payment').textContent = paymentName;
+}
+
+function updateSummary() {
+    document.getElementById('summary-name').textContent =
+        document.querySelector('input[name="customer_name"]').value || '—';
+    document.getElementById('summary-phone').textContent =
+        document.querySelector('input[name="customer_phone"]').value || '—';
+    document.getElementById('summary-from').textContent =
+        document.querySelector('input[name="pickup_address"]').value || '—';
+    document.getElementById('summary-to').textContent =
+        document.querySelector('input[name="destination_address"]').value || '—';
+
+    const selectedPayment = document.querySelector('.payment-option.selected');
+    if (selectedPayment) {
+        document.getElementById('summary-payment').textContent =
+            selectedPayment.querySelector('.payment-name').textContent;
+    }
+}
+
+// Стоимость считает сервер (/api/quote) - та же формула, что и при оформлении заказа
+let quoteRequest = 0;
+
+function calculatePrice() {
+    const distanceInput = document.querySelector('input[name="distance"]');
+    if (!distanceInput || !currentTariff || !currentTariff.id) return;
+
+    currentDistance = parseFloat(distanceInput.value) || 0;
+    const requestId = ++quoteRequest;
+    const params = new URLSearchParams({tariff: currentTariff.id, distance: currentDistance});
+
+    fetch('/api/quote?' + params)
+        .then(response => response.json())
+        .then(data => {
+            // Ответы на устаревшие запросы игнорируем
+            if (requestId !== quoteRequest || !data.quotes) return;
+            const quote = data.quotes[0];
+            document.getElementById('total-price').textContent =
+                Math.round(parseFloat(quote.price)) + ' ₽';
+            document.getElementById('distance-info').textContent =
+                currentDistance.toFixed(1) + ' км';
+            document.getElementById('time-info').textContent =
+                quote.minutes + ' мин';
+        });
+}
+
+// Автоматический расчет при изменении расстояния
+document.querySelector('input[name="distance"]').addEventListener('input', calculatePrice);
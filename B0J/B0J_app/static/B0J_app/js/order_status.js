@@ -0,0 +1,17 @@
+// Статус приходит по SSE; после завершения или отмены сервер закрывает поток.
+// Без ASGI сервер отдаёт только текущий статус, и EventSource сам переподключается
+const source = new EventSource(document.getElementById('order-section').dataset.eventsUrl);
+source.addEventListener('status', (event) => {
+    const data = JSON.parse(event.data);
+    document.getElementById('order-status').textContent = data.status_display;
+    const card = document.getElementById('driver-card');
+    card.hidden = !data.driver;
+    if (data.driver) {
+        document.getElementById('driver-name').textContent = data.driver.name;
+        document.getElementById('driver-car').textContent = `${data.driver.car_model} • ${data.driver.car_number}`;
+        document.getElementById('driver-phone').textContent = data.driver.phone;
+    }
+    if (data.status === 'completed' || data.status === 'cancelled') {
+        source.close();
+    }
+});
@@ -0,0 +1,19 @@
+// Все тарифы считаются одним запросом к /api/quote
+let quoteRequest = 0;
+
+function updateQuotes() {
+    const distance = parseFloat(document.getElementById('distance').value) || 0;
+    const requestId = ++quoteRequest;
+    fetch('/api/quote?' + new URLSearchParams({distance: distance}))
+        .then(response => response.json())
+        .then(data => {
+            if (requestId !== quoteRequest || !data.quotes) return;
+            data.quotes.forEach(quote => {
+                const element = document.getElementById('quote-' + quote.tariff);
+                if (element) element.textContent = quote.price + ' ₽';
+            });
+        });
+}
+
+document.getElementById('distance').addEventListener('input', updateQuotes);
+updateQuotes();
@@ -0,0 +1,157 @@
+"""Повышающий коэффициент (surge) по спросу и предложению в реальном времени"""
+import threading
+import time
+from collections import defaultdict
+
+from django.db import transaction
+
+# Окно, за которое считается спрос, и шаг его сдвига
+WINDOW_SECONDS = 300
+BUCKET_SECONDS = 10
+# Коэффициент в сотых долях: 100 = x1.00
+MIN_MULTIPLIER = 100
+MAX_MULTIPLIER = 250
+# На сколько растёт коэффициент, когда заказов за окно на одного свободного водителя больше одного
+SENSITIVITY = 50
+# Шаг округления, чтобы цена не "дрожала" от каждого заказа
+MULTIPLIER_STEP = 10
+# Как часто предложение перечитывается из базы: водителей захватывают и другие процессы
+SUPPLY_TTL = 15
+
+
+class SlidingWindowCounter:
+    """Число событий за последние WINDOW_SECONDS, кольцевой буфер интервалов"""
+
+    def __init__(self, window=WINDOW_SECONDS, bucket=BUCKET_SECONDS):
+        self.bucket = bucket
+        self.size = window // bucket
+        self.counts = [0] * self.size
+        self.slots = [None] * self.size
+        self.total = 0
+
+    def _expire(self, slot):
+        index = slot % self.size
+        if self.slots[index] != slot:
+            self.total -= self.counts[index]
+            self.counts[index] = 0
+            self.slots[index] = slot
+        return index
+
+    def add(self, now, amount=1):
+        index = self._expire(int(now // self.bucket))
+        self.counts[index] += amount
+        self.total += amount
+
+    def value(self, now):
+        current = int(now // self.bucket)
+        for index, slot in enumerate(self.slots):
+            if slot is not None and slot <= current - self.size:
+                self.total -= self.counts[index]
+                self.counts[index] = 0
+                self.slots[index] = None
+        return self.total
+
+
+def multiplier_for(demand, supply):
+    """Коэффициент в сотых долях по спросу за окно и числу свободных водителей"""
+    ratio = demand / max(supply, 1)
+    if ratio <= 1:
+        return MIN_MULTIPLIER
+    raw = MIN_MULTIPLIER + SENSITIVITY * (ratio - 1)
+    stepped = int(raw // MULTIPLIER_STEP) * MULTIPLIER_STEP
+    return max(MIN_MULTIPLIER, min(MAX_MULTIPLIER, stepped))
+
+
+class SurgeEngine:
+    """
+    Спрос (новые заказы) и предложение (свободные водители) по тарифам.
+    Состояние живёт в памяти процесса и обновляется событиями; свободные
+    водители перечитываются из базы не реже раза в SUPPLY_TTL секунд, чтобы
+    учесть изменения из других процессов (диспетчер, другие воркеры).
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._loaded_at = None
+            self.demand = defaultdict(SlidingWindowCounter)
+            self.supply = defaultdict(int)
+            self.driver_tariffs = {}
+            self.available = set()
+
+    def _ensure_loaded(self):
+        now = self.clock()
+        if self._loaded_at is not None and now - self._loaded_at < SUPPLY_TTL:
+            return
+        from .models import Driver
+        tariffs = defaultdict(set)
+        for driver_id, tariff_id in Driver.available_tariffs.through.objects.values_list('driver_id', 'tariff_id'):
+            tariffs[driver_id].add(tariff_id)
+        available = set(Driver.objects.filter(status='available').values_list('pk', flat=True))
+        self.driver_tariffs = dict(tariffs)
+        self.available = available
+        self.supply = defaultdict(int)
+        for driver_id in available:
+            for tariff_id in tariffs.get(driver_id, ()):
+                self.supply[tariff_id] += 1
+        self._loaded_at = now
+
+    def multiplier(self, tariff_id):
+        """Текущий коэффициент тарифа в сотых долях (100 = без повышения)"""
+        with self._lock:
+            self._ensure_loaded()
+            counter = self.demand.get(tariff_id)
+            demand = counter.value(self.clock()) if counter else 0
+            return multiplier_for(demand, self.supply.get(tariff_id, 0))
+
+    def record_order(self, tariff_id):
+        """Новый заказ по тарифу"""
+        with self._lock:
+            self.demand[tariff_id].add(self.clock())
+
+    def record_order_on_commit(self, tariff_id):
+        """record_order после фиксации транзакции: откаченный заказ спрос не увеличивает"""
+        transaction.on_commit(lambda: self.record_order(tariff_id))
+
+    def driver_status_changed(self, driver_id, new_status):
+        """Водитель стал свободен или перестал быть свободным"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            is_available = new_status == 'available'
+            if is_available == (driver_id in self.available):
+                return
+            delta = 1 if is_available else -1
+            (self.available.add if is_available else self.available.discard)(driver_id)
+            for tariff_id in self.driver_tariffs.get(driver_id, ()):
+                self.supply[tariff_id] += delta
+
+    def driver_status_changed_on_commit(self, driver_id, new_status):
+        """driver_status_changed после фиксации транзакции: откаченная смена статуса предложение не меняет"""
+        transaction.on_commit(lambda: self.driver_status_changed(driver_id, new_status))
+
+    def driver_tariffs_changed(self, driver_id, tariff_ids):
+        """У водителя изменился набор тарифов"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            old = self.driver_tariffs.get(driver_id, set())
+            new = set(tariff_ids)
+            if driver_id in self.available:
+                for tariff_id in old - new:
+                    self.supply[tariff_id] -= 1
+                for tariff_id in new - old:
+                    self.supply[tariff_id] += 1
+            self.driver_tariffs[driver_id] = new
+
+    def driver_deleted(self, driver_id):
+        self.driver_status_changed(driver_id, None)
+        with self._lock:
+            self.driver_tariffs.pop(driver_id, None)
+
+
+engine = SurgeEngine()
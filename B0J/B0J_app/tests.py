@@ -1,5 +1,37 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import timedelta
+from decimal import Decimal
+import os
+import tempfile
+import threading
+from collections import Counter
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.core.servers.basehttp import WSGIServer
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase
+from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    archive, assets, capabilities, catalog, counters, dispatch, events, heartbeats, history, matcher, pagecache, pricing,
+    profiling, rollups, routing, search, signals, surge, versions, views,
+)
+from .dispatch import claim_driver, eligible_drivers, nearest_drivers, nearest_drivers_linear, place_order
+from .geo import encode_geohash, haversine_km
+from .models import ArchivedOrder, Driver, ImportCheckpoint, Order, OrderRollup, PaymentMethod, Tariff
+from .pagination import estimated_count, keyset_after, keyset_page
+from .query_budget import QueryBudgetExceeded, QueryBudgetMixin, query_budget
+from .routers import READ_ALIAS, ReadWriteRouter, read_only
 
 class B0JAppTests(TestCase):
     def test_index_view(self):
@@ -8,11 +40,11 @@ class B0JAppTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'index.html')
     
-    def test_about_view(self):
-        """Тест страницы о компании"""
-        response = self.client.get('/about/')
+    def test_payment_methods_view(self):
+        """Тест страницы способов оплаты"""
+        response = self.client.get('/payment-methods/')
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'about.html')
+        self.assertTemplateUsed(response, 'payment_methods.html')
     
     def test_drivers_view(self):
         """Тест страницы водителей"""
@@ -20,8 +52,1551 @@ class B0JAppTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'drivers.html')
     
-    def test_contacts_view(self):
-        """Тест страницы контактов"""
-        response = self.client.get('/contacts/')
+    def test_calculate_price_view(self):
+        """Тест страницы расчёта стоимости"""
+        response = self.client.get('/calculate/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'price_calc.html')
+
+class NearestDriverTests(TestCase):
+    def setUp(self):
+        self.tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        self.pickup = (55.7558, 37.6173)
+        self.far = self.make_driver('Дальний', 55.90, 37.40)
+        self.near = self.make_driver('Ближний', 55.7560, 37.6180)
+        self.middle = self.make_driver('Средний', 55.77, 37.65)
+
+    def make_driver(self, name, lat, lon, status='available'):
+        driver = Driver.objects.create(
+            name=name, car_model='Kia', car_number='A001AA', phone='+7000',
+            status=status, latitude=lat, longitude=lon,
+        )
+        driver.available_tariffs.add(self.tariff)
+        return driver
+
+    def test_geohash_filled_on_save(self):
+        """Geohash вычисляется из координат при сохранении"""
+        self.assertEqual(self.near.geohash, encode_geohash(55.7560, 37.6180))
+
+    def test_nearest_matches_linear_scan(self):
+        """Поиск по индексу совпадает с полным перебором"""
+        lat, lon = self.pickup
+        indexed = nearest_drivers(lat, lon, k=3, tariff=self.tariff)
+        linear = nearest_drivers_linear(lat, lon, k=3, tariff=self.tariff)
+        self.assertEqual([d.pk for d in indexed], [self.near.pk, self.middle.pk, self.far.pk])
+        self.assertEqual([d.pk for d in indexed], [d.pk for d in linear])
+
+    def test_busy_and_other_tariff_drivers_skipped(self):
+        """Занятые водители и водители без тарифа не подбираются"""
+        self.near.status = 'busy'
+        self.near.save()
+        other = Driver.objects.create(
+            name='Без тарифа', car_model='Kia', car_number='A002AA', phone='+7000',
+            latitude=55.7559, longitude=37.6175,
+        )
+        lat, lon = self.pickup
+        found = [d.pk for d in nearest_drivers(lat, lon, k=3, tariff=self.tariff)]
+        self.assertNotIn(self.near.pk, found)
+        self.assertNotIn(other.pk, found)
+
+    def test_create_order_assigns_nearest_driver(self):
+        """Заказ с координатами получает ближайшего водителя"""
+        payment = PaymentMethod.objects.get(name='cash')
+        self.client.post(reverse('create_order'), {
+            'customer_name': 'Иван', 'customer_phone': '+7999', 'pickup_address': 'Тверская 1',
+            'destination_address': 'Арбат 2', 'tariff': self.tariff.pk, 'payment_method': payment.pk,
+            'distance': '5', 'pickup_lat': str(self.pickup[0]), 'pickup_lon': str(self.pickup[1]),
+        })
+        order = Order.objects.get()
+        self.assertEqual(order.driver_id, self.near.pk)
+
+
+
+class DriverClaimStressTests(TransactionTestCase):
+    THREADS = 8
+    ORDERS_PER_THREAD = 10
+
+    def setUp(self):
+        self.tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        for i in range(20):
+            driver = Driver.objects.create(name=f'Водитель {i}', car_model='Kia', car_number=f'A{i:03d}AA', phone='+7000')
+            driver.available_tariffs.add(self.tariff)
+
+    def test_no_double_assignment_under_concurrency(self):
+        """Параллельные заказы никогда не получают одного и того же водителя"""
+        errors = []
+        ready = threading.Barrier(self.THREADS)
+
+        def worker():
+            try:
+                # Общий кэш тестовой базы в памяти: FTS5 загружается до первой записи
+                search.prepare_connection(connection)
+                ready.wait()
+                for _ in range(self.ORDERS_PER_THREAD):
+                    order = Order(
+                        customer_name='Стресс', customer_phone='+7000', pickup_address='A',
+                        destination_address='B', tariff=self.tariff,
+                    )
+                    place_order(order, attempts=50)
+            except Exception as error:
+                errors.append(error)
+                ready.abort()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Order.objects.count(), self.THREADS * self.ORDERS_PER_THREAD)
+        assigned = Counter(Order.objects.exclude(driver=None).values_list('driver_id', flat=True))
+        self.assertEqual(len(assigned), 20)
+        self.assertTrue(all(count == 1 for count in assigned.values()))
+        self.assertEqual(Driver.objects.filter(status='available').count(), 0)
+        self.assertEqual(Order.objects.filter(status='pending').count(), self.THREADS * self.ORDERS_PER_THREAD - 20)
+
+
+class DriverStatusCounterTests(TestCase):
+    def make_driver(self, status='available'):
+        return Driver.objects.create(name='Пётр', car_model='Kia', car_number='A001AA', phone='+7000', status=status)
+
+    def test_counters_follow_status_transitions(self):
+        """Счётчики меняются при создании, смене статуса и удалении"""
+        driver = self.make_driver()
+        self.make_driver('offline')
+        driver = Driver.objects.get(pk=driver.pk)
+        driver.status = 'busy'
+        driver.save()
+        self.assertEqual(counters.status_counts(), {'available': 0, 'busy': 1, 'offline': 1, 'total': 2})
+        driver.delete()
+        self.assertEqual(counters.status_counts(), {'available': 0, 'busy': 0, 'offline': 1, 'total': 1})
+
+    def test_claim_updates_counters(self):
+        """Захват водителя при заказе переносит его из available в busy"""
+        driver = self.make_driver()
+        self.assertTrue(claim_driver(driver))
+        self.assertEqual(counters.status_counts()['busy'], 1)
+        self.assertEqual(counters.status_counts()['available'], 0)
+
+    def test_reconcile_fixes_drift(self):
+        """Сверка исправляет расхождение после массового UPDATE"""
+        self.make_driver()
+        Driver.objects.update(status='offline')
+        self.assertEqual(counters.reconcile(), {'available': -1, 'offline': 1})
+        self.assertEqual(counters.status_counts(), counters.actual_counts() | {'total': 1})
+
+    def test_bench_claim_leaves_counters_exact(self):
+        """Бенчмарк захвата создаёт и удаляет водителей, не сбивая счётчики"""
+        self.make_driver()
+        call_command('bench_claim', threads=1, orders=0, drivers=5, stdout=StringIO())
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_index_reads_counters(self):
+        """Главная страница не считает водителей запросами COUNT"""
+        self.make_driver()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['status_stats']['available'], 1)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+
+
+class DriverHeartbeatTests(TestCase):
+    def setUp(self):
+        surge.engine.reset()
+        self.buffer = heartbeats.HeartbeatBuffer(autoflush=False)
+        patcher = mock.patch.object(heartbeats, 'buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_driver(self, status='available', **fields):
+        return Driver.objects.create(name='Пётр', car_model='Kia', car_number='A001AA', phone='+7000', status=status, **fields)
+
+    def beat(self, driver, token=None, **payload):
+        return self.client.post(
+            reverse('api_driver_heartbeat'), data=json.dumps({'driver': driver.pk, **payload}),
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token or heartbeats.driver_token(driver.pk)}',
+        )
+
+    def test_reports_are_buffered_and_coalesced(self):
+        """Сигналы не ходят в базу, от водителя остаётся последний; запись - одной пачкой"""
+        driver = self.make_driver()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.beat(driver, lat=55.70, lon=37.50).status_code, 204)
+            self.assertEqual(self.beat(driver, lat=55.75, lon=37.61).status_code, 204)
+        self.assertEqual(self.buffer.pending(), 1)
+        result = self.buffer.flush()
+        self.assertEqual(result.reports, 1)
+        driver.refresh_from_db()
+        self.assertEqual((driver.latitude, driver.longitude), (55.75, 37.61))
+        self.assertEqual(driver.geohash, encode_geohash(55.75, 37.61))
+        self.assertIsNotNone(driver.last_seen_at)
+        self.assertEqual(self.buffer.pending(), 0)
+
+    def test_status_changes_update_counters(self):
+        """Выход на линию и уход с неё меняют статусы, счётчики и версию страниц водителей"""
+        coming = self.make_driver('offline')
+        leaving = self.make_driver()
+        busy = self.make_driver('busy')
+        version = versions.get_version(counters.DRIVERS)
+        self.beat(coming, lat=55.75, lon=37.61)
+        self.beat(leaving, status='offline')
+        self.beat(busy, lat=55.76, lon=37.62, status='available')
+        result = self.buffer.flush()
+        self.assertEqual((result.online, result.offline), (1, 1))
+        statuses = dict(Driver.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {coming.pk: 'available', leaving.pk: 'offline', busy.pk: 'busy'})
+        self.assertEqual(Driver.objects.get(pk=busy.pk).latitude, 55.76)
+        self.assertEqual(counters.status_counts(), counters.actual_counts() | {'total': 3})
+        self.assertNotEqual(versions.get_version(counters.DRIVERS), version)
+
+    def test_silent_drivers_go_offline(self):
+        """Свободные водители без сигнала дольше таймаута снимаются с линии"""
+        long_ago = timezone.now() - timedelta(seconds=heartbeats.OFFLINE_AFTER_SECONDS + 1)
+        silent = self.make_driver()
+        Driver.objects.filter(pk=silent.pk).update(last_seen_at=long_ago)
+        untracked = self.make_driver()
+        on_trip = self.make_driver('busy')
+        Driver.objects.filter(pk=on_trip.pk).update(last_seen_at=long_ago)
+        alive = self.make_driver()
+        self.buffer.record(alive.pk, 55.75, 37.61)
+        result = self.buffer.flush()
+        self.assertEqual(result.timed_out, 1)
+        statuses = dict(Driver.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {silent.pk: 'offline', untracked.pk: 'available', on_trip.pk: 'busy', alive.pk: 'available'})
+        self.assertEqual(counters.status_counts()['offline'], 1)
+
+    def test_older_report_does_not_overwrite_newer(self):
+        """Отчёт, задержавшийся в другом процессе, не затирает более свежую позицию"""
+        driver = self.make_driver()
+        self.buffer.record(driver.pk, 55.75, 37.61)
+        self.buffer.flush()
+        self.buffer.record(driver.pk, 55.10, 37.10, seen_at=timezone.now() - timedelta(seconds=10))
+        self.buffer.flush()
+        self.assertEqual(Driver.objects.get(pk=driver.pk).latitude, 55.75)
+
+    def test_rejects_bad_payload(self):
+        """Без id водителя или с чужим статусом - 400"""
+        driver = self.make_driver()
+        self.assertEqual(self.beat(driver, status='busy').status_code, 400)
+        response = self.client.post(reverse('api_driver_heartbeat'), data='[]', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.buffer.pending(), 0)
+
+    def test_rejects_missing_or_foreign_token(self):
+        """Без токена или с токеном другого водителя сигнал не принимается"""
+        driver, other = self.make_driver(), self.make_driver()
+        response = self.client.post(
+            reverse('api_driver_heartbeat'), data=json.dumps({'driver': driver.pk, 'status': 'offline'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.beat(driver, token=heartbeats.driver_token(other.pk), status='offline').status_code, 403)
+        self.assertEqual(self.beat(driver, token='x' * 64, status='offline').status_code, 403)
+        self.assertEqual(self.buffer.pending(), 0)
+        out = StringIO()
+        call_command('driver_token', str(driver.pk), stdout=out)
+        self.assertEqual(self.beat(driver, token=out.getvalue().split()[1]).status_code, 204)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        # Данные фиксируются, как в настоящем запросе: версии кэшей меняются после коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tariffs = [
+                Tariff.objects.create(name=name, base_price=100 + i, price_per_km=20, price_per_minute=5)
+                for i, (name, _) in enumerate(Tariff.TARIFF_TYPES)
+            ]
+
+    def add_drivers(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                driver = Driver.objects.create(
+                    name=f'Водитель {i}', car_model='Kia', car_number=f'A{i:03d}AA', phone='+7000',
+                    status=['available', 'busy', 'offline'][i % 3],
+                )
+                driver.available_tariffs.add(*self.tariffs[:1 + i % 3])
+
+    def test_views_cost_same_queries_regardless_of_fleet_size(self):
+        """Число запросов не зависит от количества водителей"""
+        urls = [reverse('index'), reverse('drivers'), reverse('drivers') + '?status=available']
+        self.add_drivers(10)
+        catalog.snapshot()  # бюджет считается для прогретого кэша справочников
+        small = [self.assertWithinQueryBudget(url) for url in urls]
+        self.add_drivers(60)
+        large = [self.assertWithinQueryBudget(url) for url in urls]
+        self.assertEqual(small, large)
+
+    def test_budget_violation_is_reported(self):
+        """Превышение бюджета приводит к падению теста"""
+        @query_budget(0)
+        def view(request):
+            pass
+
+        with self.assertRaises(QueryBudgetExceeded):
+            self.assertWithinQueryBudget(reverse('index'), view=view)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+
+    def test_hot_path_costs_no_catalog_queries(self):
+        """После прогрева справочники читаются без запросов к базе"""
+        catalog.snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog.active_tariffs(), [self.tariff])
+            self.assertTrue(catalog.active_payment_methods())
+            self.assertEqual(catalog.get_tariff(str(self.tariff.pk)), self.tariff)
+
+    def test_edit_invalidates_snapshot(self):
+        """Изменение тарифа видно уже на следующем запросе"""
+        catalog.snapshot()
+        self.tariff.base_price = 150
+        self.tariff.save()
+        self.assertEqual(catalog.active_tariffs()[0].base_price, 150)
+        self.tariff.is_active = False
+        self.tariff.save()
+        self.assertEqual(catalog.active_tariffs(), [])
+        # Неактивный тариф по-прежнему доступен по id для старых ссылок
+        self.assertEqual(catalog.get_tariff(self.tariff.pk), self.tariff)
+
+    def test_rolled_back_edit_does_not_stay_cached(self):
+        """Снимок, построенный внутри откаченной транзакции, не остаётся под живой версией"""
+        catalog.snapshot()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Tariff.objects.filter(pk=self.tariff.pk).update(base_price=150)
+            catalog.invalidate()
+            self.assertEqual(catalog.active_tariffs()[0].base_price, 150)
+            raise RuntimeError
+        self.assertEqual(catalog.active_tariffs()[0].base_price, 100)
+
+    def test_index_renders_cached_catalog(self):
+        """Главная страница показывает тарифы из кэша"""
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, self.tariff.get_name_display())
+
+
+class KeysetPaginationTests(QueryBudgetMixin, TestCase):
+    def test_drivers_pages_cover_every_driver_once(self):
+        """Обход страниц возвращает каждого водителя ровно один раз, в том числе при равном рейтинге"""
+        for i in range(7):
+            Driver.objects.create(name=f'Водитель {i}', car_model='Kia', car_number='A001AA', phone='+7000',
+                                  rating=[4.5, 5.0][i % 2])
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(Driver.objects.all(), ['-rating', '-id'], cursor=cursor, per_page=3)
+            seen.extend(page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual([d.pk for d in seen], list(Driver.objects.order_by('-rating', '-id').values_list('pk', flat=True)))
+
+    def test_order_history_is_routed_and_paginated(self):
+        """История заказов доступна по URL, следующая страница стоит столько же запросов"""
+        tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        Order.objects.bulk_create(
+            Order(customer_name=f'Клиент {i}', customer_phone='+7', pickup_address='A',
+                  destination_address='B', tariff=tariff)
+            for i in range(25)
+        )
+        url = reverse('order_history')
+        self.assertWithinQueryBudget(url)
+        first = self.client.get(url)
+        self.assertEqual(len(first.context['orders']), 20)
+        next_url = f"{url}?cursor={first.context['page'].next_cursor}"
+        self.assertWithinQueryBudget(next_url)
+        second = self.client.get(next_url)
+        self.assertEqual(len(second.context['orders']), 5)
+        self.assertFalse(set(first.context['orders']) & set(second.context['orders']))
+
+    def test_next_page_seeks_index(self):
+        """Страница после курсора ищет по индексу ключа, а не читает его с начала"""
+        now = timezone.now()
+        for queryset, fields, values in [
+            (Order.objects.all(), ['-created_at', '-id'], [now, 10]),
+            (Order.objects.all(), ['created_at', 'id'], [now, 10]),
+            (Driver.objects.all(), ['-rating', '-id'], [4.5, 10]),
+        ]:
+            plan = queryset.order_by(*fields).filter(keyset_after(fields, values)).explain()
+            self.assertIn('SEARCH', plan)
+            self.assertNotIn('SCAN', plan)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.client.get(reverse('drivers') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['page'].is_first)
+
+
+class ImportOrdersTests(TestCase):
+    def setUp(self):
+        self.tariff = Tariff.objects.create(name='comfort', base_price=150, price_per_km='25.50', price_per_minute=7)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as target:
+            target.write(text)
+        return path
+
+    def test_csv_import_prices_rows_and_keeps_dates(self):
+        """CSV загружается пачками, цена считается по тарифу, дата берётся из файла"""
+        path = self.write('orders.csv', (
+            'customer_name,customer_phone,pickup_address,destination_address,tariff,payment_method,distance,created_at\n'
+            'Анна,+7901,Ленина 1,Мира 2,comfort,cash,12.5,2024-03-01T10:00:00+00:00\n'
+            'Борис,+7902,Ленина 3,Мира 4,nonexistent,cash,3,\n'
+            f'Вера,+7903,Ленина 5,Мира 6,{self.tariff.pk},,2,\n'
+        ))
+        call_command('import_orders', path, batch_size=2, stdout=StringIO(), stderr=StringIO())
+        orders = Order.objects.order_by('customer_name')
+        self.assertEqual([o.customer_name for o in orders], ['Анна', 'Вера'])
+        anna = orders[0]
+        # 150 + 12.5 * 25.50 + (62 / 60) * 7 = 475.983...
+        self.assertEqual(anna.total_price, Decimal('475.98'))
+        self.assertEqual(anna.created_at.year, 2024)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.position, checkpoint.imported), (3, 2))
+
+    def test_jsonl_import_resumes_from_checkpoint(self):
+        """Повторный запуск продолжает с сохранённой позиции, не дублируя заказы"""
+        lines = [
+            json.dumps({'customer_name': f'Клиент {i}', 'customer_phone': '+7', 'pickup_address': 'A',
+                        'destination_address': 'B', 'tariff': 'comfort', 'distance': 1})
+            for i in range(5)
+        ]
+        path = self.write('orders.jsonl', '\n'.join(lines))
+        ImportCheckpoint.objects.create(source=path, position=3, imported=3)
+        call_command('import_orders', path, stdout=StringIO())
+        self.assertEqual(
+            list(Order.objects.order_by('customer_name').values_list('customer_name', flat=True)),
+            ['Клиент 3', 'Клиент 4'],
+        )
+        call_command('import_orders', path, stdout=StringIO())
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_broken_jsonl_lines_are_skipped_and_passed_on_resume(self):
+        """Испорченная строка и строка не-объект считаются ошибочными; продолжение идёт после них"""
+        record = {'customer_name': 'Анна', 'customer_phone': '+7', 'pickup_address': 'A',
+                  'destination_address': 'B', 'tariff': 'comfort', 'distance': 1}
+        path = self.write('orders.jsonl', '\n'.join([
+            json.dumps(record), '{"customer_name": "Борис",', '[1, 2]', '42',
+            json.dumps(dict(record, customer_name='Вера')),
+        ]))
+        stderr = StringIO()
+        call_command('import_orders', path, batch_size=2, stdout=StringIO(), stderr=stderr)
+        self.assertEqual(sorted(Order.objects.values_list('customer_name', flat=True)), ['Анна', 'Вера'])
+        self.assertEqual([line.split(':')[0] for line in stderr.getvalue().splitlines()],
+                         ['Запись 2', 'Запись 3', 'Запись 4'])
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.position, checkpoint.imported), (5, 2))
+
+        # Продолжение с позиции перед строкой не-объектом не застревает на ней
+        checkpoint.position, checkpoint.imported = 2, 1
+        checkpoint.save()
+        Order.objects.filter(customer_name='Вера').delete()
+        call_command('import_orders', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(sorted(Order.objects.values_list('customer_name', flat=True)), ['Анна', 'Вера'])
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.position, checkpoint.imported), (5, 2))
+
+
+class SeedSyntheticTests(TestCase):
+    OPTIONS = {'drivers': 40, 'orders': 500, 'days': 14, 'seed': 7, 'chunk': 120}
+
+    def seed(self, **options):
+        call_command('seed_synthetic', end=timezone.localdate() - timedelta(days=1),
+                     stdout=StringIO(), **(self.OPTIONS | options))
+
+    def snapshot(self):
+        return list(Order.objects.order_by('created_at', 'customer_phone', 'pk').values_list(
+            'customer_name', 'pickup_address', 'tariff__name', 'driver__car_number', 'distance',
+            'total_price', 'payment_method__name', 'status', 'created_at',
+        ))
+
+    def rollup_rows(self):
+        return sorted(OrderRollup.objects.values_list(
+            'day', 'tariff_id', 'payment_method_id', 'orders_count', 'total_amount', 'paid_amount', 'commission_amount',
+        ))
+
+    def test_same_seed_gives_same_data(self):
+        """Один и тот же seed дважды даёт те же заказы, другой seed - другие"""
+        self.seed()
+        first = self.snapshot()
+        self.assertEqual(len(first), 500)
+        Order.objects.all().delete()
+        Driver.objects.all().delete()
+        Tariff.objects.all().delete()
+        self.seed()
+        self.assertEqual(self.snapshot(), first)
+        Order.objects.all().delete()
+        self.seed(seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_seeded_data_is_consistent(self):
+        """Сводка, маски возможностей, счётчики и поиск сходятся с загруженными строками"""
+        self.seed()
+        self.assertEqual(Tariff.objects.count(), len(Tariff.TARIFF_TYPES))
+        self.assertFalse(Driver.objects.filter(available_tariffs__isnull=True).exists())
+        self.assertFalse(Driver.objects.filter(capabilities=0).exists())
+        self.assertEqual(counters.status_counts(), counters.actual_counts() | {'total': 40})
+        self.assertEqual(Order.objects.exclude(status__in=['completed', 'cancelled']).count(), 0)
+        self.assertFalse(Order.objects.filter(created_at__gte=timezone.now()).exists())
+        for order in Order.objects.select_related('driver')[:50]:
+            if order.driver is not None:
+                self.assertTrue(order.driver.available_tariffs.filter(pk=order.tariff_id).exists())
+        seeded = self.rollup_rows()
+        rollups.rebuild()
+        self.assertEqual(self.rollup_rows(), seeded)
+        order = Order.objects.order_by('pk').last()
+        self.assertIn(order.pk, [found.pk for found, _ in search.search_orders(order.pickup_address)])
+
+
+class SingleThreadLiveServer(LiveServerThread):
+    """
+    Сервер обрабатывает запросы по одному: с базой в памяти все его потоки
+    делят одно соединение, и параллельные транзакции ломали бы друг другу точки сохранения
+    """
+
+    def _create_server(self, connections_override=None):
+        return WSGIServer((self.host, self.port), QuietWSGIRequestHandler, allow_reuse_address=False)
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    # Страницы только для чтения ходят в зеркало READ_ALIAS
+    databases = {DEFAULT_DB_ALIAS, READ_ALIAS}
+    server_thread_class = SingleThreadLiveServer
+
+    def setUp(self):
+        tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        PaymentMethod.objects.get_or_create(name='card', defaults={'icon': '💳'})
+        for i in range(5):
+            driver = Driver.objects.create(name=f'Водитель {i}', car_model='Kia', car_number=f'L{i:03d}AA', phone='+7000')
+            driver.available_tariffs.add(tariff)
+
+    def load(self, *args):
+        out = StringIO()
+        call_command('load_test', '--url', self.live_server_url, '--duration', '30', *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_mixed_traffic_report(self):
+        """Смешанная нагрузка с заказами через форму CSRF проходит без ошибок, отчёт - JSON"""
+        report = self.load('--requests', '40', '--concurrency', '4', '--max-error-rate', '0')
+        self.assertTrue(report['passed'])
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(set(report['scenarios']), {'index', 'drivers', 'quote', 'order_form', 'order_submit'})
+        submitted = report['scenarios']['order_submit']
+        self.assertEqual(Order.objects.count(), submitted['requests'])
+        self.assertEqual(submitted['statuses'], {'302': submitted['requests']})
+        for key in ('p50', 'p95', 'p99'):
+            self.assertGreater(report['latency_ms'][key], 0)
+        self.assertGreater(report['throughput_rps'], 0)
+
+    def test_threshold_violation_fails(self):
+        """Превышенный порог задержки завершает команду ошибкой"""
+        with self.assertRaisesMessage(CommandError, 'p95'):
+            self.load('--requests', '5', '--mix', 'quote=1', '--max-p95-ms', '0.001')
+
+
+class PricingTests(TestCase):
+    def setUp(self):
+        surge.engine.reset()
+        self.economy = Tariff.objects.create(name='economy', base_price=100, price_per_km='20.00', price_per_minute=5)
+        self.comfort = Tariff.objects.create(name='comfort', base_price=150, price_per_km='25.50', price_per_minute=7)
+
+    def test_calculate_price_is_exact(self):
+        """Цена считается без ошибок смешения Decimal и float и округляется до копейки"""
+        order = Order(tariff=self.comfort, distance=12.5, estimated_time=62)
+        self.assertEqual(order.calculate_price(), Decimal('475.98'))
+
+    def batch(self):
+        """Пачка поездок больше NUMPY_THRESHOLD и поштучно посчитанные копейки"""
+        table = pricing.RateTable([self.economy, self.comfort])
+        tariff_ids = [self.economy.pk, self.comfort.pk] * 100
+        hundredths = list(range(0, 20000, 100))
+        minutes = [pricing.estimate_minutes(h) for h in hundredths]
+        expected = [
+            pricing.price_kopecks(table.rates[t], h, m) for t, h, m in zip(tariff_ids, hundredths, minutes)
+        ]
+        return table, (tariff_ids, hundredths, minutes), expected
+
+    @skipUnless(pricing.np, "NumPy не установлен")
+    def test_numpy_batch_matches_scalar(self):
+        """Пачка через NumPy даёт те же копейки, что поштучный расчёт, и не идёт в цикл"""
+        table, args, expected = self.batch()
+        with mock.patch.object(pricing, 'price_kopecks', side_effect=AssertionError):
+            self.assertEqual(table.price(*args), expected)
+
+    def test_fallback_batch_matches_scalar(self):
+        """Без NumPy пачка считается в цикле с тем же результатом"""
+        table, args, expected = self.batch()
+        with mock.patch.object(pricing, 'np', None):
+            self.assertEqual(table.price(*args), expected)
+
+    def test_quote_api_batch(self):
+        """API считает пачку поездок одним запросом"""
+        response = self.client.post(
+            reverse('api_quote'),
+            data=json.dumps({'items': [
+                {'tariff': self.comfort.pk, 'distance': 12.5, 'minutes': 62},
+                {'tariff': self.economy.pk, 'distance': '3'},
+            ]}),
+            content_type='application/json',
+        )
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'contacts.html')
\ No newline at end of file
+        quotes = response.json()['quotes']
+        self.assertEqual([q['price'] for q in quotes], ['475.98', '161.25'])
+        self.assertEqual(quotes[1]['minutes'], 15)
+
+    def test_quote_api_rejects_unknown_tariff(self):
+        """Неизвестный тариф - ошибка 400 с номером позиции"""
+        response = self.client.get(reverse('api_quote'), {'tariff': 999, 'distance': 5})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999', response.json()['error'])
+
+    def test_quote_api_without_tariff_quotes_all_active(self):
+        """GET без тарифа возвращает цены по всем активным тарифам"""
+        response = self.client.get(reverse('api_quote'), {'distance': 10})
+        self.assertEqual({q['tariff'] for q in response.json()['quotes']}, {self.economy.pk, self.comfort.pk})
+
+    def test_calculator_page(self):
+        """Страница калькулятора показывает активные тарифы"""
+        response = self.client.get(reverse('calculate_price'))
+        self.assertContains(response, 'id="quote-%d"' % self.comfort.pk)
+
+
+
+class RouteEstimatorTests(TestCase):
+    # Понедельник, 8 утра по UTC (TIME_ZONE проекта)
+    RUSH_HOUR = timezone.datetime(2026, 10, 19, 8, 0, tzinfo=timezone.get_current_timezone())
+
+    def setUp(self):
+        self.estimator = routing.RouteEstimator()
+
+    def test_estimate_uses_road_factor_and_hourly_speed(self):
+        """Длина - прямая с коэффициентом извилистости, время - по скорости часа"""
+        estimate = self.estimator.estimate(55.751, 37.618, 55.751, 37.718, when=self.RUSH_HOUR)
+        straight = haversine_km(55.751, 37.618, 55.751, 37.718)
+        self.assertEqual(estimate.hundredths, round(straight * routing.DEFAULT_ROAD_FACTOR * 100))
+        self.assertEqual(estimate.minutes, routing.minutes_for(estimate.hundredths, routing.WEEKDAY_SPEEDS[8]))
+        night = self.estimator.estimate(55.751, 37.618, 55.751, 37.718, when=self.RUSH_HOUR - timedelta(hours=6))
+        self.assertLess(night.minutes, estimate.minutes)
+
+    def test_grid_factor_applies_to_cells(self):
+        """Коэффициент поездки - среднее коэффициентов ячеек начала и конца"""
+        grid = routing.RoadFactorGrid()
+        grid.factors[grid.cell(55.751, 37.618)] = 2.0
+        estimator = routing.RouteEstimator(grid)
+        inside = estimator.estimate(55.751, 37.618, 55.751, 37.619, when=self.RUSH_HOUR)
+        across = estimator.estimate(55.751, 37.618, 55.751, 37.718, when=self.RUSH_HOUR)
+        self.assertEqual(inside.hundredths, 13)
+        self.assertEqual(across.hundredths, round(haversine_km(55.751, 37.618, 55.751, 37.718) * 165))
+
+    def test_cache_keyed_by_quantized_points_and_hour(self):
+        """Точки в пределах шага квантования и тот же час берутся из кэша"""
+        first = self.estimator.estimate(55.75101, 37.61799, 55.76, 37.64, when=self.RUSH_HOUR)
+        second = self.estimator.estimate(55.75098, 37.61802, 55.76, 37.64, when=self.RUSH_HOUR + timedelta(minutes=30))
+        self.assertEqual(first, second)
+        self.assertEqual(self.estimator.cache_info().hits, 1)
+        self.estimator.estimate(55.75101, 37.61799, 55.76, 37.64, when=self.RUSH_HOUR + timedelta(hours=1))
+        self.assertEqual(self.estimator.cache_info().misses, 2)
+
+    def batch(self):
+        """Оценщик с сеткой, пачка поездок больше NUMPY_THRESHOLD и поштучные оценки"""
+        grid = routing.RoadFactorGrid({(1115, 752): 1.5, (1116, 752): 1.1})
+        estimator = routing.RouteEstimator(grid)
+        points = [
+            (55.70 + i * 0.0013, 37.55 + i * 0.0021, 55.80 - i * 0.0007, 37.70 - i * 0.0011)
+            for i in range(200)
+        ] + [(55.75, 37.6, 55.75, 37.6)]
+        expected = [estimator.estimate(*point, when=self.RUSH_HOUR) for point in points]
+        return estimator, list(zip(*points)), expected
+
+    def assertBatchMatches(self, estimator, columns, expected):
+        hundredths, minutes = estimator.estimate_many(*columns, when=self.RUSH_HOUR)
+        self.assertEqual(hundredths, [e.hundredths for e in expected])
+        self.assertEqual(minutes, [e.minutes for e in expected])
+        self.assertEqual((hundredths[-1], minutes[-1]), (0, 0))
+
+    @skipUnless(routing.np, "NumPy не установлен")
+    def test_numpy_batch_matches_single_estimates(self):
+        """Пачка через NumPy даёт те же сотые и минуты, что поштучная оценка, и не идёт в цикл"""
+        estimator, columns, expected = self.batch()
+        with mock.patch.object(estimator, '_estimate_quantized', side_effect=AssertionError):
+            self.assertBatchMatches(estimator, columns, expected)
+
+    def test_fallback_batch_matches_single_estimates(self):
+        """Без NumPy пачка оценивается в цикле с тем же результатом"""
+        estimator, columns, expected = self.batch()
+        with mock.patch.object(routing, 'np', None):
+            self.assertBatchMatches(estimator, columns, expected)
+
+    def test_create_order_estimates_route_from_coordinates(self):
+        """Заказ с координатами обеих точек получает расчётные расстояние и время"""
+        tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        payment = PaymentMethod.objects.create(name='cash')
+        self.client.post(reverse('create_order'), {
+            'customer_name': 'Иван', 'customer_phone': '+7999', 'pickup_address': 'Тверская 1',
+            'destination_address': 'Арбат 2', 'tariff': tariff.pk, 'payment_method': payment.pk, 'distance': '50',
+            'pickup_lat': '55.751', 'pickup_lon': '37.618', 'destination_lat': '55.751', 'destination_lon': '37.718',
+        })
+        order = Order.objects.get()
+        estimate = routing.estimator.estimate(55.751, 37.618, 55.751, 37.718)
+        self.assertEqual(order.distance, Decimal(estimate.hundredths) / 100)
+        self.assertEqual(order.estimated_time, estimate.minutes)
+        self.assertEqual(order.destination_longitude, 37.718)
+
+    def test_quote_api_accepts_routes(self):
+        """API расчёта принимает координаты вместо расстояния"""
+        tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        response = self.client.post(
+            reverse('api_quote'),
+            data=json.dumps({'items': [
+                {'tariff': tariff.pk, 'route': [55.751, 37.618, 55.751, 37.718]},
+                {'tariff': tariff.pk, 'route': [55.751, 37.618, 55.751, 37.718], 'minutes': 3},
+                {'tariff': tariff.pk, 'distance': 2},
+            ]}),
+            content_type='application/json',
+        )
+        quotes = response.json()['quotes']
+        estimate = routing.estimator.estimate(55.751, 37.618, 55.751, 37.718)
+        self.assertEqual(quotes[0]['distance'], str(Decimal(estimate.hundredths) / 100))
+        self.assertEqual([q['minutes'] for q in quotes], [estimate.minutes, 3, 10])
+        response = self.client.get(reverse('api_quote'), {'tariff': tariff.pk, 'pickup_lat': 55.751, 'pickup_lon': 200})
+        self.assertEqual(response.status_code, 400)
+
+
+class SurgeTests(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.engine = surge.SurgeEngine(clock=lambda: self.now)
+        self.tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        for i in range(2):
+            driver = Driver.objects.create(name=f'Водитель {i}', car_model='Kia', car_number='A001AA', phone='+7')
+            driver.available_tariffs.add(self.tariff)
+
+    def test_multiplier_grows_with_demand_and_is_bounded(self):
+        """Коэффициент растёт, когда заказов больше, чем свободных водителей, и ограничен сверху"""
+        self.assertEqual(self.engine.multiplier(self.tariff.pk), 100)
+        for _ in range(6):
+            self.engine.record_order(self.tariff.pk)
+        self.assertEqual(self.engine.multiplier(self.tariff.pk), 200)
+        for _ in range(100):
+            self.engine.record_order(self.tariff.pk)
+        self.assertEqual(self.engine.multiplier(self.tariff.pk), surge.MAX_MULTIPLIER)
+
+    def test_demand_expires_after_window(self):
+        """Старые заказы выпадают из окна"""
+        for _ in range(6):
+            self.engine.record_order(self.tariff.pk)
+        self.now += surge.WINDOW_SECONDS + surge.BUCKET_SECONDS
+        self.assertEqual(self.engine.multiplier(self.tariff.pk), 100)
+
+    def test_supply_tracks_driver_transitions_without_queries(self):
+        """Предложение обновляется событиями, чтение коэффициента не обращается к базе"""
+        self.engine.multiplier(self.tariff.pk)
+        for _ in range(4):
+            self.engine.record_order(self.tariff.pk)
+        self.engine.driver_status_changed(Driver.objects.first().pk, 'busy')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.engine.multiplier(self.tariff.pk), 250)
+
+    def test_rolled_back_claim_keeps_supply(self):
+        """Захват водителя меняет предложение только после коммита; откат его не трогает"""
+        self.engine.multiplier(self.tariff.pk)
+        driver = Driver.objects.first()
+        with mock.patch.object(dispatch, 'surge_engine', self.engine):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.assertTrue(claim_driver(driver))
+                raise RuntimeError
+            self.assertEqual(self.engine.supply[self.tariff.pk], 2)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(claim_driver(Driver.objects.get(pk=driver.pk)))
+        self.assertEqual(self.engine.supply[self.tariff.pk], 1)
+
+    def test_rolled_back_order_adds_no_demand(self):
+        """Спрос растёт после коммита заказа; откаченный заказ не учитывается"""
+        def create_order():
+            Order.objects.create(customer_name='Клиент', customer_phone='+7', pickup_address='A',
+                                 destination_address='B', tariff=self.tariff)
+
+        with mock.patch.object(signals, 'surge_engine', self.engine):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                create_order()
+                raise RuntimeError
+            self.assertNotIn(self.tariff.pk, self.engine.demand)
+            with self.captureOnCommitCallbacks(execute=True):
+                create_order()
+        self.assertEqual(self.engine.demand[self.tariff.pk].value(self.now), 1)
+
+    def test_supply_is_reloaded_after_ttl(self):
+        """Изменения водителей из других процессов попадают в предложение за SUPPLY_TTL"""
+        self.engine.multiplier(self.tariff.pk)
+        Driver.objects.update(status='busy')
+        self.engine.multiplier(self.tariff.pk)
+        self.assertEqual(self.engine.supply[self.tariff.pk], 2)
+        self.now += surge.SUPPLY_TTL
+        self.engine.multiplier(self.tariff.pk)
+        self.assertEqual(self.engine.supply[self.tariff.pk], 0)
+
+    def test_calculate_price_applies_surge(self):
+        """Цена заказа умножается на коэффициент и он сохраняется в заказе"""
+        order = Order(tariff=self.tariff, distance=3, estimated_time=15)
+        self.assertEqual(order.calculate_price(surge_multiplier=150), Decimal('241.88'))
+        self.assertEqual(order.surge_multiplier, Decimal('1.5'))
+
+
+class MatcherTests(TestCase):
+    def setUp(self):
+        surge.engine.reset()
+        self.economy = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        self.business = Tariff.objects.create(name='business', base_price=300, price_per_km=50, price_per_minute=10)
+
+    def make_driver(self, name, lat, lon, *tariffs):
+        driver = Driver.objects.create(
+            name=name, car_model='Kia', car_number='A001AA', phone='+7', latitude=lat, longitude=lon
+        )
+        driver.available_tariffs.add(*tariffs)
+        return driver
+
+    def make_order(self, tariff, lat, lon):
+        return Order.objects.create(
+            customer_name='Клиент', customer_phone='+7', pickup_address='A', destination_address='B',
+            tariff=tariff, pickup_latitude=lat, pickup_longitude=lon, distance=5, estimated_time=15,
+        )
+
+    def test_solve_assignment_minimizes_total_cost(self):
+        """Решение минимизирует сумму, а не отдаёт каждому заказу ближайшего водителя по очереди"""
+        candidates = {1: [(10, 100), (11, 120)], 2: [(10, 110)]}
+        self.assertEqual(matcher.solve_assignment(candidates), {1: 11, 2: 10})
+
+    def test_solve_assignment_leaves_extra_orders_unassigned(self):
+        """Водитель достаётся только одному заказу; заказы без кандидатов пропускаются"""
+        result = matcher.solve_assignment({1: [(10, 500)], 2: [(10, 100)], 3: []})
+        self.assertEqual(result, {2: 10})
+
+    def test_tick_respects_tariffs_and_claims_drivers(self):
+        """Проход назначает только водителей с нужным тарифом и переводит их в busy"""
+        near = self.make_driver('Рядом', 55.7558, 37.6173, self.economy)
+        business = self.make_driver('Бизнес', 55.7600, 37.6200, self.business)
+        economy_order = self.make_order(self.economy, 55.7560, 37.6170)
+        business_order = self.make_order(self.business, 55.7560, 37.6170)
+        orphan = self.make_order(self.economy, 55.7700, 37.6400)
+
+        tick = matcher.run_tick(seed=1)
+
+        self.assertEqual((tick.pending, tick.drivers, tick.assigned), (3, 2, 2))
+        self.assertEqual(Order.objects.get(pk=economy_order.pk).driver_id, near.pk)
+        self.assertEqual(Order.objects.get(pk=business_order.pk).driver_id, business.pk)
+        self.assertEqual(Order.objects.get(pk=orphan.pk).status, 'pending')
+        self.assertEqual(set(Driver.objects.values_list('status', flat=True)), {'busy'})
+        self.assertEqual(counters.status_counts()['busy'], 2)
+
+    def test_tick_keeps_same_type_tariffs_apart(self):
+        """Водитель одного тарифа эконом не назначается на заказ другого тарифа того же типа"""
+        other = Tariff.objects.create(name='economy', base_price=120, price_per_km=20, price_per_minute=5)
+        driver = self.make_driver('Водитель', 55.7558, 37.6173, self.economy)
+        other_order = self.make_order(other, 55.7560, 37.6170)
+        self.assertEqual(matcher.run_tick(seed=1).assigned, 0)
+
+        order = self.make_order(self.economy, 55.7560, 37.6170)
+        self.assertEqual(matcher.run_tick(seed=1).assigned, 1)
+        self.assertEqual(Order.objects.get(pk=order.pk).driver_id, driver.pk)
+        self.assertEqual(Order.objects.get(pk=other_order.pk).status, 'pending')
+
+    def test_tick_skips_driver_taken_meanwhile(self):
+        """Если водителя уже захватили, пачка переигрывается поштучно без двойного назначения"""
+        driver = self.make_driver('Водитель', 55.7558, 37.6173, self.economy)
+        order = self.make_order(self.economy, 55.7560, 37.6170)
+        Driver.objects.filter(pk=driver.pk).update(status='busy')
+        self.assertEqual(matcher.apply_assignment({order.pk: driver.pk}), 0)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pending')
+
+
+class DriverCapabilitiesTests(TestCase):
+    def setUp(self):
+        self.family = Tariff.objects.create(name='family', base_price=200, price_per_km=30, price_per_minute=5)
+        self.economy = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        self.driver = Driver.objects.create(
+            name='Водитель', car_model='Kia', car_number='A001AA', phone='+7', has_child_seat=True, max_passengers=6
+        )
+
+    def caps(self):
+        return Driver.objects.get(pk=self.driver.pk).capabilities
+
+    def test_mask_follows_tariffs_and_equipment(self):
+        """Маска меняется при добавлении тарифов и изменении оснащения"""
+        self.driver.available_tariffs.add(self.family)
+        self.assertTrue(self.caps() & Tariff.CAPABILITY_BITS['family'])
+        self.assertTrue(self.caps() & capabilities.CHILD_SEAT)
+
+        driver = Driver.objects.get(pk=self.driver.pk)
+        driver.has_child_seat = False
+        driver.save(update_fields=['has_child_seat'])
+        self.assertFalse(self.caps() & capabilities.CHILD_SEAT)
+        self.assertTrue(self.caps() & Tariff.CAPABILITY_BITS['family'])
+
+        self.driver.available_tariffs.remove(self.family)
+        self.assertFalse(self.caps() & capabilities.TARIFFS)
+
+    def test_reverse_changes_and_tariff_delete_resync(self):
+        """Изменения со стороны тарифа и его удаление тоже обновляют маску"""
+        self.family.driver_set.add(self.driver)
+        self.assertTrue(self.caps() & Tariff.CAPABILITY_BITS['family'])
+        self.family.driver_set.clear()
+        self.assertFalse(self.caps() & capabilities.TARIFFS)
+
+        self.economy.driver_set.add(self.driver)
+        self.economy.delete()
+        self.assertFalse(self.caps() & capabilities.TARIFFS)
+
+    def test_eligible_drivers_single_predicate(self):
+        """Тариф, кресло и число мест проверяются одним условием без JOIN"""
+        self.driver.available_tariffs.add(self.family)
+        small = Driver.objects.create(name='Малый', car_model='Kia', car_number='A002AA', phone='+7', has_child_seat=True)
+        small.available_tariffs.add(self.family)
+
+        queryset = eligible_drivers(self.family, child_seat=True, passengers=6)
+        self.assertNotIn('JOIN', str(queryset.query))
+        self.assertEqual(list(queryset), [self.driver])
+        self.assertEqual(set(eligible_drivers(self.family, child_seat=True)), {self.driver, small})
+        self.assertFalse(eligible_drivers(self.economy).exists())
+
+    def test_same_type_tariffs_are_told_apart_by_links(self):
+        """Бит типа общий для тарифов одного типа - допуск к каждому проверяется по связям"""
+        self.driver.available_tariffs.add(self.economy)
+        other = Tariff.objects.create(name='economy', base_price=120, price_per_km=20, price_per_minute=5)
+        self.assertEqual(list(eligible_drivers(self.economy)), [self.driver])
+        self.assertFalse(eligible_drivers(other).exists())
+        # Единственный тариф своего типа по-прежнему проверяется только маской
+        self.assertNotIn('JOIN', str(eligible_drivers(self.family).query))
+
+    def test_refresh_repairs_bulk_created_links(self):
+        """Пересчёт чинит маску после bulk_create связей в обход сигналов"""
+        Through = Driver.available_tariffs.through
+        Through.objects.bulk_create([Through(driver_id=self.driver.pk, tariff_id=self.economy.pk)])
+        self.assertEqual(Driver.refresh_capabilities(), 1)
+        self.assertTrue(self.caps() & Tariff.CAPABILITY_BITS['economy'])
+
+
+class ReadRoutingTests(TestCase):
+    def test_read_only_view_reads_from_read_alias(self):
+        """Вне транзакции чтение в read_only-представлении идёт в соединение read"""
+        router = ReadWriteRouter()
+        seen = []
+        view = read_only(lambda: seen.append(router.db_for_read(Driver)))
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', False):
+            view()
+            seen.append(router.db_for_read(Driver))
+        self.assertEqual(seen, [READ_ALIAS, None])
+        self.assertEqual(router.db_for_write(Driver), DEFAULT_DB_ALIAS)
+
+    def test_open_transaction_keeps_reads_on_default(self):
+        """Внутри транзакции default чтение остаётся в ней, чтобы видеть свои изменения"""
+        router = ReadWriteRouter()
+        self.assertIsNone(read_only(lambda: router.db_for_read(Driver))())
+
+    def test_read_only_keeps_query_budget(self):
+        """Декоратор не теряет бюджет запросов представления"""
+        self.assertEqual(views.index.query_budget, 3)
+        self.assertEqual(self.client.get(reverse('drivers')).status_code, 200)
+
+
+class AsyncViewTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tariff = Tariff.objects.create(name='comfort', base_price=150, price_per_km=25, price_per_minute=6)
+            driver = Driver.objects.create(name='Иван', car_model='Kia', car_number='A001AA', phone='+7')
+            driver.available_tariffs.add(self.tariff)
+
+    async def test_pages_render_under_async_client(self):
+        """Асинхронные страницы отдаются через AsyncClient без синхронных обращений к базе"""
+        for name in ['index', 'drivers', 'calculate_price', 'payment_methods']:
+            response = await self.async_client.get(reverse(name))
+            self.assertEqual(response.status_code, 200, name)
+        response = await self.async_client.get(reverse('index'))
+        self.assertContains(response, 'Иван')
+
+    def test_async_views_keep_query_budgets(self):
+        """Запросы асинхронного ORM учитываются в бюджете представления"""
+        catalog.snapshot()
+        self.assertEqual(self.assertWithinQueryBudget(reverse('index')), 3)
+        self.assertEqual(self.assertWithinQueryBudget(reverse('drivers')), 3)
+        self.assertEqual(self.assertWithinQueryBudget(reverse('payment_methods')), 0)
+
+    def test_payment_methods_page_lists_active_methods(self):
+        """Страница способов оплаты показывает только активные"""
+        PaymentMethod.objects.create(name='sbp', icon='🏦', description='Через СБП')
+        PaymentMethod.objects.create(name='corporate', icon='🏢', is_active=False)
+        response = self.client.get(reverse('payment_methods'))
+        self.assertContains(response, 'Через СБП')
+        self.assertNotContains(response, 'Корпоративный')
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profiling.registry.reset()
+        with self.captureOnCommitCallbacks(execute=True):
+            tariff = Tariff.objects.create(name='comfort', base_price=150, price_per_km=25, price_per_minute=6)
+            driver = Driver.objects.create(name='Иван', car_model='Kia', car_number='A001AA', phone='+7')
+            driver.available_tariffs.add(tariff)
+        catalog.snapshot()
+
+    def timings(self, response):
+        return dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+
+    def test_server_timing_counts_queries_of_sync_and_async_views(self):
+        """Server-Timing считает запросы и у синхронного, и у асинхронного представления"""
+        response = self.client.get(reverse('index'))
+        self.assertIn('desc="3 queries"', self.timings(response)['db'])
+        response = self.client.get(reverse('order_history'))
+        self.assertIn('desc="2 queries"', self.timings(response)['db'])
+        self.assertNotEqual(self.timings(response)['tpl'], 'dur=0.00')
+
+    async def test_server_timing_under_async_client(self):
+        """Под ASGI замеры доходят до потоков sync_to_async"""
+        response = await self.async_client.get(reverse('index'))
+        self.assertIn('desc="3 queries"', self.timings(response)['db'])
+
+    def test_metrics_endpoint_exposes_histograms(self):
+        """/metrics отдаёт накопленные гистограммы в формате Prometheus"""
+        self.client.get(reverse('order_history'))
+        self.client.get(reverse('order_history'))
+        self.client.get('/no-such-page/')
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE b0j_request_duration_seconds histogram', text)
+        self.assertIn('b0j_request_duration_seconds_count{view="order_history"} 2', text)
+        self.assertIn('b0j_db_queries_bucket{view="order_history",le="1.0"} 0', text)
+        self.assertIn('b0j_db_queries_bucket{view="order_history",le="2.0"} 2', text)
+        self.assertIn('b0j_db_queries_bucket{view="order_history",le="+Inf"} 2', text)
+        self.assertIn('b0j_db_queries_sum{view="order_history"} 4', text)
+        self.assertIn(f'b0j_request_duration_seconds_count{{view="{profiling.UNMATCHED}"}} 1', text)
+
+    def test_queries_outside_requests_are_not_counted(self):
+        """Запросы вне обработки HTTP-запроса в гистограммы не попадают"""
+        Tariff.objects.count()
+        self.assertEqual(profiling.registry.render().count('_count{'), 0)
+
+
+class OrderEventsTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        self.driver = Driver.objects.create(name='Пётр', car_model='Lada', car_number='B002BB', phone='+7')
+        self.order = Order.objects.create(
+            customer_name='Анна', customer_phone='+7999', pickup_address='A', destination_address='B',
+            tariff=self.tariff,
+        )
+
+    def assign(self, status='accepted'):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.driver = self.driver
+            self.order.status = status
+            self.order.save()
+
+    async def test_status_change_reaches_subscriber(self):
+        """Сохранение заказа публикует новый статус и водителя; повтор того же состояния не рассылается"""
+        subscription = events.broker.subscribe(self.order.pk)
+        try:
+            await sync_to_async(self.assign)()
+            events.broker.publish(events.order_payload(self.order))
+            event_id, data = await subscription.get(1)
+            self.assertEqual(data['status'], 'accepted')
+            self.assertEqual(data['driver']['car_number'], 'B002BB')
+            self.assertIsNone(await subscription.get(0.05))
+        finally:
+            subscription.close()
+        self.assertEqual(events.broker.subscriber_count(), 0)
+
+    def test_unwatched_order_publishes_nothing(self):
+        """Без подписчиков сохранение заказа не добавляет работы после коммита"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.order.status = 'cancelled'
+            self.order.save()
+        self.assertEqual(callbacks, [])
+
+    def test_wsgi_view_answers_snapshot_without_subscribing(self):
+        """Без ASGI-обёртки ответ - снимок статуса для опроса: подписки нет, сохранения заказа проходят"""
+        response = self.client.get(reverse('order_events', args=[self.order.pk]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertIn(f'retry: {events.RETRY_MS}', body)
+        self.assertIn('"status": "pending"', body)
+        self.assertEqual(events.broker.subscriber_count(), 0)
+        self.assign()
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, 'accepted')
+
+    def test_subscription_of_closed_loop_is_dropped_on_publish(self):
+        """Подписка из закрывшегося цикла (async_to_sync) не ломает сохранение заказа и удаляется"""
+        async def subscribe():
+            return events.broker.subscribe(self.order.pk)
+
+        async_to_sync(subscribe)()
+        self.assertEqual(events.broker.subscriber_count(), 1)
+        self.assign()
+        self.assertEqual(events.broker.subscriber_count(), 0)
+
+    async def test_stream_for_missing_order_is_404(self):
+        response = await self.async_client.get(reverse('order_events', args=[self.order.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(events.broker.subscriber_count(), 0)
+
+    def test_create_order_redirects_to_status_page(self):
+        """После оформления клиент попадает на страницу отслеживания заказа"""
+        payment = PaymentMethod.objects.get(name='cash')
+        response = self.client.post(reverse('create_order'), {
+            'customer_name': 'Иван', 'customer_phone': '+7999', 'pickup_address': 'Тверская 1',
+            'destination_address': 'Арбат 2', 'tariff': self.tariff.pk, 'payment_method': payment.pk,
+            'distance': '5',
+        }, follow=True)
+        order = Order.objects.latest('id')
+        self.assertRedirects(response, reverse('order_status', args=[order.pk]))
+        self.assertContains(response, 'успешно создан')
+        self.assertContains(response, reverse('order_events', args=[order.pk]))
+        self.assertEqual(self.assertWithinQueryBudget(reverse('order_status', args=[order.pk])), 1)
+
+
+class OrderEventsPollingTests(TransactionTestCase):
+    def setUp(self):
+        tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        self.order = Order.objects.create(
+            customer_name='Анна', customer_phone='+7999', pickup_address='A', destination_address='B', tariff=tariff,
+        )
+
+    async def stream(self, *changes):
+        """Тело потока заказа через ASGI-обёртку; changes выполняются по одному после каждого события"""
+        sent, disconnect = [], asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        django_app = mock.AsyncMock()
+        app = events.route_order_events(django_app)
+        scope = {'type': 'http', 'method': 'GET', 'path': f'/order/{self.order.pk}/events'}
+        with mock.patch.object(events, 'POLL_SECONDS', 0.05):
+            task = asyncio.ensure_future(app(scope, receive, send))
+            for count, change in enumerate(changes, start=2):
+                while len(sent) < count:
+                    await asyncio.sleep(0.01)
+                await change()
+            await asyncio.wait_for(task, 5)
+        django_app.assert_not_called()
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(events.broker.subscriber_count(), 0)
+        return b''.join(message.get('body', b'') for message in sent[1:]).decode()
+
+    def save_order(self, **fields):
+        for name, value in fields.items():
+            setattr(self.order, name, value)
+        self.order.save()
+
+    async def test_asgi_stream_sends_saves_and_closes_on_final_status(self):
+        """Сохранения заказа сразу доходят до потока; поток закрывается после финального статуса"""
+        driver = await Driver.objects.acreate(name='Пётр', car_model='Lada', car_number='B002BB', phone='+7')
+        body = await self.stream(
+            sync_to_async(lambda: self.save_order(driver=driver, status='accepted')),
+            sync_to_async(lambda: self.save_order(status='completed')),
+        )
+        self.assertIn('"status": "pending"', body)
+        self.assertIn('"car_number": "B002BB"', body)
+        self.assertIn('"status": "completed"', body)
+
+    async def test_asgi_stream_picks_up_changes_from_other_processes(self):
+        """Изменение в обход сигналов (как из run_dispatcher) доходит до клиента через общий опрос"""
+        body = await self.stream(lambda: Order.objects.filter(pk=self.order.pk).aupdate(status='cancelled'))
+        self.assertIn('"status": "pending"', body)
+        self.assertIn('"status": "cancelled"', body)
+
+    async def test_other_paths_go_to_django(self):
+        django_app = mock.AsyncMock()
+        scope = {'type': 'http', 'method': 'GET', 'path': '/order/1/'}
+        await events.route_order_events(django_app)(scope, None, None)
+        django_app.assert_awaited_once_with(scope, None, None)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tariff = Tariff.objects.create(name='comfort', base_price=150, price_per_km=25, price_per_minute=6)
+            self.driver = Driver.objects.create(
+                name='Иван', car_model='Kia', car_number='A001AA', phone='+7', status='offline',
+            )
+
+    def test_repeat_anonymous_get_served_without_queries(self):
+        """Повторная анонимная страница отдаётся из кэша без запросов к базе"""
+        first = self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('index'))
+        self.assertEqual(first.content, second.content)
+
+    def test_catalog_edit_refreshes_page_and_fragments(self):
+        """Правка тарифа (как из админки) сразу видна на страницах и во фрагментах"""
+        self.client.get(reverse('index'))
+        self.client.get(reverse('create_order'))
+        self.tariff.base_price = 777
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tariff.save()
+        self.assertContains(self.client.get(reverse('index')), '777')
+        self.assertContains(self.client.get(reverse('create_order')), '777')
+
+    def test_driver_status_change_refreshes_page(self):
+        """Смена статуса водителя меняет версию страниц со списками водителей"""
+        self.assertNotContains(self.client.get(reverse('index')), 'A001AA')
+        self.driver.status = 'available'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.driver.save()
+        self.assertContains(self.client.get(reverse('index')), 'A001AA')
+        with self.captureOnCommitCallbacks(execute=True):
+            Driver.objects.filter(pk=self.driver.pk).update(status='busy')
+            counters.record_transition('available', 'busy')
+        self.assertNotContains(self.client.get(reverse('index')), 'A001AA')
+
+    def test_visitors_with_session_bypass_cache(self):
+        """С cookie сессии или сообщений страница собирается заново"""
+        self.client.get(reverse('index'))
+        self.client.cookies['sessionid'] = 'x'
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('index'))
+        self.assertGreater(len(queries), 0)
+
+    def test_personal_or_failed_responses_are_not_stored(self):
+        """Ответы с ошибкой, cookie или Vary собираются заново при каждом запросе"""
+        calls = Counter()
+
+        @pagecache.cache_page_versioned(catalog.CATALOG)
+        def view(request):
+            calls[request.get_full_path()] += 1
+            response = HttpResponse('ok', status=int(request.GET.get('status', 200)))
+            if 'cookie' in request.GET:
+                response.set_cookie('x', '1')
+            if 'vary' in request.GET:
+                response['Vary'] = 'Accept-Language'
+            return response
+
+        factory = RequestFactory()
+        paths = ['/page/?status=404', '/page/?cookie=1', '/page/?vary=1', '/page/']
+        for path in paths * 2:
+            view(factory.get(path))
+        self.assertEqual(calls, {'/page/?status=404': 2, '/page/?cookie=1': 2, '/page/?vary=1': 2, '/page/': 1})
+
+    def test_cached_page_keeps_query_budget_attribute(self):
+        self.assertEqual(views.index.query_budget, 3)
+        self.assertEqual(views.payment_methods.query_budget, 1)
+
+    def test_tariff_texts_are_built_once(self):
+        """get_features и get_extra_info не собирают словари на каждый вызов"""
+        self.assertIs(self.tariff.get_features(), Tariff(name='comfort').get_features())
+        self.assertEqual(Tariff(name='unknown').get_features(), ("Стандартные условия",))
+        self.assertEqual(self.tariff.get_extra_info(), "Идеально для деловых встреч")
+
+
+class StaticAssetsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.settings = override_settings(STATIC_ROOT=cls.static_root.name, DEBUG=False)
+        cls.settings.enable()
+        # brotli с максимальным качеством медленный, для проверки хватит .gz
+        with mock.patch.object(assets, 'brotli', None):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.static_root.cleanup()
+        super().tearDownClass()
+
+    def test_pages_link_hashed_assets_instead_of_inline_css(self):
+        """Стили и скрипты страниц - внешние файлы с хэшем содержимого в имени"""
+        response = self.client.get(reverse('create_order'))
+        self.assertNotContains(response, '<style>')
+        self.assertRegex(response.content.decode(), r'/static/B0J_app/css/order_payment\.[0-9a-f]{12}\.css')
+        self.assertRegex(response.content.decode(), r'/static/B0J_app/js/order_payment\.[0-9a-f]{12}\.js')
+
+    def test_hashed_asset_is_precompressed_and_cached_forever(self):
+        """Готовая сжатая копия выбирается по Accept-Encoding, кэш - на год"""
+        from django.templatetags.static import static
+        url = static('B0J_app/css/index.css')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], assets.IMMUTABLE_CACHE_CONTROL)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn(b'.tariff-card', b''.join(plain.streaming_content))
+        self.assertEqual(self.client.get('/static/B0J_app/css/index.css')['Cache-Control'],
+                         assets.REVALIDATE_CACHE_CONTROL)
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    def test_html_is_gzipped(self):
+        response = self.client.get(reverse('payment_methods'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class OrderArchiveTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        old = timezone.now() - timedelta(days=90)
+        self.orders = {}
+        for status in ['completed', 'cancelled', 'pending', 'in_progress']:
+            for age in ['old', 'new']:
+                order = Order.objects.create(
+                    customer_name=f'{status} {age}', customer_phone='+7', pickup_address='A',
+                    destination_address='B', tariff=self.tariff, status=status, total_price=Decimal('250.00'),
+                )
+                if age == 'old':
+                    Order.objects.filter(pk=order.pk).update(created_at=old)
+                self.orders[status, age] = order.pk
+
+    def test_only_old_finished_orders_are_moved(self):
+        """В архив уходят только старые завершённые и отменённые заказы, поля и id сохраняются"""
+        run = archive.archive_orders(days=30, batch_size=1, pause=0)
+        self.assertEqual((run.moved, run.batches), (2, 2))
+        archived = {self.orders['completed', 'old'], self.orders['cancelled', 'old']}
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', flat=True)), archived)
+        self.assertFalse(Order.objects.filter(pk__in=archived).exists())
+        self.assertEqual(Order.objects.count(), 6)
+        moved = ArchivedOrder.objects.get(pk=self.orders['completed', 'old'])
+        self.assertEqual((moved.customer_name, moved.tariff, moved.total_price),
+                         ('completed old', self.tariff, Decimal('250.00')))
+        # Повторный запуск ничего не переносит
+        self.assertEqual(archive.archive_orders(days=30, pause=0).moved, 0)
+
+    def test_status_change_after_selection_keeps_order_hot(self):
+        """Заказ, который перестал подходить под условия, остаётся в рабочей таблице"""
+        pk = self.orders['completed', 'old']
+        Order.objects.filter(pk=pk).update(status='in_progress')
+        self.assertEqual(archive.archive_batch([pk], archive.archive_cutoff(30)), 0)
+        self.assertTrue(Order.objects.filter(pk=pk).exists())
+
+    def test_history_reads_both_tables(self):
+        """История и страница заказа видят архивные заказы, порядок от новых к старым"""
+        archive.archive_orders(days=30, pause=0)
+        rows = list(Order.objects.values_list('created_at', 'pk')) + list(ArchivedOrder.objects.values_list('created_at', 'pk'))
+        expected = [pk for _, pk in sorted(rows, reverse=True)]
+        seen, cursor = [], None
+        while True:
+            page = history.history_page(cursor=cursor, per_page=3)
+            seen.extend(order.pk for order in page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertWithinQueryBudget(reverse('order_history'))
+        pk = self.orders['cancelled', 'old']
+        response = self.client.get(reverse('order_status', args=[pk]))
+        self.assertEqual(response.context['order'], ArchivedOrder.objects.get(pk=pk))
+        self.assertTrue(response.context['is_final'])
+        with self.assertRaises(Order.DoesNotExist):
+            history.get_order(0)
+
+    def test_command_reports_progress(self):
+        """Команда archive_orders переносит заказы и печатает итог"""
+        out = StringIO()
+        call_command('archive_orders', days=30, pause=0, stdout=out)
+        self.assertIn('перенесено 2', out.getvalue())
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+
+
+class OrderRollupTests(TestCase):
+    def setUp(self):
+        self.tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        self.card = PaymentMethod.objects.create(name='card', icon='💳', commission=Decimal('2.50'))
+        self.today = timezone.localdate()
+
+    def create_order(self, total, **fields):
+        return Order.objects.create(
+            customer_name='Клиент', customer_phone='+7', pickup_address='A', destination_address='B',
+            tariff=self.tariff, payment_method=self.card, total_price=Decimal(total), **fields,
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = list(OrderRollup.objects.order_by('day', 'tariff', 'payment_method').values(*rollups.MEASURES))
+        rollups.rebuild()
+        rebuilt = list(OrderRollup.objects.order_by('day', 'tariff', 'payment_method').values(*rollups.MEASURES))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_saves_and_status_changes_update_rollup(self):
+        """Создание, оплата и отмена заказа меняют сводку, результат совпадает с пересчётом"""
+        first = self.create_order('300.00')
+        second = self.create_order('101.00', is_paid=True)
+        self.assertEqual(rollups.totals(self.today, self.today), {
+            'orders_count': 2, 'total_amount': Decimal('401.00'),
+            'paid_amount': Decimal('101.00'), 'commission_amount': Decimal('2.53'),
+        })
+        first = Order.objects.get(pk=first.pk)
+        first.is_paid = True
+        first.save()
+        second.status = 'cancelled'
+        second.save()
+        self.assertEqual(rollups.totals(self.today, self.today), {
+            'orders_count': 1, 'total_amount': Decimal('300.00'),
+            'paid_amount': Decimal('300.00'), 'commission_amount': Decimal('7.50'),
+        })
+        self.assertMatchesRebuild()
+        first.delete()
+        self.assertEqual(rollups.totals(self.today, self.today)['orders_count'], 0)
+
+    def test_rollup_survives_archive_and_payment_method_removal(self):
+        """Перенос в архив не меняет сводку; удаление способа оплаты переносит строки в "без способа" """
+        order = self.create_order('500.00', is_paid=True, status='completed')
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=90))
+        rollups.rebuild()
+        before = rollups.totals(self.today - timedelta(days=100), self.today)
+        archive.archive_orders(days=30, pause=0)
+        self.assertEqual(rollups.totals(self.today - timedelta(days=100), self.today), before)
+        self.assertMatchesRebuild()
+        self.card.delete()
+        row = OrderRollup.objects.get()
+        self.assertIsNone(row.payment_method)
+        self.assertEqual(row.total_amount, Decimal('500.00'))
+
+    def test_rate_change_keeps_commission_of_paid_orders(self):
+        """Новая ставка действует на следующие оплаты; пересчёт сводки прошлую комиссию не меняет"""
+        self.create_order('300.00', is_paid=True)
+        unpaid = self.create_order('200.00')
+        self.card.commission = Decimal('10.00')
+        self.card.save()
+        unpaid = Order.objects.get(pk=unpaid.pk)
+        unpaid.is_paid = True
+        unpaid.save(update_fields=['is_paid'])
+        self.assertEqual(Order.objects.get(pk=unpaid.pk).commission_amount, Decimal('20.00'))
+        rollups.rebuild()
+        self.assertEqual(rollups.totals(self.today, self.today)['commission_amount'], Decimal('27.50'))
+        self.assertMatchesRebuild()
+
+    def test_reports_read_only_rollup_rows(self):
+        """Отчёт за период читает сводку, а не заказы"""
+        for total in ['100.00', '200.00', '300.00']:
+            self.create_order(total)
+        with CaptureQueriesContext(connection) as queries:
+            report = rollups.by_day(self.today, self.today, tariff=self.tariff)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"B0J_app_order"', queries[0]['sql'])
+        self.assertEqual((report[0]['orders_count'], report[0]['total_amount']), (3, Decimal('600.00')))
+
+
+class OrderAdminTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(self.user)
+        self.tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        self.driver = Driver.objects.create(name='Иван', car_model='Kia', car_number='A001AA', phone='+7')
+        now = timezone.now()
+        for i in range(30):
+            order = Order.objects.create(
+                customer_name=f'Клиент {i}', customer_phone=f'+7900{i:07d}', pickup_address='A',
+                destination_address='B', tariff=self.tariff, driver=self.driver,
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(days=40 * i))
+        self.url = reverse('admin:B0J_app_order_changelist')
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Список заказов не делает запрос на каждую строку"""
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        for i in range(30):
+            driver = Driver.objects.create(name=f'Водитель {i}', car_model='Kia', car_number='A001AA', phone='+7')
+            Order.objects.create(customer_name='Ещё', customer_phone='+7', pickup_address='A',
+                                 destination_address='B', tariff=self.tariff, driver=driver)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(len(small), len(large))
+
+    def test_large_counts_are_estimated(self):
+        """Выше порога число строк оценивается, ниже - считается точно"""
+        queryset = Order.objects.all()
+        self.assertEqual(estimated_count(queryset), 30)
+        self.assertGreater(estimated_count(queryset, threshold=10), 10)
+        self.assertGreater(estimated_count(queryset.filter(customer_name__startswith='Клиент'), threshold=10), 10)
+
+    def test_search_by_phone_prefix_and_name_words(self):
+        """Поиск по началу телефона и по словам имени находит только подходящие заказы"""
+        response = self.client.get(self.url, {'q': '+79000000001'})
+        self.assertEqual({o.customer_name for o in response.context['cl'].result_list}, {'Клиент 1'})
+        # Число ищется целиком: "Клиент 20".."Клиент 29" не подходят
+        response = self.client.get(self.url, {'q': 'клиент 2'})
+        self.assertEqual([o.customer_name for o in response.context['cl'].result_list], ['Клиент 2'])
+
+    def test_date_hierarchy_matches_distinct_dates(self):
+        """Периоды иерархии дат совпадают с DISTINCT по усечённой дате"""
+        for kind in ['year', 'month', 'day']:
+            expected = list(QuerySet(Order).datetimes('created_at', kind))
+            self.assertEqual(Order.objects.datetimes('created_at', kind), expected)
+        year = Order.objects.earliest('created_at').created_at.year
+        response = self.client.get(self.url, {'created_at__year': year})
+        self.assertEqual(response.status_code, 200)
+
+    def test_tariffs_and_drivers_stay_editable(self):
+        """Тарифы и водители правятся из админки, окно выбора водителя заказа открывается"""
+        for name in ['tariff', 'driver']:
+            response = self.client.get(reverse(f'admin:B0J_app_{name}_changelist'))
+            self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('admin:B0J_app_driver_changelist'), {'_popup': 1, '_to_field': 'id'})
+        self.assertContains(response, self.driver.car_number)
+
+
+class OrderSearchTests(TestCase):
+    def setUp(self):
+        self.tariff = Tariff.objects.create(name='economy', base_price=100, price_per_km=20, price_per_minute=5)
+        self.lenina = self.create_order('Пётр', 'ул. Ленина, 10', 'Аэропорт Шереметьево')
+        self.mira = self.create_order('Анна Ленина', 'пр. Мира, 5', 'ул. Садовая, 1')
+
+    def create_order(self, name, pickup, destination, **fields):
+        return Order.objects.create(
+            customer_name=name, customer_phone='+7', pickup_address=pickup,
+            destination_address=destination, tariff=self.tariff, **fields,
+        )
+
+    def found(self, text):
+        return [order.pk for order, _ in search.search_orders(text)]
+
+    def test_index_follows_saves_deletes_and_bulk_writes(self):
+        """Индекс видит изменения через save(), update(), bulk_create и удаление"""
+        self.assertEqual(set(self.found('ленина')), {self.lenina.pk, self.mira.pk})
+        self.assertEqual(self.found('шереметь'), [self.lenina.pk])
+        self.lenina.destination_address = 'Внуково'
+        self.lenina.save()
+        self.assertEqual(self.found('шереметьево'), [])
+        self.assertEqual(self.found('внуково'), [self.lenina.pk])
+        Order.objects.filter(pk=self.mira.pk).update(pickup_address='Тверская, 7')
+        self.assertEqual(self.found('тверская 7'), [self.mira.pk])
+        bulk, = Order.objects.bulk_create([Order(customer_name='Олег', customer_phone='+7', pickup_address='Арбат',
+                                                 destination_address='Кремль', tariff=self.tariff)])
+        self.assertEqual(self.found('арбат'), [bulk.pk])
+        self.mira.delete()
+        self.assertEqual(self.found('ленина'), [self.lenina.pk])
+
+    def test_archived_orders_stay_searchable(self):
+        """Заказ, перенесённый в архив, находится поиском"""
+        Order.objects.filter(pk=self.lenina.pk).update(status='completed', created_at=timezone.now() - timedelta(days=90))
+        archive.archive_orders(days=30, pause=0)
+        found = search.search_orders('шереметьево')
+        self.assertEqual([(type(order), order.pk) for order, _ in found], [(ArchivedOrder, self.lenina.pk)])
+
+    def test_name_matches_rank_first_and_query_syntax_is_escaped(self):
+        """Совпадение в имени весит больше; спецсимволы FTS5 не ломают запрос"""
+        self.assertEqual(self.found('ленина'), [self.mira.pk, self.lenina.pk])
+        self.assertEqual(self.found('"ленина" OR NEAR(*'), [])
+        self.assertEqual(self.found('***'), [])
+
+    def test_admin_and_api_use_index(self):
+        """Поиск в админке и JSON API; API доступен только сотрудникам"""
+        url = reverse('api_order_search')
+        self.assertEqual(self.client.get(url, {'q': 'ленина'}).status_code, 403)
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(user)
+        response = self.client.get(reverse('admin:B0J_app_order_changelist'), {'q': 'садовая'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.mira])
+        results = self.client.get(url, {'q': 'ленина', 'limit': 1}).json()['results']
+        self.assertEqual([(r['id'], r['archived']) for r in results], [(self.mira.pk, False)])
+        self.assertEqual(self.client.get(url, {'q': ''}).status_code, 400)
@@ -7,5 +7,12 @@ urlpatterns = [
     path('drivers/', views.drivers, name='drivers'),
     path('calculate/', views.calculate_price, name='calculate_price'),
     path('order/', views.create_order, name='create_order'),
+    path('order/<int:pk>/', views.order_status, name='order_status'),
+    path('order/<int:pk>/events', views.order_events, name='order_events'),
     path('payment-methods/', views.payment_methods, name='payment_methods'),
+    path('history/', views.order_history, name='order_history'),
+    path('api/quote', views.quote, name='api_quote'),
+    path('api/orders/search', views.order_search, name='api_order_search'),
+    path('api/drivers/heartbeat', views.driver_heartbeat, name='api_driver_heartbeat'),
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""Версии наборов данных, общие для всех рабочих процессов"""
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+# Отдельный кэш, видимый всем процессам (см. CACHES в settings.py)
+VERSION_CACHE = 'shared'
+
+
+def _cache():
+    return caches[VERSION_CACHE]
+
+
+class _Bump:
+    """Смена версии после фиксации транзакции; до неё версия считается неизвестной"""
+
+    def __init__(self, name):
+        self.name = name
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        _cache().set(f'version:{self.name}', uuid.uuid4().hex, None)
+
+
+def _bump_pending(name):
+    """
+    True, если открытая транзакция этого потока уже изменила данные набора.
+    Откат транзакции или точки сохранения убирает её обработчики on_commit,
+    поэтому отменённые изменения признак не оставляют.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return False
+    return any(
+        isinstance(func, _Bump) and func.name == name and not func.done
+        for _, func, _ in connection.run_on_commit
+    )
+
+
+def get_version(name):
+    """
+    Текущая версия набора данных; создаётся при первом обращении. Внутри
+    транзакции, изменившей набор, каждый раз новая одноразовая версия: то,
+    что построено по незафиксированным данным, не попадает в кэш под живой версией.
+    """
+    if _bump_pending(name):
+        return uuid.uuid4().hex
+    key = f'version:{name}'
+    version = _cache().get(key)
+    if version is None:
+        _cache().add(key, uuid.uuid4().hex, None)
+        version = _cache().get(key)
+    return version
+
+
+def bump_version(name):
+    """
+    Объявляет данные устаревшими. Версия меняется только после фиксации
+    транзакции: при откате закэшированное под текущей версией остаётся верным.
+    """
+    if not _bump_pending(name):
+        transaction.on_commit(_Bump(name))
@@ -1,31 +1,75 @@
+import asyncio
+import json
+from decimal import Decimal, InvalidOperation
+
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from .models import Driver, Tariff, PaymentMethod, Order
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from .models import ArchivedOrder, Driver, Tariff, PaymentMethod, Order
+from . import catalog, counters, events, heartbeats, history, pricing, profiling, routing, search
+from .dispatch import place_order
+from .pagecache import cache_page_versioned
+from .pagination import akeyset_page
+from .query_budget import query_budget
+from .routers import read_only
+from .surge import engine as surge_engine
+
+DRIVERS_PER_PAGE = 24
+ORDERS_PER_PAGE = 20
+MAX_QUOTE_ITEMS = 10000
+ROUTE_PARAMS = ['pickup_lat', 'pickup_lon', 'destination_lat', 'destination_lon']
+
+
+def drivers_with_tariffs(queryset):
+    """Водители с заранее загруженными тарифами - без запроса на каждую карточку"""
+    return queryset.prefetch_related(
+        Prefetch('available_tariffs', queryset=Tariff.objects.only('id', 'name', 'icon').order_by('base_price'))
+    )
+
 
-def index(request):
+def _parse_coordinate(value, limit):
+    """Координата из формы или None, если она не передана или некорректна"""
+    try:
+        coordinate = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not -limit <= coordinate <= limit:
+        return None
+    return coordinate
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+@cache_page_versioned(catalog.CATALOG, counters.DRIVERS)
+@read_only
+@query_budget(3)
+async def index(request):
     """Главная страница с тарифами"""
-    total_drivers = Driver.objects.count()
-    available_drivers = Driver.objects.filter(status='available')[:3]
-    active_tariffs = Tariff.objects.filter(is_active=True)
-    
-    status_stats = {
-        'available': Driver.objects.filter(status='available').count(),
-        'busy': Driver.objects.filter(status='busy').count(),
-        'offline': Driver.objects.filter(status='offline').count(),
-    }
-    
-    # Добавляем способы оплаты в контекст
-    payment_methods = PaymentMethod.objects.filter(is_active=True).order_by('order')[:3]
+    # Независимые выборки запускаются одновременно; счётчики статусов
+    # поддерживаются инкрементально, без COUNT по таблице водителей
+    status_stats, available_drivers, snapshot = await asyncio.gather(
+        counters.astatus_counts(),
+        _alist(drivers_with_tariffs(Driver.objects.filter(status='available'))[:3]),
+        catalog.asnapshot(),
+    )
     
     return render(request, 'index.html', {
-        'total_drivers': total_drivers,
+        'total_drivers': status_stats['total'],
         'available_drivers': available_drivers,
-        'tariffs': active_tariffs,
+        'tariffs': snapshot.tariffs,
+        'catalog_version': snapshot.version,
         'status_stats': status_stats,
-        'payment_methods': payment_methods,
+        # Добавляем способы оплаты в контекст
+        'payment_methods': snapshot.payment_methods[:3],
     })
 
-def drivers(request):
+@cache_page_versioned(catalog.CATALOG, counters.DRIVERS)
+@read_only
+@query_budget(3)
+async def drivers(request):
     """Страница всех водителей"""
     status_filter = request.GET.get('status', 'all')
     
@@ -37,20 +81,39 @@ def drivers(request):
         all_drivers = Driver.objects.all()
         status_filter = 'all'
     
+    status_stats, page = await asyncio.gather(
+        counters.astatus_counts(),
+        akeyset_page(
+            drivers_with_tariffs(all_drivers), ['-rating', '-id'],
+            cursor=request.GET.get('cursor'), per_page=DRIVERS_PER_PAGE,
+        ),
+    )
+    
     return render(request, 'drivers.html', {
-        'drivers': all_drivers,
+        'drivers': page.items,
+        'page': page,
+        'drivers_count': status_stats['total'] if status_filter == 'all' else status_stats[status_filter],
+        'status_stats': status_stats,
         'status_filter': status_filter,
     })
 
-def calculate_price(request):
+@cache_page_versioned(catalog.CATALOG)
+@query_budget(1)
+async def calculate_price(request):
     """Страница расчета стоимости"""
-    tariffs = Tariff.objects.filter(is_active=True)
-    return render(request, 'price_calc.html', {'tariffs': tariffs})
+    snapshot = await catalog.asnapshot()
+    return render(request, 'price_calc.html', {'tariffs': snapshot.tariffs, 'catalog_version': snapshot.version})
 
-def payment_methods(request):
+@cache_page_versioned(catalog.CATALOG)
+@read_only
+@query_budget(1)
+async def payment_methods(request):
     """Страница со способами оплаты"""
-    methods = PaymentMethod.objects.filter(is_active=True).order_by('order')
-    return render(request, 'payment_methods.html', {'methods': methods})
+    snapshot = await catalog.asnapshot()
+    return render(request, 'payment_methods.html', {
+        'methods': snapshot.payment_methods,
+        'catalog_version': snapshot.version,
+    })
 
 def create_order(request):
     """Создание нового заказа"""
@@ -63,7 +126,16 @@ def create_order(request):
             destination_address = request.POST.get('destination_address', '').strip()
             tariff_id = request.POST.get('tariff')
             payment_method_id = request.POST.get('payment_method')
-            distance = float(request.POST.get('distance', 0))
+            distance_hundredths = pricing.distance_hundredths(request.POST.get('distance') or 0)
+            estimated_minutes = pricing.estimate_minutes(distance_hundredths)
+            pickup_latitude = _parse_coordinate(request.POST.get('pickup_lat'), 90)
+            pickup_longitude = _parse_coordinate(request.POST.get('pickup_lon'), 180)
+            destination_latitude = _parse_coordinate(request.POST.get('destination_lat'), 90)
+            destination_longitude = _parse_coordinate(request.POST.get('destination_lon'), 180)
+            route = (pickup_latitude, pickup_longitude, destination_latitude, destination_longitude)
+            if None not in route:
+                # По координатам обеих точек расстояние и время считаем сами
+                distance_hundredths, estimated_minutes = routing.estimator.estimate(*route)
             
             # Проверяем обязательные поля
             if not all([customer_name, customer_phone, pickup_address, destination_address, tariff_id, payment_method_id]):
@@ -71,8 +143,8 @@ def create_order(request):
                 return redirect('create_order')
             
             # Получаем объекты
-            tariff = Tariff.objects.get(id=tariff_id)
-            payment_method = PaymentMethod.objects.get(id=payment_method_id)
+            tariff = catalog.get_tariff(tariff_id)
+            payment_method = catalog.get_payment_method(payment_method_id)
             
             # Создаем заказ
             order = Order(
@@ -80,34 +152,25 @@ def create_order(request):
                 customer_phone=customer_phone,
                 pickup_address=pickup_address,
                 destination_address=destination_address,
+                pickup_latitude=pickup_latitude,
+                pickup_longitude=pickup_longitude,
+                destination_latitude=destination_latitude,
+                destination_longitude=destination_longitude,
                 tariff=tariff,
                 payment_method=payment_method,
-                distance=distance,
-                estimated_time=int(distance * 5)  # Примерный расчет времени
+                distance=Decimal(distance_hundredths) / 100,
+                estimated_time=estimated_minutes,
             )
             
             # Рассчитываем цену
             order.calculate_price()
             
-            # Автоматически назначаем свободного водителя с подходящим тарифом
-            available_driver = Driver.objects.filter(
-                status='available',
-                available_tariffs=tariff
-            ).first()
-            
-            if available_driver:
-                order.driver = available_driver
-                available_driver.status = 'busy'
-                available_driver.save()
-                order.status = 'accepted'
-            else:
-                order.status = 'pending'
-            
-            order.save()
+            # Назначаем ближайшего свободного водителя и сохраняем заказ атомарно
+            place_order(order)
             
             # Сообщение об успехе
             messages.success(request, f'Заказ #{order.id} успешно создан! Стоимость: {order.total_price}₽')
-            return redirect('index')
+            return redirect('order_status', pk=order.pk)
             
         except Tariff.DoesNotExist:
             messages.error(request, 'Выбранный тариф не найден')
@@ -117,15 +180,218 @@ def create_order(request):
             messages.error(request, f'Ошибка при создании заказа: {str(e)}')
     
     # GET запрос - показываем форму
-    tariffs = Tariff.objects.filter(is_active=True)
-    payment_methods = PaymentMethod.objects.filter(is_active=True).order_by('order')
+    snapshot = catalog.snapshot()
     
     return render(request, 'order_payment.html', {
-        'tariffs': tariffs,
-        'payment_methods': payment_methods,
+        'tariffs': snapshot.tariffs,
+        'payment_methods': snapshot.payment_methods,
+        'catalog_version': snapshot.version,
     })
 
+@query_budget(2)
 def order_history(request):
-    """История заказов"""
-    orders = Order.objects.all().order_by('-created_at')[:10]
-    return render(request, 'order_history.html', {'orders': orders})
\ No newline at end of file
+    """История заказов: рабочая таблица и архив"""
+    page = history.history_page(cursor=request.GET.get('cursor'), per_page=ORDERS_PER_PAGE)
+    return render(request, 'order_history.html', {'orders': page.items, 'page': page})
+
+
+@read_only
+@query_budget(2)
+async def order_status(request, pk):
+    """Страница заказа; статус обновляется по SSE без перезагрузки"""
+    try:
+        order = await history.aget_order(pk, related=('tariff', 'driver'))
+    except Order.DoesNotExist:
+        raise Http404('Заказ не найден')
+    return render(request, 'order_status.html', {
+        'order': order,
+        'is_final': order.status in events.TERMINAL_STATUSES,
+    })
+
+
+@read_only
+@query_budget(1)
+async def order_events(request, pk):
+    """
+    Текущий статус заказа в формате Server-Sent Events. Живой поток под
+    ASGI-сервером обслуживает events.route_order_events (см. asgi.py); сюда
+    попадают runserver и WSGI, где долгий ответ занял бы рабочий поток до
+    конца заказа. Поэтому ответ закрывается сразу, а EventSource
+    переподключается через events.RETRY_MS - страница опрашивает сервер.
+    """
+    try:
+        order = await Order.objects.select_related('driver').aget(pk=pk)
+    except Order.DoesNotExist:
+        raise Http404('Заказ не найден')
+    response = HttpResponse(events.snapshot(events.order_payload(order)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+class QuoteError(ValueError):
+    pass
+
+
+def _quote_items(request):
+    """Позиции запроса расчёта: JSON-пачка в POST или одна поездка в GET"""
+    if request.method == 'POST':
+        try:
+            payload = json.loads(request.body or b'null')
+        except (ValueError, UnicodeDecodeError):
+            raise QuoteError('Тело запроса должно быть JSON')
+        items = payload.get('items') if isinstance(payload, dict) else payload
+        if not isinstance(items, list):
+            raise QuoteError('Ожидается список items')
+        return items
+    # Без тарифа в GET считаем поездку по всем активным тарифам
+    tariff = request.GET.get('tariff')
+    tariff_ids = [tariff] if tariff else [t.pk for t in catalog.active_tariffs()]
+    item = {'distance': request.GET.get('distance', 0), 'minutes': request.GET.get('minutes')}
+    if 'pickup_lat' in request.GET:
+        item['route'] = [request.GET.get(name) for name in ROUTE_PARAMS]
+    return [dict(item, tariff=tariff_id) for tariff_id in tariff_ids]
+
+
+def _parse_route(route):
+    """Координаты [широта, долгота подачи, широта, долгота назначения] или ValueError"""
+    if not isinstance(route, (list, tuple)) or len(route) != 4:
+        raise ValueError(route)
+    coordinates = [_parse_coordinate(value, limit) for value, limit in zip(route, (90, 180, 90, 180))]
+    if None in coordinates:
+        raise ValueError(route)
+    return coordinates
+
+
+@csrf_exempt  # расчёт ничего не меняет, а API вызывают и внешние клиенты
+@require_http_methods(['GET', 'POST'])
+@query_budget(0)
+def quote(request):
+    """
+    API расчёта стоимости: одна поездка или пачка за один вызов. Вместо
+    distance можно передать route - координаты подачи и назначения, тогда
+    расстояние и время оценивает routing.py.
+    """
+    snapshot = catalog.snapshot()
+    try:
+        items = _quote_items(request)
+        if len(items) > MAX_QUOTE_ITEMS:
+            raise QuoteError(f'Не больше {MAX_QUOTE_ITEMS} позиций за запрос')
+        tariff_ids, distances, minutes = [], [], []
+        # Позиции с координатами вместо расстояния оцениваются одной пачкой
+        routed, routes = [], []
+        for number, item in enumerate(items):
+            try:
+                tariff_id = int(item['tariff'])
+                if item.get('route') is not None:
+                    routes.append(_parse_route(item['route']))
+                    routed.append(number)
+                hundredths = pricing.distance_hundredths(item.get('distance') or 0)
+                item_minutes = item.get('minutes')
+                item_minutes = pricing.estimate_minutes(hundredths) if item_minutes in (None, '') else int(item_minutes)
+            except (KeyError, TypeError, ValueError, InvalidOperation, AttributeError):
+                raise QuoteError(f'Позиция {number}: нужны tariff и distance или route')
+            if tariff_id not in snapshot.rate_table:
+                raise QuoteError(f'Позиция {number}: тариф {tariff_id} не найден')
+            if hundredths < 0 or item_minutes < 0:
+                raise QuoteError(f'Позиция {number}: отрицательные значения')
+            tariff_ids.append(tariff_id)
+            distances.append(hundredths)
+            minutes.append(item_minutes)
+    except QuoteError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    if routes:
+        route_distances, route_minutes = routing.estimator.estimate_many(*zip(*routes))
+        for number, hundredths, item_minutes in zip(routed, route_distances, route_minutes):
+            distances[number] = hundredths
+            if items[number].get('minutes') in (None, ''):
+                minutes[number] = item_minutes
+
+    multipliers = {tariff_id: surge_engine.multiplier(tariff_id) for tariff_id in set(tariff_ids)}
+    surge = [multipliers[tariff_id] for tariff_id in tariff_ids]
+    prices = snapshot.rate_table.price(tariff_ids, distances, minutes, surge=surge)
+    return JsonResponse({'quotes': [
+        {
+            'tariff': tariff_id,
+            'distance': str(Decimal(hundredths) / 100),
+            'minutes': item_minutes,
+            'surge': str(Decimal(multiplier) / 100),
+            'price': str(pricing.from_kopecks(kopecks)),
+            'price_kopecks': kopecks,
+        }
+        for tariff_id, hundredths, item_minutes, multiplier, kopecks
+        in zip(tariff_ids, distances, minutes, surge, prices)
+    ]})
+
+
+@read_only
+@require_http_methods(['GET'])
+@query_budget(6)
+def order_search(request):
+    """
+    Поиск заказов для поддержки по словам из адресов и имени клиента:
+    ?q=ленина 10&limit=20, лучшие совпадения первыми. Только для сотрудников.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Доступно только сотрудникам'}, status=403)
+    text = request.GET.get('q', '').strip()
+    try:
+        limit = min(int(request.GET.get('limit', search.SEARCH_LIMIT)), search.MAX_SEARCH_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit должен быть числом'}, status=400)
+    if not text or limit < 1:
+        return JsonResponse({'error': 'Нужен непустой запрос q'}, status=400)
+    return JsonResponse({'query': text, 'results': [
+        {
+            'id': order.pk,
+            'score': round(score, 4),
+            'archived': isinstance(order, ArchivedOrder),
+            'customer_name': order.customer_name,
+            'customer_phone': order.customer_phone,
+            'pickup_address': order.pickup_address,
+            'destination_address': order.destination_address,
+            'tariff': order.tariff.name,
+            'status': order.status,
+            'total_price': str(order.total_price),
+            'created_at': order.created_at.isoformat(),
+        }
+        for order, score in search.search_orders(text, limit)
+    ]})
+
+
+@csrf_exempt  # вызывает приложение водителя, а не форма сайта
+@require_http_methods(['POST'])
+@query_budget(0)
+def driver_heartbeat(request):
+    """
+    Сигнал от приложения водителя: {"driver": id, "lat": ..., "lon": ..., "status": "available"}
+    с заголовком "Authorization: Bearer <токен водителя>" (heartbeats.driver_token).
+    Отчёт только попадает в буфер heartbeats.buffer, база пишется пачками в фоне.
+    """
+    try:
+        payload = json.loads(request.body or b'null')
+        driver_id = int(payload['driver'])
+        status = payload.get('status') or 'available'
+    except (ValueError, UnicodeDecodeError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Ожидается JSON с полем driver'}, status=400)
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not heartbeats.check_token(driver_id, token.strip()):
+        return JsonResponse({'error': 'Нужен токен этого водителя'}, status=403)
+    if status not in heartbeats.REPORTED_STATUSES:
+        return JsonResponse({'error': f'Статус должен быть одним из: {", ".join(heartbeats.REPORTED_STATUSES)}'}, status=400)
+    latitude = _parse_coordinate(payload.get('lat'), 90)
+    longitude = _parse_coordinate(payload.get('lon'), 180)
+    if latitude is None or longitude is None:
+        latitude = longitude = None
+    heartbeats.buffer.record(driver_id, latitude, longitude, status)
+    return HttpResponse(status=204)
+
+
+@require_http_methods(['GET'])
+@query_budget(0)
+def metrics(request):
+    """
+    Гистограммы времени ответов, SQL и шаблонов этого процесса в текстовом
+    формате Prometheus. Доступ снаружи закрывается на прокси.
+    """
+    return HttpResponse(profiling.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
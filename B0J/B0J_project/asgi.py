@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "B0J_project.settings")
 
-application = get_asgi_application()
\ No newline at end of file
+django_application = get_asgi_application()
+
+from B0J_app.events import route_order_events  # noqa: E402 - после настройки Django
+
+application = route_order_events(django_application)
\ No newline at end of file
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +43,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: сжимает HTML уже после всех остальных обработчиков ответа
+    "django.middleware.gzip.GZipMiddleware",
+    # Сразу за сжатием: Server-Timing и гистограммы для /metrics
+    "B0J_app.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -54,7 +60,8 @@ ROOT_URLCONF = "B0J_project.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # Стандартный движок Django с замером времени отрисовки
+        "BACKEND": "B0J_app.profiling.ProfiledDjangoTemplates",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -74,11 +81,77 @@ WSGI_APPLICATION = "B0J_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# B0J_DATABASE_MODE=production включает WAL: читатели не ждут пишущих,
+# пишущие ждут друг друга до таймаута вместо мгновенного "database is locked".
+DATABASE_MODE = os.environ.get("B0J_DATABASE_MODE", "development")
+
+SQLITE_OPTIONS = {}
+if DATABASE_MODE == "production":
+    SQLITE_OPTIONS = {
+        # Ожидание блокировки записи, секунды (busy timeout)
+        "timeout": 20,
+        # Блокировка записи берётся сразу в BEGIN: нет взаимных блокировок при её повышении
+        "transaction_mode": "IMMEDIATE",
+        "init_command": (
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA cache_size=-32000;"
+            "PRAGMA temp_store=MEMORY;"
+            "PRAGMA mmap_size=134217728;"
+            "PRAGMA wal_autocheckpoint=1000"
+        ),
+    }
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "OPTIONS": SQLITE_OPTIONS,
+    },
+    # Отдельные соединения для страниц только для чтения (см. B0J_app/routers.py)
+    "read": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Соединение только читает: без IMMEDIATE и с защитой от случайной записи
+            **{k: v for k, v in SQLITE_OPTIONS.items() if k != "transaction_mode"},
+            "init_command": ";".join(
+                filter(None, [SQLITE_OPTIONS.get("init_command"), "PRAGMA query_only=ON"])
+            ),
+        },
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+DATABASE_ROUTERS = ["B0J_app.routers.ReadWriteRouter"]
+
+# Завершённые и отменённые заказы старше этого срока переносятся в архив
+# командой archive_orders (см. B0J_app/archive.py)
+ORDER_ARCHIVE_AFTER_DAYS = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# "default" живёт в памяти процесса; "shared" виден всем рабочим процессам
+# на узле и хранит версии справочников для сброса локальных кэшей.
+
+# Тесты получают свой кэш в памяти, который очищается перед каждым тестом:
+# версии из файла пережили бы прогон и совпали бы со снимками справочников,
+# построенными по откаченным данным.
+TESTING = sys.argv[1:2] == ["test"]
+TEST_RUNNER = "B0J_project.test_runner.CacheIsolatingRunner"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache" / "shared",
+    } if not TESTING else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "shared",
+    },
 }
 
 
@@ -117,6 +190,17 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    # Имена с хэшем содержимого и сжатые копии .gz/.br (см. B0J_app/assets.py)
+    "staticfiles": {
+        "BACKEND": "B0J_app.assets.CompressedManifestStaticFilesStorage",
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -0,0 +1,24 @@
+"""Запуск тестов: каждый тест начинается с пустых кэшей"""
+import unittest
+
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+
+
+class CacheIsolatingRunner(DiscoverRunner):
+    """
+    TestCase откатывает базу после теста, не меняя версий данных (versions.py),
+    поэтому страницы и снимки справочников, построенные по данным одного теста,
+    иначе достались бы следующему.
+    """
+
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+
+        class Result(base):
+            def startTest(self, test):
+                for cache in caches.all():
+                    cache.clear()
+                super().startTest(test)
+
+        return Result
@@ -19,10 +19,15 @@ Including another URLconf
 URL configuration for B0J_project project.
 """
 # B0J_project/urls.py
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from B0J_app import assets
 
 urlpatterns = [
+    # Под runserver c DEBUG статику перехватывает django.contrib.staticfiles
+    re_path(rf'^{settings.STATIC_URL.lstrip("/")}(?P<path>.+)$', assets.serve, name='static'),
     path('admin/', admin.site.urls),
     path('', include('B0J_app.urls')),
 ]
\ No newline at end of file